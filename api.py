@@ -0,0 +1,267 @@
+# api.py
+"""
+API HTTP de solo lectura (JSON / NDJSON) sobre la capa de datos del paquete rrd (no importa Streamlit ni la UI).
+
+Uso (desde la raíz del repo):
+    python api.py --port 8502
+    RRD_API_TOKEN=secreto python api.py --host 0.0.0.0 --port 8502
+
+Endpoints (GET):
+    /api/v1/planificaciones   filtros + orden/desc/limite/cursor/columnas (keyset)
+    /api/v1/reportes          idem, filtros sobre la planificación del reporte
+    /api/v1/consolidado       plan + reportes, paginado por planificación
+    /api/v1/vencimientos      estado=vencidas|proximas, dependencia, dias
+    /api/v1/cumplimiento      dependencia, anio
+    /api/v1/cambios           desde=<seq>, tabla, limite: registro de cambios (sincronización incremental)
+    /api/v1/<dataset>.ndjson  planificaciones/reportes/consolidado completos, en streaming
+
+Filtros: dependencia, anio, periodo_planificado, region, provincia, comuna, ejecutado.
+Para traer solo lo nuevo (incluidas modificaciones y eliminaciones): /api/v1/cambios con
+`desde` = el `next_cursor` de la respuesta anterior.
+Las respuestas llevan ETag (último seq de cambios + catálogo + URL): con If-None-Match se
+responde 304 sin ejecutar la consulta. gzip según Accept-Encoding.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+from typing import Dict, List, Optional
+
+import tornado.ioloop
+import tornado.web
+
+from rrd import db
+from rrd.cambios import CAMBIOS_LIMITE, leer_cambios, ultimo_cambio
+from rrd.exportacion import _export_sql, _iter_chunks
+
+API_TOKEN = os.environ.get("RRD_API_TOKEN", "")     # vacío = sin autenticación
+API_MAX_LIMITE = 1000
+API_NDJSON_CHUNK_ROWS = 2000
+FILTROS_API = ["dependencia", "anio", "periodo_planificado", "region", "provincia", "comuna", "ejecutado"]
+
+# =========================================================
+# UTILIDADES
+# =========================================================
+class ErrorPeticion(ValueError):
+    """Parámetro inválido -> 400."""
+
+def _json_value(v):
+    v = db._py(v)
+    if isinstance(v, float) and v != v:      # NaN de pandas -> null
+        return None
+    return v
+
+def _records(df) -> List[Dict]:
+    cols = list(df.columns)
+    return [{c: _json_value(v) for c, v in zip(cols, row)} for row in df.itertuples(index=False, name=None)]
+
+def encode_cursor(cursor) -> Optional[str]:
+    if cursor is None:
+        return None
+    raw = json.dumps([_json_value(v) for v in cursor], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: Optional[str]):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        valor, id_ = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ErrorPeticion("cursor inválido") from e
+    # bool es subclase de int: un cursor forjado con true/false tampoco vale
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float, type(None))) or not isinstance(id_, str):
+        raise ErrorPeticion("cursor inválido")
+    return valor, id_
+
+def data_version() -> str:
+    """Cambia con cada inserción, modificación o eliminación (seq de `cambios`) o cambio de catálogo."""
+    return f"{ultimo_cambio()}-{db.catalogo_hash()[:12]}"
+
+# =========================================================
+# HANDLERS
+# =========================================================
+class BaseHandler(tornado.web.RequestHandler):
+    async def prepare(self):
+        if API_TOKEN:
+            auth = self.request.headers.get("Authorization", "")
+            if not hmac.compare_digest(auth, f"Bearer {API_TOKEN}"):
+                self.set_status(401)
+                self.finish({"error": "no autorizado"})
+                return
+        self.set_header("Cache-Control", "no-cache")
+        version = await self.run(data_version)
+        etag = hashlib.sha1(f"{version}|{self.request.uri}".encode("utf-8")).hexdigest()
+        self.set_header("Etag", f'W/"{etag}"')
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+
+    def write_error(self, status_code: int, **kwargs):
+        self.finish({"error": self._reason})
+
+    def _arg_int(self, name: str, default: int, minimo: int = 0, maximo: Optional[int] = None) -> int:
+        raw = self.get_query_argument(name, None)
+        try:
+            v = default if raw is None else int(raw)
+        except ValueError as e:
+            raise ErrorPeticion(f"{name} debe ser entero") from e
+        if v < minimo or (maximo is not None and v > maximo):
+            raise ErrorPeticion(f"{name} fuera de rango")
+        return v
+
+    def _arg_bool(self, name: str, default: bool) -> bool:
+        raw = self.get_query_argument(name, None)
+        return default if raw is None else raw.lower() in ("1", "true", "si", "sí")
+
+    def filtros(self) -> Dict:
+        filtros = {c: self.get_query_argument(c, None) for c in FILTROS_API}
+        if filtros["anio"] is not None:
+            filtros["anio"] = self._arg_int("anio", 0)
+        return filtros
+
+    async def run(self, fn, *args):
+        """La capa de datos es síncrona: se ejecuta en el pool de hilos del loop."""
+        return await tornado.ioloop.IOLoop.current().run_in_executor(None, fn, *args)
+
+    def send_error_peticion(self, e: Exception):
+        self.set_status(400)
+        self.finish({"error": str(e)})
+
+class PaginaHandler(BaseHandler):
+    """Página keyset: {"items": [...], "next_cursor": "..." | null}."""
+    consulta = None              # query_planificaciones / query_reportes / query_consolidado
+    ordenes: List[str] = []
+    orden_default = ""
+    con_columnas = True
+
+    async def get(self):
+        try:
+            orden = self.get_query_argument("orden", self.orden_default)
+            if orden not in self.ordenes:
+                raise ErrorPeticion(f"orden no soportado: {orden}")
+            args = [self.filtros()]
+            if self.con_columnas:
+                cols = self.get_query_argument("columnas", "")
+                args.append([c for c in cols.split(",") if c] or None)
+            args += [orden, self._arg_bool("desc", True), self._arg_int("limite", 100, 1, API_MAX_LIMITE),
+                     decode_cursor(self.get_query_argument("cursor", None))]
+            df, next_cursor = await self.run(type(self).consulta, *args)
+        except ValueError as e:
+            self.send_error_peticion(e)
+            return
+        self.write({"items": _records(df), "next_cursor": encode_cursor(next_cursor)})
+
+class PlanificacionesHandler(PaginaHandler):
+    consulta = staticmethod(db.query_planificaciones)
+    ordenes = db.ORDEN_PLANIFICACIONES
+    orden_default = "fecha_registro"
+
+class ReportesHandler(PaginaHandler):
+    consulta = staticmethod(db.query_reportes)
+    ordenes = db.ORDEN_REPORTES
+    orden_default = "fecha_reporte"
+
+class ConsolidadoHandler(PaginaHandler):
+    consulta = staticmethod(db.query_consolidado)
+    ordenes = db.ORDEN_PLANIFICACIONES
+    orden_default = "fecha_registro"
+    con_columnas = False
+
+class VencimientosHandler(BaseHandler):
+    async def get(self):
+        try:
+            estado = self.get_query_argument("estado", "vencidas")
+            df = await self.run(
+                db.query_vencimientos, estado, self.get_query_argument("dependencia", None), None,
+                self._arg_int("dias", 30, 0, 366), self._arg_int("limite", 500, 1, API_MAX_LIMITE),
+            )
+        except ValueError as e:
+            self.send_error_peticion(e)
+            return
+        self.write({"items": _records(df)})
+
+class CumplimientoHandler(BaseHandler):
+    async def get(self):
+        try:
+            anio = self.get_query_argument("anio", None)
+            df = await self.run(
+                db.fetch_cumplimiento, self.get_query_argument("dependencia", None),
+                None if anio is None else self._arg_int("anio", 0),
+            )
+        except ValueError as e:
+            self.send_error_peticion(e)
+            return
+        self.write({"items": _records(df)})
+
+class CambiosHandler(BaseHandler):
+    """{"items": [...], "next_cursor": seq, "hay_mas": bool}; next_cursor es el `desde` de la próxima llamada."""
+
+    async def get(self):
+        try:
+            tabla = self.get_query_argument("tabla", None)
+            pagina = await self.run(
+                leer_cambios, self._arg_int("desde", 0), [tabla] if tabla else None,
+                self._arg_int("limite", CAMBIOS_LIMITE, 1, API_MAX_LIMITE),
+            )
+        except ValueError as e:
+            self.send_error_peticion(e)
+            return
+        items = [{**it, "fila": None if it["fila"] is None else {c: _json_value(v) for c, v in it["fila"].items()}}
+                 for it in pagina.items]
+        self.write({"items": items, "next_cursor": pagina.cursor, "hay_mas": pagina.hay_mas})
+
+class NdjsonHandler(BaseHandler):
+    """Dataset completo (con filtros) como NDJSON, una línea por fila, de a API_NDJSON_CHUNK_ROWS."""
+
+    async def get(self, dataset: str):
+        try:
+            sql, params, columns = _export_sql(dataset, self.filtros())
+        except ValueError as e:
+            self.send_error_peticion(e)
+            return
+        self.set_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        chunks = _iter_chunks(sql, params, API_NDJSON_CHUNK_ROWS)
+        try:
+            while True:
+                rows = await self.run(next, chunks, None)
+                if rows is None:
+                    break
+                self.write("".join(
+                    json.dumps({c: _json_value(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+                    for row in rows
+                ))
+                await self.flush()       # contrapresión: no se lee el siguiente chunk hasta enviar este
+        finally:
+            chunks.close()               # devuelve la conexión al pool si el cliente corta
+
+class GZipNdjson(tornado.web.GZipContentEncoding):
+    # Tornado solo comprime tipos conocidos; NDJSON también (incluso en streaming)
+    CONTENT_TYPES = tornado.web.GZipContentEncoding.CONTENT_TYPES | {"application/x-ndjson"}
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/api/v1/planificaciones", PlanificacionesHandler),
+        (r"/api/v1/reportes", ReportesHandler),
+        (r"/api/v1/consolidado", ConsolidadoHandler),
+        (r"/api/v1/vencimientos", VencimientosHandler),
+        (r"/api/v1/cumplimiento", CumplimientoHandler),
+        (r"/api/v1/cambios", CambiosHandler),
+        (r"/api/v1/(planificaciones|reportes|consolidado)\.ndjson", NdjsonHandler),
+    ], transforms=[GZipNdjson])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    args = ap.parse_args(argv)
+
+    db.init_db()
+    make_app().listen(args.port, address=args.host)
+    print(f"API en http://{args.host}:{args.port}/api/v1/")
+    tornado.ioloop.IOLoop.current().start()
+
+if __name__ == "__main__":
+    main()
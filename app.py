@@ -1,148 +1,69 @@
-# app.py  (COPIAR / PEGAR COMPLETO)
-import os
-import re
+# app.py  (UI Streamlit; la capa de datos está en el paquete rrd/)
 import json
-import sqlite3
-from datetime import date, datetime
-from typing import Dict, Optional, List
+import os
+from datetime import date
+from typing import Dict, Optional
 
 import pandas as pd
 import streamlit as st
 
-# =========================================================
-# CONFIG
-# =========================================================
-APP_TITLE = "Piloto PAS: Planificación y Confirmación de Supervisión"
-DB_PATH = "rrd_supervision.db"                 # SQLite local (se crea solo)
-UPLOAD_DIR = "uploads"
-DIVISIONES_PATH = "divisiones_chile_utf8sig.csv"  # tu CSV en el repo
-
-PERIODOS = [
-    "Enero","Febrero","Marzo","Abril","Mayo","Junio","Julio","Agosto","Septiembre","Octubre","Noviembre","Diciembre",
-    "1° Trimestre","2° Trimestre","3° Trimestre","4° Trimestre","1° Semestre","2° Semestre","Anual"
-]
-TIPO_ACCION = ["Supervisión", "Seguimiento", "Verificación", "Actualización", "Simulacro", "Difusión", "Otro"]
-TIPO_EVIDENCIA = ["Acta", "Informe", "Resolución/Decreto", "Registro fotográfico", "Lista asistencia", "Otro"]
-ESTADO_EJECUCION = ["Sí", "No", "Parcial"]
-TIPO_MOTIVO = ["Operativo", "Presupuestario", "Normativo", "Fuerza mayor", "Otro"]
-
-DEPENDENCIAS = [
-    "Direcciones Regionales",
-    "Subdirección de Reducción del Riesgo de Desastres",
-    "Subdirección de Gestión de Emergencias",
-    "Subdirección de Desarrollo Estratégico",
-]
-
-# Placeholder: reemplaza por tu lista institucional si quieres
-MINISTERIOS = [
-    "(Seleccionar)",
-    "Ministerio del Interior y Seguridad Pública",
-    "Ministerio de Salud",
-    "Ministerio de Obras Públicas",
-    "Ministerio de Educación",
-    "Ministerio de Vivienda y Urbanismo",
-    "Ministerio de Transportes y Telecomunicaciones",
-    "Ministerio de Energía",
-    "Ministerio del Medio Ambiente",
-    "Otro (especificar)",
-]
+from rrd.cache import estadisticas_cache
+from rrd.carga import importar_planificaciones, iter_filas_archivo
+from rrd.catalogo import get_catalogo
+from rrd.cola import SubmissionJournal, get_journal, submit_planificacion, submit_reportes
+from rrd.config import (
+    DEPENDENCIAS, DIVISIONES_PATH, ESTADO_EJECUCION, EVIDENCE_EXTENSIONES, JOURNAL_ENABLED, MINISTERIOS, PERIODOS,
+    TIPO_ACCION, TIPO_EVIDENCIA, TIPO_MOTIVO,
+)
+from rrd.db import (
+    ORDEN_PLANIFICACIONES, ORDEN_REPORTES, PLANIFICACION_COLS, REPORTE_COLS, SIN_REPORTE,
+    buscar_planificaciones, count_planificaciones, fetch_cumplimiento, fetch_planificacion_by_id,
+    get_pool, init_db_once, plan_label, query_consolidado, query_planificaciones, query_reportes,
+    query_vencimientos, resumen_vencimientos,
+)
+from rrd.divisiones import DivisionesIndex, comunas, load_divisiones, provincias, regiones, validar_territorio
+from rrd.evidencias import save_uploaded_file
+from rrd.exportacion import EXPORT_DATASETS, EXPORT_FORMATS, export_dataset
+from rrd.instrumentacion import RerunProfile, close_profile, profile_phase, start_profile
+from rrd.instrumentacion import profiling_enabled as rrd_profiling_enabled
+from rrd.snapshot import export_snapshot, snapshot_disponible, snapshot_filtrable
+from rrd.utilidades import ensure_dirs, make_id, make_ids
 
-# =========================================================
-# CATÁLOGO DE INSTRUMENTOS (DINÁMICO POR DEPENDENCIA)
-# - ambito: Nacional | Regional | Provincial | Comunal | Sectorial
-# - requiere_entidad/tipo_entidad: para instrumentos "sectoriales" (ministerios u otros)
-# Estructura por fila (8 campos):
-# (id_instrumento, tipo_instrumento, nombre_instrumento, ambito, requiere_entidad, tipo_entidad, marco_normativo, dependencia_owner)
-# =========================================================
-INSTRUMENTOS = [
-    # Direcciones Regionales
-    ("DR-PLAN-RRD-COM", "Plan", "Planes para la RRD (Comunal)", "Comunal", 0, None, "Procedimiento PAS", "Direcciones Regionales"),
-    ("DR-PLAN-EME-COM", "Plan", "Planes de Emergencia (Comunal)", "Comunal", 0, None, "Procedimiento PAS", "Direcciones Regionales"),
-    ("DR-COGRID-REG", "Compromisos COGRID", "Compromisos COGRID Regional", "Regional", 0, None, "Procedimiento PAS", "Direcciones Regionales"),
-    ("DR-COGRID-PRO", "Compromisos COGRID", "Compromisos COGRID Provincial", "Provincial", 0, None, "Procedimiento PAS", "Direcciones Regionales"),
-
-    # Subdirección RRD
-    ("SRRD-PEN-RRD", "Plan", "Plan Estratégico Nacional para la RRD", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-PNE", "Plan", "Plan Nacional de Emergencia (y anexos)", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-
-    # Sectorial (ministerios)
-    ("SRRD-PLAN-SEC", "Plan", "Planes Sectoriales (Ministerios PN-RRD)", "Sectorial", 1, "Ministerio", "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-MAP-AMEN", "Mapa", "Mapas de Amenaza (Ministerios PN-RRD)", "Sectorial", 1, "Ministerio", "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-
-    # Territorial
-    ("SRRD-EME-REG", "Plan", "Planes de Emergencia (Regional)", "Regional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-EME-PRO", "Plan", "Planes de Emergencia (Provincial)", "Provincial", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-RRD-REG", "Plan", "Planes para la RRD (Regional)", "Regional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-MAP-RIES", "Mapa", "Mapas de Riesgo", "Regional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-    ("SRRD-COGRID-NAC-MP", "Compromisos COGRID", "COGRID Nacional (Mitigación/Preparación)", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Reducción del Riesgo de Desastres"),
-
-    # Subdirección Gestión de Emergencias
-    ("SGE-SAT", "SAT", "Sistema de Alerta Temprana (protocolos/simulaciones/monitoreo)", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Gestión de Emergencias"),
-    ("SGE-COGRID-NAC-R", "Compromisos COGRID", "COGRID Nacional (Respuesta)", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Gestión de Emergencias"),
-
-    # Subdirección Desarrollo Estratégico
-    ("SDE-SINFO", "Sistema", "Sistema de Información", "Nacional", 0, None, "Procedimiento PAS", "Subdirección de Desarrollo Estratégico"),
-]
+APP_TITLE = "Piloto PAS: Planificación y Confirmación de Supervisión"
 
 # =========================================================
-# UTILIDADES
+# INSTRUMENTACIÓN (panel opt-in: RRD_PROFILE=1 o ?debug=1)
 # =========================================================
-def ensure_dirs():
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-def make_id(prefix: str) -> str:
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    rnd = str(abs(hash((prefix, ts))) % 10000).zfill(4)
-    return f"{prefix}-{ts}-{rnd}"
-
-def save_uploaded_file(file) -> Optional[str]:
-    if file is None:
-        return None
-    safe_name = re.sub(r"[\\/]+", "_", file.name.replace("..", ""))
-    stamped = datetime.now().strftime("%Y%m%d-%H%M%S")
-    out_name = f"{stamped}__{safe_name}"
-    out_path = os.path.join(UPLOAD_DIR, out_name)
-    with open(out_path, "wb") as f:
-        f.write(file.getbuffer())
-    return out_path
+def profiling_enabled() -> bool:
+    if rrd_profiling_enabled():
+        return True
+    try:
+        return st.query_params.get("debug") == "1"
+    except Exception:
+        return False
+
+def end_profile(prof: RerunProfile):
+    """Cierra el perfil (EXPLAIN + JSONL) y lo muestra en la barra lateral."""
+    total_ms = close_profile(prof)
+
+    with st.sidebar:
+        st.markdown(f"**Perfil del rerun:** {total_ms:.1f} ms")
+        resumen = [{k: ev.get(k) for k in ("tipo", "nombre", "ms", "filas")} for ev in prof.eventos]
+        st.dataframe(pd.DataFrame(resumen), use_container_width=True, height=260)
+        for ev in prof.eventos:
+            if ev["tipo"] == "db" and ev["sql"]:
+                with st.expander(f'{ev["nombre"]} · {ev["ms"]} ms'):
+                    for sql, plan in ev["plan"].items():
+                        st.code(sql.strip(), language="sql")
+                        if plan:
+                            st.text("\n".join(plan))
+        c = estadisticas_cache()
+        st.caption(f"Caché de consultas: {c['aciertos']} aciertos · {c['fallos']} fallos · {c['entradas']} entradas")
 
 # =========================================================
-# DIVISIONES (REGION/PROVINCIA/COMUNA)
+# SELECTOR TERRITORIAL
 # =========================================================
-@st.cache_data
-def load_divisiones(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
-    df.columns = [c.lower().strip() for c in df.columns]
-    for c in ["region", "provincia", "comuna"]:
-        df[c] = df[c].astype(str).str.replace("\u00a0", " ", regex=False).str.strip()
-    df = df.dropna(subset=["region","provincia","comuna"]).drop_duplicates()
-    return df
-
-def regiones(df: pd.DataFrame) -> List[str]:
-    return sorted(df["region"].dropna().unique().tolist())
-
-def provincias(df: pd.DataFrame, region: str) -> List[str]:
-    return sorted(df.loc[df["region"] == region, "provincia"].dropna().unique().tolist())
-
-def comunas(df: pd.DataFrame, region: str, provincia: str) -> List[str]:
-    mask = (df["region"] == region) & (df["provincia"] == provincia)
-    return sorted(df.loc[mask, "comuna"].dropna().unique().tolist())
-
-def territorial_requirements(ambito: str) -> Dict[str, bool]:
-    a = (ambito or "").strip().lower()
-    if a == "nacional":
-        return {"region": False, "provincia": False, "comuna": False}
-    if a == "regional":
-        return {"region": True, "provincia": False, "comuna": False}
-    if a == "provincial":
-        return {"region": True, "provincia": True, "comuna": False}
-    if a == "comunal":
-        return {"region": True, "provincia": True, "comuna": True}
-    if a == "sectorial":
-        return {"region": False, "provincia": False, "comuna": False}
-    return {"region": False, "provincia": False, "comuna": False}
-
-def territory_selector(df_div: pd.DataFrame, req: Dict[str, bool], prefix: str = "") -> Dict[str, Optional[str]]:
+def territory_selector(div_idx: DivisionesIndex, req: Dict[str, bool], prefix: str = "") -> Dict[str, Optional[str]]:
     """
     Cascada real con disabled y reseteo.
     Retorna None donde no aplica.
@@ -160,7 +81,7 @@ def territory_selector(df_div: pd.DataFrame, req: Dict[str, bool], prefix: str =
     if not req["region"]:
         return {"region": None, "provincia": None, "comuna": None}
 
-    region = st.selectbox("Región", ["(No aplica)"] + regiones(df_div), key=k_region)
+    region = st.selectbox("Región", ["(No aplica)"] + regiones(div_idx), key=k_region)
 
     if region != st.session_state[k_region_prev]:
         st.session_state[k_prov] = "(No aplica)"
@@ -171,7 +92,7 @@ def territory_selector(df_div: pd.DataFrame, req: Dict[str, bool], prefix: str =
         return {"region": None if region=="(No aplica)" else region, "provincia": None, "comuna": None}
 
     prov_disabled = (region == "(No aplica)")
-    prov_options = ["(No aplica)"] + (provincias(df_div, region) if not prov_disabled else [])
+    prov_options = ["(No aplica)"] + (provincias(div_idx, region) if not prov_disabled else [])
     provincia = st.selectbox("Provincia", prov_options, key=k_prov, disabled=prov_disabled)
 
     if provincia != st.session_state[k_prov_prev]:
@@ -186,7 +107,7 @@ def territory_selector(df_div: pd.DataFrame, req: Dict[str, bool], prefix: str =
         }
 
     com_disabled = (region == "(No aplica)") or (provincia == "(No aplica)")
-    com_options = ["(No aplica)"] + (comunas(df_div, region, provincia) if not com_disabled else [])
+    com_options = ["(No aplica)"] + (comunas(div_idx, region, provincia) if not com_disabled else [])
     comuna = st.selectbox("Comuna", com_options, key=k_com, disabled=com_disabled)
 
     return {
@@ -196,205 +117,141 @@ def territory_selector(df_div: pd.DataFrame, req: Dict[str, bool], prefix: str =
     }
 
 # =========================================================
-# SQL (SQLite) - MIGRACIÓN AUTOMÁTICA
+# APP
 # =========================================================
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def _table_cols(cur, table_name: str):
-    cur.execute(f"PRAGMA table_info({table_name})")
-    return {row[1] for row in cur.fetchall()}
-
-def _ensure_columns(cur, table: str, expected: dict):
-    existing = _table_cols(cur, table)
-    for col, coltype in expected.items():
-        if col not in existing:
-            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}")
-
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # Tablas base
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS instrumentos (
-        id_instrumento TEXT PRIMARY KEY,
-        tipo_instrumento TEXT,
-        nombre_instrumento TEXT,
-        ambito TEXT,
-        requiere_entidad INTEGER,
-        tipo_entidad TEXT,
-        marco_normativo TEXT,
-        dependencia_owner TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS planificaciones (
-        id_planificacion TEXT PRIMARY KEY,
-        dependencia TEXT,
-        id_instrumento TEXT NOT NULL,
-        tipo_instrumento TEXT,
-        nombre_instrumento TEXT,
-        ambito TEXT,
-        region TEXT,
-        provincia TEXT,
-        comuna TEXT,
-        entidad_objetivo TEXT,
-        anio INTEGER,
-        periodo_planificado TEXT,
-        tipo_accion TEXT,
-        responsable_planificacion TEXT,
-        cargo_responsable_planificacion TEXT,
-        email_responsable_planificacion TEXT,
-        fecha_registro TEXT,
-        observaciones TEXT,
-        FOREIGN KEY(id_instrumento) REFERENCES instrumentos(id_instrumento)
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS reportes (
-        id_reporte TEXT PRIMARY KEY,
-        id_planificacion TEXT NOT NULL,
-        ejecutado TEXT,
-        fecha_ejecucion TEXT,
-        tipo_evidencia TEXT,
-        evidencia_path TEXT,
-        responsable_reporte TEXT,
-        cargo_responsable_reporte TEXT,
-        email_responsable_reporte TEXT,
-        fecha_reporte TEXT,
-        observaciones TEXT,
-        motivo_no_ejecucion TEXT,
-        tipo_motivo TEXT,
-        reprograma TEXT,
-        FOREIGN KEY(id_planificacion) REFERENCES planificaciones(id_planificacion)
-    )
-    """)
-    conn.commit()
-
-    # Migración defensiva (si vienes de versión vieja)
-    _ensure_columns(cur, "instrumentos", {
-        "id_instrumento": "TEXT",
-        "tipo_instrumento": "TEXT",
-        "nombre_instrumento": "TEXT",
-        "ambito": "TEXT",
-        "requiere_entidad": "INTEGER",
-        "tipo_entidad": "TEXT",
-        "marco_normativo": "TEXT",
-        "dependencia_owner": "TEXT",
-    })
-    _ensure_columns(cur, "planificaciones", {
-        "ambito": "TEXT",
-        "entidad_objetivo": "TEXT",
+def _texto_o_none(v) -> Optional[str]:
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return None
+    v = str(v).strip()
+    return v or None
+
+def render_confirmacion_lote(labels: Dict[str, str]):
+    """Confirmación de varias planificaciones: valores comunes + ajustes por fila, un solo commit."""
+    ids = st.multiselect("Planificaciones a confirmar", list(labels), format_func=labels.get, key="lote_ids")
+    if not ids:
+        st.caption("Selecciona una o más planificaciones de los resultados de búsqueda.")
+        return
+
+    st.markdown("**Valores comunes (se copian a cada fila)**")
+    d1, d2, d3 = st.columns(3)
+    with d1:
+        ejecutado = st.selectbox("¿Se ejecutó lo planificado?", ESTADO_EJECUCION, key="lote_ejecutado")
+        fecha_ejecucion = st.date_input("Fecha de ejecución", value=date.today(), key="lote_fecha_ejecucion")
+        tipo_evidencia = st.selectbox("Tipo de evidencia", TIPO_EVIDENCIA, key="lote_tipo_evidencia")
+    with d2:
+        evidencia_file = st.file_uploader("Evidencia compartida (opcional)",
+                                          type=EVIDENCE_EXTENSIONES, key="lote_evidencia")
+        responsable_rep = st.text_input("Responsable reporte (nombre)", value="", key="lote_responsable")
+        cargo_rep = st.text_input("Cargo (opcional)", value="", key="lote_cargo")
+    with d3:
+        email_rep = st.text_input("Email (opcional)", value="", key="lote_email")
+        fecha_reporte = st.date_input("Fecha de reporte", value=date.today(), key="lote_fecha_reporte")
+        obs_rep = st.text_input("Observaciones", value="", key="lote_obs")
+
+    base = pd.DataFrame({
+        "id_planificacion": ids,
+        "planificacion": [labels[i] for i in ids],
+        "ejecutado": ejecutado,
+        "fecha_ejecucion": fecha_ejecucion,
+        "tipo_evidencia": tipo_evidencia,
+        "adjuntar_evidencia": evidencia_file is not None,
+        "observaciones": obs_rep,
+        "motivo_no_ejecucion": "",
+        "tipo_motivo": None,
+        "reprograma": None,
     })
-    conn.commit()
-
-    # Upsert catálogo de instrumentos (8 columnas)
-    cur.executemany("""
-    INSERT OR REPLACE INTO instrumentos
-    (id_instrumento, tipo_instrumento, nombre_instrumento, ambito, requiere_entidad, tipo_entidad, marco_normativo, dependencia_owner)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, INSTRUMENTOS)
-    conn.commit()
-    conn.close()
-
-def fetch_instrumentos() -> pd.DataFrame:
-    conn = get_conn()
-    df = pd.read_sql_query(
-        "SELECT * FROM instrumentos ORDER BY dependencia_owner, tipo_instrumento, ambito, nombre_instrumento",
-        conn
+    grid = st.data_editor(
+        base,
+        key="lote_grid",
+        hide_index=True,
+        num_rows="fixed",
+        use_container_width=True,
+        disabled=["id_planificacion", "planificacion"],
+        column_config={
+            "ejecutado": st.column_config.SelectboxColumn("Ejecutado", options=ESTADO_EJECUCION, required=True),
+            "fecha_ejecucion": st.column_config.DateColumn("Fecha ejecución", required=True),
+            "tipo_evidencia": st.column_config.SelectboxColumn("Tipo evidencia", options=TIPO_EVIDENCIA),
+            "adjuntar_evidencia": st.column_config.CheckboxColumn("Evidencia compartida"),
+            "tipo_motivo": st.column_config.SelectboxColumn("Tipo de motivo", options=TIPO_MOTIVO),
+            "reprograma": st.column_config.SelectboxColumn("¿Se reprogramará?", options=["Sí", "No"]),
+        },
     )
-    conn.close()
-    return df
-
-def insert_planificacion(payload: Dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    INSERT INTO planificaciones (
-        id_planificacion, dependencia, id_instrumento, tipo_instrumento, nombre_instrumento, ambito,
-        region, provincia, comuna, entidad_objetivo, anio, periodo_planificado, tipo_accion,
-        responsable_planificacion, cargo_responsable_planificacion, email_responsable_planificacion,
-        fecha_registro, observaciones
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        payload["id_planificacion"], payload["dependencia"], payload["id_instrumento"],
-        payload["tipo_instrumento"], payload["nombre_instrumento"], payload["ambito"],
-        payload["region"], payload["provincia"], payload["comuna"], payload["entidad_objetivo"],
-        payload["anio"], payload["periodo_planificado"], payload["tipo_accion"],
-        payload["responsable_planificacion"], payload["cargo_responsable_planificacion"],
-        payload["email_responsable_planificacion"], payload["fecha_registro"], payload["observaciones"]
-    ))
-    conn.commit()
-    conn.close()
-
-def insert_reporte(payload: Dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    INSERT INTO reportes (
-        id_reporte, id_planificacion, ejecutado, fecha_ejecucion, tipo_evidencia, evidencia_path,
-        responsable_reporte, cargo_responsable_reporte, email_responsable_reporte, fecha_reporte, observaciones,
-        motivo_no_ejecucion, tipo_motivo, reprograma
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        payload["id_reporte"], payload["id_planificacion"], payload["ejecutado"], payload["fecha_ejecucion"],
-        payload["tipo_evidencia"], payload["evidencia_path"], payload["responsable_reporte"],
-        payload["cargo_responsable_reporte"], payload["email_responsable_reporte"], payload["fecha_reporte"],
-        payload["observaciones"], payload["motivo_no_ejecucion"], payload["tipo_motivo"], payload["reprograma"]
-    ))
-    conn.commit()
-    conn.close()
-
-def fetch_planificaciones() -> pd.DataFrame:
-    conn = get_conn()
-    df = pd.read_sql_query("SELECT * FROM planificaciones ORDER BY fecha_registro DESC", conn)
-    conn.close()
-    return df
-
-def fetch_reportes() -> pd.DataFrame:
-    conn = get_conn()
-    df = pd.read_sql_query("SELECT * FROM reportes ORDER BY fecha_reporte DESC", conn)
-    conn.close()
-    return df
-
-def fetch_planificacion_by_id(id_planificacion: str) -> Optional[pd.Series]:
-    conn = get_conn()
-    df = pd.read_sql_query("SELECT * FROM planificaciones WHERE id_planificacion = ?", conn, params=[id_planificacion])
-    conn.close()
-    if df.empty:
-        return None
-    return df.iloc[0]
 
-def has_reporte_for_planificacion(id_planificacion: str) -> bool:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(1) FROM reportes WHERE id_planificacion = ?", (id_planificacion,))
-    n = cur.fetchone()[0]
-    conn.close()
-    return n > 0
+    if st.button(f"Guardar {len(ids)} confirmaciones", type="primary", key="lote_guardar"):
+        if not responsable_rep.strip():
+            st.error("Debes indicar el responsable del reporte.")
+            return
+
+        filas = grid.to_dict("records")
+        n_con_evidencia = sum(bool(f["adjuntar_evidencia"]) for f in filas) if evidencia_file is not None else 0
+        # Un solo archivo en el almacén, referenciado por todas las filas que lo usan
+        evidencia_path = save_uploaded_file(evidencia_file, referencias=n_con_evidencia) if n_con_evidencia else None
+
+        payloads = []
+        for f, id_reporte in zip(filas, make_ids("REP", len(filas))):
+            no_ejecutado = f["ejecutado"] in ["No", "Parcial"]
+            payloads.append({
+                "id_reporte": id_reporte,
+                "id_planificacion": f["id_planificacion"],
+                "ejecutado": f["ejecutado"],
+                "fecha_ejecucion": str(f["fecha_ejecucion"])[:10],
+                "tipo_evidencia": _texto_o_none(f["tipo_evidencia"]),
+                "evidencia_path": evidencia_path if f["adjuntar_evidencia"] else None,
+                "responsable_reporte": responsable_rep.strip(),
+                "cargo_responsable_reporte": cargo_rep.strip() or None,
+                "email_responsable_reporte": email_rep.strip() or None,
+                "fecha_reporte": str(fecha_reporte),
+                "observaciones": _texto_o_none(f["observaciones"]),
+                "motivo_no_ejecucion": _texto_o_none(f["motivo_no_ejecucion"]) if no_ejecutado else None,
+                "tipo_motivo": _texto_o_none(f["tipo_motivo"]) if no_ejecutado else None,
+                "reprograma": _texto_o_none(f["reprograma"]) if no_ejecutado else None,
+            })
+        submit_reportes(payloads)
+        if JOURNAL_ENABLED:
+            st.success(f"{len(payloads)} confirmaciones en cola; se guardarán en segundos en un solo lote.")
+        else:
+            st.success(f"{len(payloads)} confirmaciones guardadas en un solo lote.")
+
+def render_estado_journal(journal: SubmissionJournal):
+    """Barra lateral: envíos aún en cola y los que la base rechazó al aplicarlos."""
+    pendientes = journal.pendientes()
+    if pendientes:
+        st.sidebar.caption(f"{pendientes} envío(s) en cola, se guardarán en segundos.")
+    rechazados = journal.rechazados()
+    if rechazados:
+        st.sidebar.error(f"Envíos rechazados al guardar (últimos {len(rechazados)}); no quedaron registrados.")
+        st.sidebar.dataframe(pd.DataFrame(rechazados), use_container_width=True, hide_index=True)
 
-# =========================================================
-# APP
-# =========================================================
 def main():
     st.set_page_config(page_title=APP_TITLE, layout="wide")
+    if not profiling_enabled():
+        render_app()
+        return
+    prof = start_profile()
+    try:
+        render_app()
+    finally:
+        end_profile(prof)
+
+def render_app():
     st.title(APP_TITLE)
 
     if not os.path.exists(DIVISIONES_PATH):
         st.error(f"No se encontró {DIVISIONES_PATH}. Súbelo al repo (misma carpeta que app.py) o ajusta DIVISIONES_PATH.")
         st.stop()
 
-    ensure_dirs()
-    init_db()
-
-    df_div = load_divisiones(DIVISIONES_PATH)
-    inst_df = fetch_instrumentos()
+    with profile_phase("init"):
+        ensure_dirs()
+        init_db_once()
+        div_idx = load_divisiones(DIVISIONES_PATH)
+        catalogo = get_catalogo()
+        if JOURNAL_ENABLED:
+            render_estado_journal(get_journal())
 
-    tab1, tab2, tab3 = st.tabs(["1) Planificación", "2) Confirmación / Reporte", "3) Registros"])
+    tab1, tab2, tab3, tab4 = st.tabs(["1) Planificación", "2) Confirmación / Reporte", "3) Registros", "4) Tablero"])
 
     # ---------------- TAB 1 ----------------
-    with tab1:
+    with tab1, profile_phase("tab1"):
         st.subheader("1) Planificación (cuándo se aplicará el instrumento)")
 
         with st.form("form_planificacion", clear_on_submit=True):
@@ -403,17 +260,15 @@ def main():
             with c1:
                 dependencia = st.selectbox("Dependencia", DEPENDENCIAS)
 
-                inst_dep = inst_df[inst_df["dependencia_owner"] == dependencia].copy()
-                tipo_instrumento = st.selectbox("Tipo de instrumento", sorted(inst_dep["tipo_instrumento"].unique().tolist()))
-
-                inst_dep2 = inst_dep[inst_dep["tipo_instrumento"] == tipo_instrumento].copy()
-                instrumento_nombre = st.selectbox("Instrumento", inst_dep2["nombre_instrumento"].tolist())
+                tipo_instrumento = st.selectbox("Tipo de instrumento", catalogo.tipos(dependencia))
 
-                row = inst_dep2[inst_dep2["nombre_instrumento"] == instrumento_nombre].iloc[0]
-                id_instrumento = row["id_instrumento"]
-                ambito = row["ambito"]
-                requiere_entidad = int(row["requiere_entidad"])
-                tipo_entidad = row["tipo_entidad"]
+                inst = st.selectbox("Instrumento", catalogo.de_tipo(dependencia, tipo_instrumento),
+                                    format_func=lambda i: i.nombre_instrumento)
+                instrumento_nombre = inst.nombre_instrumento
+                id_instrumento = inst.id_instrumento
+                ambito = inst.ambito
+                requiere_entidad = inst.requiere_entidad
+                tipo_entidad = inst.tipo_entidad
 
                 st.caption(f"Ámbito: {ambito} | ID: {id_instrumento}")
 
@@ -437,8 +292,8 @@ def main():
                         entidad_objetivo = st.text_input("Entidad objetivo", value="").strip() or None
 
             with c3:
-                req = territorial_requirements(ambito)
-                territorio = territory_selector(df_div, req, prefix="plan_")
+                req = inst.requisitos
+                territorio = territory_selector(div_idx, req, prefix="plan_")
 
                 responsable = st.text_input("Responsable planificación (nombre)", value="")
                 cargo = st.text_input("Cargo (opcional)", value="")
@@ -452,15 +307,10 @@ def main():
                     st.error("Debes indicar el responsable de planificación.")
                     st.stop()
 
-                # Validaciones por ámbito
-                if req["region"] and territorio["region"] is None:
-                    st.error("Este instrumento exige Región.")
-                    st.stop()
-                if req["provincia"] and territorio["provincia"] is None:
-                    st.error("Este instrumento exige Provincia.")
-                    st.stop()
-                if req["comuna"] and territorio["comuna"] is None:
-                    st.error("Este instrumento exige Comuna.")
+                # Validaciones por ámbito y jerarquía territorial
+                errores_territorio = validar_territorio(div_idx, territorio, req)
+                if errores_territorio:
+                    st.error(errores_territorio[0])
                     st.stop()
 
                 if requiere_entidad == 1 and not entidad_objetivo:
@@ -487,32 +337,76 @@ def main():
                     "fecha_registro": str(fecha_registro),
                     "observaciones": observaciones.strip() or None,
                 }
-                insert_planificacion(payload)
-                st.success(f"Planificación guardada. ID: {payload['id_planificacion']}")
+                submit_planificacion(payload)
+                estado = "en cola (se guardará en segundos)" if JOURNAL_ENABLED else "guardada"
+                st.success(f"Planificación {estado}. ID: {payload['id_planificacion']}")
+
+        with st.expander("Carga masiva de planificaciones (CSV / XLSX)"):
+            st.caption(
+                "Columnas: id_instrumento, anio, periodo_planificado, responsable_planificacion y, según el ámbito, "
+                "region/provincia/comuna y entidad_objetivo. Opcionales: dependencia, tipo_accion, "
+                "cargo_responsable_planificacion, email_responsable_planificacion, fecha_registro, observaciones, id_planificacion."
+            )
+            archivo_bulk = st.file_uploader("Archivo", type=["csv", "xlsx"], key="bulk_archivo")
+            todo_o_nada = st.checkbox("Todo o nada (si hay errores no se guarda ninguna fila)", value=True, key="bulk_todo")
+            if archivo_bulk is not None and st.button("Importar", key="bulk_importar"):
+                try:
+                    with st.spinner("Importando..."):
+                        res = importar_planificaciones(
+                            iter_filas_archivo(archivo_bulk, archivo_bulk.name), catalogo, div_idx, todo_o_nada=todo_o_nada
+                        )
+                except (RuntimeError, ValueError, get_pool().error_integridad) as e:   # ValueError: CSV no UTF-8
+                    st.error(f"No se pudo importar: {e}")
+                else:
+                    msg = (f"Filas leídas: {res.leidas} | insertadas: {res.insertadas} | con error: "
+                           f"{len({e['fila'] for e in res.errores})} | {res.segundos:.2f} s ({res.filas_por_segundo:,.0f} filas/s)")
+                    (st.success if res.confirmado and not res.errores else st.warning)(msg)
+                    if res.errores:
+                        err_df = pd.DataFrame(res.errores)
+                        st.dataframe(err_df, use_container_width=True, height=240)
+                        st.download_button("Descargar errores (CSV)", err_df.to_csv(index=False).encode("utf-8"),
+                                           file_name="errores_carga.csv", mime="text/csv")
 
     # ---------------- TAB 2 ----------------
-    with tab2:
+    with tab2, profile_phase("tab2"):
         st.subheader("2) Confirmación / Reporte (se realizó lo planificado)")
 
-        plan_df = fetch_planificaciones()
-        if plan_df.empty:
-            st.info("No hay planificaciones registradas.")
+        b1, b2, b3, b4 = st.columns([3, 2, 1, 1])
+        with b1:
+            texto_busqueda = st.text_input("Buscar (ID, instrumento, territorio, entidad, responsable)", key="busq_texto")
+        with b2:
+            busq_dep = st.selectbox("Dependencia", ["(Todas)"] + DEPENDENCIAS, key="busq_dependencia")
+        with b3:
+            busq_anio = st.selectbox("Año", ["(Todos)"] + list(range(date.today().year + 1, 2019, -1)), key="busq_anio")
+        with b4:
+            busq_limite = st.selectbox("Máx. resultados", [25, 50, 100, 200], index=1, key="busq_limite")
+        show_all = st.checkbox("Mostrar también planificaciones ya confirmadas", value=False)
+
+        view = buscar_planificaciones(
+            texto_busqueda,
+            {
+                "dependencia": None if busq_dep == "(Todas)" else busq_dep,
+                "anio": None if busq_anio == "(Todos)" else int(busq_anio),
+            },
+            solo_pendientes=not show_all,
+            limite=busq_limite,
+        )
+        if JOURNAL_ENABLED and not show_all:
+            # Con la confirmación aún en el journal la planificación sigue "pendiente" en la base;
+            # se oculta para no confirmarla dos veces (cada envío lleva un id_reporte nuevo).
+            en_cola = get_journal().en_cola("reporte", "id_planificacion")
+            if en_cola:
+                view = view[~view["id_planificacion"].isin(en_cola)]
+        if view.empty:
+            if texto_busqueda or busq_dep != "(Todas)" or busq_anio != "(Todos)":
+                st.info("Ninguna planificación coincide con la búsqueda.")
+            else:
+                st.info("No hay planificaciones registradas." if show_all else "No hay planificaciones pendientes de confirmación.")
         else:
-            plan_df["tiene_reporte"] = plan_df["id_planificacion"].apply(has_reporte_for_planificacion)
-            show_all = st.checkbox("Mostrar también planificaciones ya confirmadas", value=False)
-            view = plan_df if show_all else plan_df[~plan_df["tiene_reporte"]].copy()
-
-            view["label"] = view.apply(
-                lambda r: (
-                    f'{r["id_planificacion"]} | {r["dependencia"]} | {r["tipo_instrumento"]}/{r["ambito"]} | '
-                    f'{(r["region"] or "-")} / {(r["provincia"] or "-")} / {(r["comuna"] or "-")} | '
-                    f'Entidad: {(r["entidad_objetivo"] or "-")} | {r["nombre_instrumento"]} | {r["anio"]} {r["periodo_planificado"]}'
-                ),
-                axis=1
-            )
-
-            sel = st.selectbox("Selecciona una planificación", view["label"].tolist())
-            id_plan_sel = sel.split(" | ")[0].strip()
+            # Etiquetas solo para las filas mostradas; la selección es el id_planificacion
+            with profile_phase("tab2.labels"):
+                labels = {r["id_planificacion"]: plan_label(r) for r in view.to_dict("records")}
+            id_plan_sel = st.selectbox("Selecciona una planificación", list(labels), format_func=labels.get)
             plan_row = fetch_planificacion_by_id(id_plan_sel)
 
             # Mostrar SIEMPRE como JSON válido (no se arma string manual)
@@ -546,7 +440,7 @@ def main():
                     tipo_evidencia = st.selectbox("Tipo de evidencia", TIPO_EVIDENCIA)
 
                 with r2:
-                    evidencia_file = st.file_uploader("Adjuntar evidencia", type=["pdf","doc","docx","xls","xlsx","png","jpg","jpeg"])
+                    evidencia_file = st.file_uploader("Adjuntar evidencia", type=EVIDENCE_EXTENSIONES)
                     responsable_rep = st.text_input("Responsable reporte (nombre)", value="")
                     cargo_rep = st.text_input("Cargo (opcional)", value="")
 
@@ -592,39 +486,170 @@ def main():
                         "tipo_motivo": tipo_motivo or None,
                         "reprograma": reprograma or None,
                     }
-                    insert_reporte(payload)
-                    st.success("Confirmación guardada.")
+                    submit_reportes([payload])
+                    st.success("Confirmación en cola (se guardará en segundos)." if JOURNAL_ENABLED
+                               else "Confirmación guardada.")
+
+            with st.expander("Confirmación en lote (varias planificaciones, una sola transacción)"):
+                render_confirmacion_lote(labels)
 
     # ---------------- TAB 3 ----------------
-    with tab3:
+    with tab3, profile_phase("tab3"):
         st.subheader("3) Registros (descarga para respaldo del piloto)")
 
-        dfp = fetch_planificaciones()
-        dfr = fetch_reportes()
-
-        c1, c2 = st.columns(2)
-        with c1:
-            st.write("**Planificaciones**")
-            st.dataframe(dfp, use_container_width=True, height=320)
-            if not dfp.empty:
-                st.download_button("Descargar planificaciones (CSV)", dfp.to_csv(index=False).encode("utf-8"),
-                                   file_name="planificaciones.csv", mime="text/csv")
-        with c2:
-            st.write("**Confirmaciones/Reportes**")
-            st.dataframe(dfr, use_container_width=True, height=320)
-            if not dfr.empty:
-                st.download_button("Descargar reportes (CSV)", dfr.to_csv(index=False).encode("utf-8"),
-                                   file_name="reportes.csv", mime="text/csv")
+        # Filtros (se resuelven en SQL)
+        f1, f2, f3, f4 = st.columns(4)
+        with f1:
+            f_dep = st.selectbox("Dependencia", ["(Todas)"] + DEPENDENCIAS, key="reg_dependencia")
+        with f2:
+            anios = ["(Todos)"] + list(range(date.today().year + 1, 2019, -1))
+            f_anio = st.selectbox("Año", anios, key="reg_anio")
+        with f3:
+            f_periodo = st.selectbox("Periodo", ["(Todos)"] + PERIODOS, key="reg_periodo")
+        with f4:
+            f_ejec = st.selectbox("Ejecutado", ["(Todos)"] + ESTADO_EJECUCION + [SIN_REPORTE], key="reg_ejecutado")
+        territorio_f = territory_selector(div_idx, {"region": True, "provincia": True, "comuna": True}, prefix="reg_")
+
+        filtros = {
+            "dependencia": None if f_dep == "(Todas)" else f_dep,
+            "anio": None if f_anio == "(Todos)" else int(f_anio),
+            "periodo_planificado": None if f_periodo == "(Todos)" else f_periodo,
+            "region": territorio_f["region"],
+            "provincia": territorio_f["provincia"],
+            "comuna": territorio_f["comuna"],
+            "ejecutado": None if f_ejec == "(Todos)" else f_ejec,
+        }
+
+        v1, v2, v3, v4 = st.columns([2, 2, 1, 1])
+        with v1:
+            vista = st.radio("Vista", ["Planificaciones", "Confirmaciones/Reportes", "Consolidado"], horizontal=True, key="reg_vista")
+        orden_opts = ORDEN_REPORTES if vista == "Confirmaciones/Reportes" else ORDEN_PLANIFICACIONES
+        with v2:
+            orden = st.selectbox("Ordenar por", orden_opts, key=f"reg_orden_{vista}")
+        with v3:
+            desc = st.checkbox("Descendente", value=True, key="reg_desc")
+        with v4:
+            limite = st.selectbox("Filas por página", [25, 50, 100, 200], index=1, key="reg_limite")
+
+        columnas = None
+        if vista == "Planificaciones":
+            columnas = st.multiselect("Columnas", PLANIFICACION_COLS, default=PLANIFICACION_COLS, key="reg_cols_plan") or None
+        elif vista == "Confirmaciones/Reportes":
+            columnas = st.multiselect("Columnas", REPORTE_COLS, default=REPORTE_COLS, key="reg_cols_rep") or None
+
+        # Pila de cursores keyset; se reinicia si cambian filtros/orden/vista
+        estado_pag = json.dumps([filtros, vista, orden, desc, limite], ensure_ascii=False, default=str)
+        if st.session_state.get("reg_pag_estado") != estado_pag:
+            st.session_state["reg_pag_estado"] = estado_pag
+            st.session_state["reg_cursores"] = [None]
+        cursores = st.session_state["reg_cursores"]
+
+        if vista == "Planificaciones":
+            page_df, next_cursor = query_planificaciones(filtros, columnas, orden, desc, limite, cursores[-1])
+        elif vista == "Confirmaciones/Reportes":
+            page_df, next_cursor = query_reportes(filtros, columnas, orden, desc, limite, cursores[-1])
+        else:
+            page_df, next_cursor = query_consolidado(filtros, orden, desc, limite, cursores[-1])
+
+        st.write(f"**{vista}** — página {len(cursores)} · {count_planificaciones(filtros)} planificaciones con estos filtros")
+        st.dataframe(page_df, use_container_width=True, height=380)
+
+        p1, p2, _ = st.columns([1, 1, 6])
+        with p1:
+            if st.button("← Anterior", disabled=len(cursores) == 1, key="reg_prev"):
+                cursores.pop()
+                st.rerun()
+        with p2:
+            if st.button("Siguiente →", disabled=next_cursor is None, key="reg_next"):
+                cursores.append(next_cursor)
+                st.rerun()
 
         st.divider()
-        if not dfp.empty:
-            merged = dfp.merge(dfr, on="id_planificacion", how="left", suffixes=("_plan","_rep"))
-            st.write("**Consolidado**")
-            st.dataframe(merged, use_container_width=True, height=380)
-            st.download_button("Descargar consolidado (CSV)", merged.to_csv(index=False).encode("utf-8"),
-                               file_name="consolidado_piloto.csv", mime="text/csv")
+        # Exportación completa: se genera por chunks solo cuando el usuario la pide
+        st.write("**Exportar**")
+        e1, e2, e3, e4 = st.columns([2, 2, 2, 2])
+        with e1:
+            exp_dataset = st.selectbox("Datos", list(EXPORT_DATASETS), index=2, key="exp_dataset")
+        with e2:
+            exp_formato = st.selectbox("Formato", list(EXPORT_FORMATS), key="exp_formato")
+        with e3:
+            exp_filtrado = st.checkbox("Aplicar filtros actuales", value=False, key="exp_filtrado")
+        with e4:
+            generar = st.button("Generar exportación", key="exp_generar")
+        exp_filtros = filtros if exp_filtrado else None
+        usar_snapshot = (
+            exp_dataset == "consolidado" and snapshot_disponible() and snapshot_filtrable(exp_filtros)
+            and st.checkbox("Servir desde el snapshot columnar (se actualiza solo con lo nuevo)", value=True, key="exp_snapshot")
+        )
+
+        if generar:
+            try:
+                with st.spinner("Generando exportación..."):
+                    if usar_snapshot:
+                        archivo, nombre, mime, n_filas = export_snapshot(exp_formato, exp_filtros, refrescar=True)
+                    else:
+                        archivo, nombre, mime, n_filas = export_dataset(exp_dataset, exp_formato, exp_filtros)
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                with archivo:
+                    st.download_button(f"Descargar {nombre} ({n_filas} filas)", archivo.read(), file_name=nombre, mime=mime)
 
         st.caption("Nota: SQLite se crea automáticamente al ejecutar. En Streamlit Cloud puede ser efímero; use exportación CSV para respaldo del piloto.")
 
+    # ---------------- TAB 4 ----------------
+    with tab4, profile_phase("tab4"):
+        st.subheader("4) Tablero de cumplimiento (planificado vs. ejecutado)")
+
+        t1, t2 = st.columns(2)
+        with t1:
+            tb_dep = st.selectbox("Dependencia", ["(Todas)"] + DEPENDENCIAS, key="tab_dependencia")
+        with t2:
+            tb_anio = st.selectbox("Año", ["(Todos)"] + list(range(date.today().year + 1, 2019, -1)), key="tab_anio")
+
+        agg = fetch_cumplimiento(
+            None if tb_dep == "(Todas)" else tb_dep,
+            None if tb_anio == "(Todos)" else int(tb_anio),
+        )
+        if agg.empty:
+            st.info("No hay planificaciones para estos filtros.")
+        else:
+            agg["region"] = agg["region"].replace("", "(Sin región)")
+            planificadas = int(agg["planificadas"].sum())
+            con_reporte = int(agg["con_reporte"].sum())
+            m1, m2, m3, m4, m5 = st.columns(5)
+            m1.metric("Planificadas", planificadas)
+            m2.metric("Con reporte", con_reporte, f"{100 * con_reporte / planificadas:.0f}%")
+            m3.metric("Sí", int(agg["ejecutadas_si"].sum()))
+            m4.metric("Parcial", int(agg["ejecutadas_parcial"].sum()))
+            m5.metric("No", int(agg["ejecutadas_no"].sum()))
+
+            dim = st.radio("Agrupar por", ["region", "nombre_instrumento", "periodo_planificado", "dependencia"],
+                           horizontal=True, key="tab_dim")
+            cols = ["planificadas", "con_reporte", "ejecutadas_si", "ejecutadas_parcial", "ejecutadas_no"]
+            resumen_dim = agg.groupby(dim, dropna=False)[cols].sum().sort_values("planificadas", ascending=False)
+            resumen_dim["pendientes"] = resumen_dim["planificadas"] - resumen_dim["con_reporte"]
+            st.bar_chart(resumen_dim[["ejecutadas_si", "ejecutadas_parcial", "ejecutadas_no", "pendientes"]])
+            st.dataframe(resumen_dim, use_container_width=True)
+
+        st.divider()
+        st.write("**Vencimientos (planificaciones sin reporte según el fin de su periodo)**")
+        venc_dias = st.selectbox("Próximas: días hacia adelante", [7, 15, 30, 60, 90], index=2, key="venc_dias")
+        resumen_venc = resumen_vencimientos(dias=venc_dias)
+        if tb_dep != "(Todas)":
+            resumen_venc = resumen_venc[resumen_venc["dependencia"] == tb_dep]
+        st.dataframe(resumen_venc, use_container_width=True, hide_index=True)
+
+        venc_estado = st.radio("Listar", ["Vencidas", "Próximas"], horizontal=True, key="venc_estado")
+        venc = query_vencimientos(
+            "vencidas" if venc_estado == "Vencidas" else "proximas",
+            None if tb_dep == "(Todas)" else tb_dep,
+            dias=venc_dias,
+        )
+        if venc.empty:
+            st.info("No hay planificaciones en esta condición.")
+        else:
+            st.dataframe(venc, use_container_width=True, height=320)
+
 if __name__ == "__main__":
     main()
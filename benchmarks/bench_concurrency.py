@@ -0,0 +1,301 @@
+# benchmarks/bench_concurrency.py
+"""
+Prueba de carga concurrente de la capa de datos: simula muchas sesiones de
+Streamlit que envían formularios y navegan (tab 2 / tab 3) al mismo tiempo.
+
+Uso (desde la raíz del repo, donde está divisiones_chile_utf8sig.csv):
+    python -m benchmarks.bench_concurrency --procesos 4 --hilos 8 --duracion 20
+    python -m benchmarks.bench_concurrency --journal-modes wal,delete --conexiones pool,unica \\
+        --escrituras directo,journal --busy-timeout-ms 5000,100 --out concurrencia.json
+
+Cada combinación (journal_mode de SQLite x conexión x ruta de escritura x
+busy_timeout x caché) corre contra una base temporal nueva con `--semilla` planificaciones.
+M procesos x N hilos eligen operaciones según `--mezcla` durante `--duracion`
+segundos. Por combinación y operación se reporta throughput, p50/p95/p99 (ms),
+errores de lock ("database is locked" / busy) y otros errores, en JSON, más una
+tabla comparativa por stderr.
+
+    conexión   pool = un pool por proceso con tantas conexiones como hilos; unica = 1 conexión por proceso
+    escritura  directo = insert_* en el hilo de la sesión; journal = submit_* (cola + worker)
+    caché      0 = toda lectura va a la base; 1 = caché de consultas por proceso (rrd.cache)
+"""
+import argparse
+import concurrent.futures as cf
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple
+
+from rrd import cola, config, db, utilidades
+
+from .bench_data_layer import (
+    _percentile, _tab2_render, _tab3_pagina, generate_synthetic, synthetic_context, synthetic_plan,
+    synthetic_reporte, use_db,
+)
+
+OPERACIONES = ("plan", "reporte", "tab2", "tab3")
+ESCRITURAS_OPS = ("plan", "reporte")
+CONEXIONES = ("pool", "unica")
+ESCRITURAS = ("directo", "journal")
+MEZCLA_DEFAULT = "plan:2,reporte:2,tab2:3,tab3:3"
+MAX_EJEMPLOS_ERROR = 5
+MAX_IDS_REPORTE = 5000                 # planificaciones semilla que pueden recibir reportes
+
+class Escenario(NamedTuple):
+    journal_mode: str
+    conexion: str
+    escritura: str
+    busy_timeout_ms: int
+    cache: bool = False
+
+    @property
+    def nombre(self) -> str:
+        base = f"{self.journal_mode}/{self.conexion}/{self.escritura}/{self.busy_timeout_ms}ms"
+        return base + "/cache" if self.cache else base
+
+def _es_lock(e: Exception) -> bool:
+    msg = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+def _configurar(esc: Escenario, db_path: str, journal_dir: str, hilos: int):
+    """Aplica el escenario a rrd.config en el proceso actual (pool nuevo)."""
+    config.DB_PATH = db_path
+    config.DB_BUSY_TIMEOUT_MS = esc.busy_timeout_ms
+    config.SQLITE_PRAGMAS = {**config.SQLITE_PRAGMAS, "journal_mode": esc.journal_mode.upper(),
+                             "busy_timeout": esc.busy_timeout_ms}
+    config.DB_POOL_SIZE = hilos if esc.conexion == "pool" else 1
+    config.JOURNAL_ENABLED = esc.escritura == "journal"
+    config.JOURNAL_DIR = journal_dir
+    config.QUERY_CACHE_ENABLED = esc.cache
+    db.get_pool.clear()
+    cola.get_journal.clear()
+
+def _mezcla(texto: str) -> Dict[str, float]:
+    pesos = {}
+    for parte in texto.split(","):
+        op, _, peso = parte.partition(":")
+        if op.strip() not in OPERACIONES:
+            raise ValueError(f"operación desconocida en --mezcla: {op} (use {', '.join(OPERACIONES)})")
+        pesos[op.strip()] = float(peso or 1)
+    return pesos
+
+# =========================================================
+# PROCESO DE CARGA (corre en cada proceso hijo)
+# =========================================================
+def _proceso(n_proc: int, esc: Escenario, db_path: str, journal_dir: str, hilos: int, duracion: float,
+             mezcla: Dict[str, float], plan_ids: List[str], t_inicio: float, seed: int) -> Dict:
+    _configurar(esc, db_path, journal_dir, hilos)
+    catalogo, territorios = synthetic_context()
+    years = [date.today().year]
+    contador = itertools.count(n_proc * 10_000_000)
+    ops, pesos = zip(*mezcla.items())
+
+    def plan(rnd):
+        i = next(contador)
+        cola.submit_planificacion(synthetic_plan(rnd, i, utilidades.make_id("PLA"), catalogo, territorios, years))
+
+    def reporte(rnd):
+        i = next(contador)
+        id_plan = rnd.choice(plan_ids)
+        cola.submit_reportes([synthetic_reporte(rnd, i, id_plan, str(date.today()), utilidades.make_id("REP"))])
+
+    fns = {"plan": plan, "reporte": reporte, "tab2": lambda rnd: _tab2_render(), "tab3": lambda rnd: _tab3_pagina()}
+    resultados = []
+
+    def hilo(k: int):
+        rnd = random.Random(seed * 1_000_003 + n_proc * 1000 + k)
+        res = {op: {"lat": [], "lock": 0, "error": 0, "ejemplos": []} for op in ops}
+        fin = t_inicio + duracion
+        while time.time() < fin:
+            op = rnd.choices(ops, pesos)[0]
+            t0 = time.perf_counter()
+            try:
+                fns[op](rnd)
+            except Exception as e:
+                r = res[op]
+                r["lock" if _es_lock(e) else "error"] += 1
+                msg = f"{type(e).__name__}: {e}"
+                if len(r["ejemplos"]) < MAX_EJEMPLOS_ERROR and msg not in r["ejemplos"]:
+                    r["ejemplos"].append(msg)
+                continue
+            res[op]["lat"].append((time.perf_counter() - t0) * 1000)
+        resultados.append(res)
+
+    time.sleep(max(0.0, t_inicio - time.time()))        # todos los procesos parten juntos
+    threads = [threading.Thread(target=hilo, args=(k,)) for k in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    drenado_s = None
+    if esc.escritura == "journal":
+        t0 = time.perf_counter()
+        cola.get_journal().stop()                     # aplica lo que quedó en la cola
+        drenado_s = time.perf_counter() - t0
+    db.get_pool().close_all()
+
+    total = {op: {"lat": [], "lock": 0, "error": 0, "ejemplos": []} for op in ops}
+    for res in resultados:
+        for op, r in res.items():
+            total[op]["lat"] += r["lat"]
+            total[op]["lock"] += r["lock"]
+            total[op]["error"] += r["error"]
+            total[op]["ejemplos"] += [m for m in r["ejemplos"] if m not in total[op]["ejemplos"]]
+    return {"ops": total, "drenado_s": drenado_s}
+
+# =========================================================
+# ORQUESTACIÓN
+# =========================================================
+def _resumen_op(lat: List[float], lock: int, error: int, duracion: float) -> Dict:
+    intentos = len(lat) + lock + error
+    return {
+        "ok": len(lat),
+        "ops_s": round(len(lat) / duracion, 1),
+        "p50_ms": round(_percentile(lat, 50), 3) if lat else None,
+        "p95_ms": round(_percentile(lat, 95), 3) if lat else None,
+        "p99_ms": round(_percentile(lat, 99), 3) if lat else None,
+        "max_ms": round(max(lat), 3) if lat else None,
+        "errores_lock": lock,
+        "tasa_lock": round(lock / intentos, 4) if intentos else 0.0,
+        "otros_errores": error,
+    }
+
+def _contar(tabla: str) -> int:
+    with db.get_conn() as conn:
+        return conn.execute(f"SELECT COUNT(1) FROM {tabla}").fetchone()[0]
+
+def correr_escenario(esc: Escenario, procesos: int, hilos: int, duracion: float, mezcla: Dict[str, float],
+                     semilla: int, seed: int, tmp: str) -> Dict:
+    base = os.path.join(tmp, esc.nombre.replace("/", "_"))
+    os.makedirs(base, exist_ok=True)
+    db_path, journal_dir = os.path.join(base, "carga.db"), os.path.join(base, "journal")
+
+    _configurar(esc, db_path, journal_dir, hilos)
+    use_db(db_path)
+    generate_synthetic(semilla, seed=seed)
+    with db.get_conn() as conn:
+        plan_ids = [r[0] for r in conn.execute(
+            "SELECT id_planificacion FROM planificaciones LIMIT ?", (MAX_IDS_REPORTE,)).fetchall()]
+    antes = {"planificaciones": _contar("planificaciones"), "reportes": _contar("reportes")}
+    db.get_pool().close_all()
+
+    t_inicio = time.time() + 1.0 + 0.2 * procesos          # margen para que los procesos arranquen
+    ctx = multiprocessing.get_context("spawn")
+    with cf.ProcessPoolExecutor(max_workers=procesos, mp_context=ctx) as pool:
+        futs = [pool.submit(_proceso, n, esc, db_path, journal_dir, hilos, duracion, mezcla, plan_ids, t_inicio, seed)
+                for n in range(procesos)]
+        partes = [f.result() for f in futs]
+
+    ops = {}
+    for op in mezcla:
+        lat = [x for p in partes for x in p["ops"][op]["lat"]]
+        lock = sum(p["ops"][op]["lock"] for p in partes)
+        error = sum(p["ops"][op]["error"] for p in partes)
+        ops[op] = _resumen_op(lat, lock, error, duracion)
+        ops[op]["ejemplos_error"] = sorted({e for p in partes for e in p["ops"][op]["ejemplos"]})[:MAX_EJEMPLOS_ERROR]
+    escrituras = [op for op in ops if op in ESCRITURAS_OPS]
+    lat_esc = [x for p in partes for op in escrituras for x in p["ops"][op]["lat"]]
+
+    # Integridad: cada escritura confirmada al usuario debe estar en la base
+    _configurar(esc, db_path, journal_dir, 1)
+    esperado = {"planificaciones": ops.get("plan", {}).get("ok", 0), "reportes": ops.get("reporte", {}).get("ok", 0)}
+    faltantes = {t: antes[t] + esperado[t] - _contar(t) for t in esperado}
+    rechazados = os.path.join(journal_dir, "rechazados.jsonl")
+    db.get_pool().close_all()
+
+    return {
+        "escenario": esc._asdict(),
+        "nombre": esc.nombre,
+        "total_ops_s": round(sum(o["ok"] for o in ops.values()) / duracion, 1),
+        "escrituras": _resumen_op(
+            lat_esc, sum(ops[o]["errores_lock"] for o in escrituras), sum(ops[o]["otros_errores"] for o in escrituras),
+            duracion,
+        ),
+        "operaciones": ops,
+        "journal_drenado_s": max((p["drenado_s"] for p in partes if p["drenado_s"] is not None), default=None),
+        "journal_rechazados": sum(1 for _ in open(rechazados, encoding="utf-8")) if os.path.exists(rechazados) else 0,
+        "filas_faltantes": faltantes,
+    }
+
+def run(escenarios: List[Escenario], procesos: int, hilos: int, duracion: float, mezcla: Dict[str, float],
+        semilla: int, seed: int, tmp: str) -> Dict:
+    resultados = []
+    for esc in escenarios:
+        r = correr_escenario(esc, procesos, hilos, duracion, mezcla, semilla, seed, tmp)
+        e = r["escrituras"]
+        print(f"{esc.nombre:<32} {r['total_ops_s']:>9} ops/s | escrituras p50={e['p50_ms']} p95={e['p95_ms']} "
+              f"p99={e['p99_ms']} ms lock={e['tasa_lock']:.2%} otros={e['otros_errores']} "
+              f"faltantes={sum(r['filas_faltantes'].values())}", file=sys.stderr)
+        resultados.append(r)
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpus": os.cpu_count(),
+            "procesos": procesos,
+            "hilos": hilos,
+            "duracion_s": duracion,
+            "mezcla": mezcla,
+            "semilla": semilla,
+            "seed": seed,
+        },
+        "resultados": resultados,
+    }
+
+def _lista(texto: str) -> List[str]:
+    return [s.strip() for s in texto.split(",") if s.strip()]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--procesos", type=int, default=4, help="procesos (réplicas de la app)")
+    ap.add_argument("--hilos", type=int, default=8, help="hilos por proceso (sesiones simultáneas)")
+    ap.add_argument("--duracion", type=float, default=15.0, help="segundos de carga por escenario")
+    ap.add_argument("--mezcla", default=MEZCLA_DEFAULT, help=f"op:peso separados por coma ({', '.join(OPERACIONES)})")
+    ap.add_argument("--semilla", type=int, default=5000, help="planificaciones precargadas por escenario")
+    ap.add_argument("--journal-modes", default="wal", help="journal_mode de SQLite a comparar (wal,delete,truncate)")
+    ap.add_argument("--conexiones", default="pool", help=f"modos de conexión a comparar ({','.join(CONEXIONES)})")
+    ap.add_argument("--escrituras", default="directo", help=f"rutas de escritura a comparar ({','.join(ESCRITURAS)})")
+    ap.add_argument("--busy-timeout-ms", default=str(config.DB_BUSY_TIMEOUT_MS), help="busy_timeout(s) a comparar")
+    ap.add_argument("--cache", default="0", help="caché de consultas a comparar (0,1)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db-dir", default=None, help="carpeta para las bases temporales (por defecto un temporal)")
+    ap.add_argument("--out", default=None, help="archivo JSON de salida (por defecto stdout)")
+    args = ap.parse_args(argv)
+
+    mezcla = _mezcla(args.mezcla)
+    for valor, validos, nombre in ((args.conexiones, CONEXIONES, "--conexiones"),
+                                   (args.escrituras, ESCRITURAS, "--escrituras")):
+        malos = [v for v in _lista(valor) if v not in validos]
+        if malos:
+            ap.error(f"{nombre}: valores no soportados {malos}")
+    escenarios = [
+        Escenario(jm.lower(), cx, es, int(bt), ca == "1")
+        for jm, cx, es, bt, ca in itertools.product(
+            _lista(args.journal_modes), _lista(args.conexiones), _lista(args.escrituras), _lista(args.busy_timeout_ms),
+            _lista(args.cache),
+        )
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(escenarios, args.procesos, args.hilos, args.duracion, mezcla, args.semilla, args.seed,
+                     args.db_dir or tmp)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
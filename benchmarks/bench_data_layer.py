@@ -0,0 +1,269 @@
+# benchmarks/bench_data_layer.py
+"""
+Benchmark de la capa de datos del piloto PAS + generador de datos sintéticos.
+
+Uso (desde la raíz del repo, donde está divisiones_chile_utf8sig.csv):
+    python -m benchmarks.bench_data_layer --scales 1000,100000,1000000 --out bench.json
+    python -m benchmarks.bench_data_layer --generate-only --db rrd_supervision.db --scales 5000
+
+Por escala: genera una base nueva, mide cada escenario `--repeat` veces y
+reporta p50/p95/p99 (ms) y el peak de memoria Python (tracemalloc, MB) como JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from rrd import config, db, divisiones, exportacion, utilidades
+from rrd.catalogo import build_catalogo
+
+EJECUTADO_PESOS = [("Sí", 0.7), ("Parcial", 0.2), ("No", 0.1)]
+MINISTERIOS_SINTETICOS = [m for m in config.MINISTERIOS if m not in ("(Seleccionar)", "Otro (especificar)")]
+
+# =========================================================
+# DATOS SINTÉTICOS
+# =========================================================
+def use_db(path: str):
+    """Apunta la app a `path` (pool nuevo) y aplica migraciones."""
+    config.DB_PATH = path
+    db.get_pool.clear()
+    db.init_db()
+
+def synthetic_context():
+    """(catálogo, territorios) que usan los generadores de filas sintéticas."""
+    div_idx = divisiones.load_divisiones(config.DIVISIONES_PATH)
+    territorios = [(r, p, c) for (r, p), cs in div_idx.comunas.items() for c in cs]
+    return build_catalogo(config.INSTRUMENTOS, "bench"), territorios
+
+def synthetic_plan(rnd: random.Random, i: int, id_plan: str, catalogo, territorios, years: List[int]) -> Dict:
+    """Payload de planificación válido: instrumento y territorio en rotación según `i`."""
+    inst = catalogo.instrumentos[i % len(catalogo.instrumentos)]
+    region, provincia, comuna = territorios[i % len(territorios)]
+    req = inst.requisitos
+    anio = rnd.choice(years)
+    fecha_registro = date(anio, 1, 1) + timedelta(days=rnd.randrange(365))
+    return {
+        "id_planificacion": id_plan,
+        "dependencia": inst.dependencia_owner,
+        "id_instrumento": inst.id_instrumento,
+        "tipo_instrumento": inst.tipo_instrumento,
+        "nombre_instrumento": inst.nombre_instrumento,
+        "ambito": inst.ambito,
+        "region": region if req["region"] else None,
+        "provincia": provincia if req["provincia"] else None,
+        "comuna": comuna if req["comuna"] else None,
+        "entidad_objetivo": rnd.choice(MINISTERIOS_SINTETICOS) if inst.requiere_entidad == 1 else None,
+        "anio": anio,
+        "periodo_planificado": rnd.choice(config.PERIODOS),
+        "tipo_accion": rnd.choice(config.TIPO_ACCION),
+        "responsable_planificacion": f"Responsable {i % 500}",
+        "cargo_responsable_planificacion": None,
+        "email_responsable_planificacion": None,
+        "fecha_registro": str(fecha_registro),
+        "observaciones": None,
+    }
+
+def synthetic_reporte(rnd: random.Random, i: int, id_plan: str, fecha_registro: str, id_reporte: str = None) -> Dict:
+    estados, pesos = zip(*EJECUTADO_PESOS)
+    ejecutado = rnd.choices(estados, pesos)[0]
+    fecha_rep = date.fromisoformat(fecha_registro) + timedelta(days=rnd.randrange(1, 200))
+    return {
+        "id_reporte": id_reporte,
+        "id_planificacion": id_plan,
+        "ejecutado": ejecutado,
+        "fecha_ejecucion": str(fecha_rep - timedelta(days=rnd.randrange(0, 10))),
+        "tipo_evidencia": rnd.choice(config.TIPO_EVIDENCIA),
+        "evidencia_path": None,
+        "responsable_reporte": f"Reportante {i % 300}",
+        "cargo_responsable_reporte": None,
+        "email_responsable_reporte": None,
+        "fecha_reporte": str(fecha_rep),
+        "observaciones": None,
+        "motivo_no_ejecucion": None if ejecutado == "Sí" else "Sintético",
+        "tipo_motivo": None if ejecutado == "Sí" else rnd.choice(config.TIPO_MOTIVO),
+        "reprograma": None if ejecutado == "Sí" else rnd.choice(["Sí", "No"]),
+    }
+
+def generate_synthetic(n_plans: int, report_ratio: float = 0.6, years: List[int] = None,
+                       seed: int = 42, batch_rows: int = 10000) -> Dict:
+    """
+    Llena la base actual (config.DB_PATH) con `n_plans` planificaciones: todos los
+    INSTRUMENTOS en rotación, todas las comunas del CSV de divisiones y varios años.
+    Cada planificación tiene un reporte con probabilidad `report_ratio`.
+    """
+    rnd = random.Random(seed)
+    years = years or [date.today().year - 1, date.today().year, date.today().year + 1]
+    catalogo, territorios = synthetic_context()
+
+    t0 = time.perf_counter()
+    n_rep = 0
+    with db.get_conn() as conn:
+        for start in range(0, n_plans, batch_rows):
+            n = min(batch_rows, n_plans - start)
+            plan_ids = utilidades.make_ids("PLA", n)
+            planes, reportes = [], []
+            for k, id_plan in enumerate(plan_ids):
+                i = start + k
+                plan = synthetic_plan(rnd, i, id_plan, catalogo, territorios, years)
+                planes.append(db._planificacion_params(plan))
+                if rnd.random() < report_ratio:
+                    reportes.append(synthetic_reporte(rnd, i, id_plan, plan["fecha_registro"]))
+            for rep, id_rep in zip(reportes, utilidades.make_ids("REP", len(reportes))):
+                rep["id_reporte"] = id_rep
+            conn.executemany(db.INSERT_PLANIFICACION_SQL, planes)
+            conn.executemany(db.INSERT_REPORTE_SQL, [db._reporte_params(r) for r in reportes])
+            n_rep += len(reportes)
+    return {"planificaciones": n_plans, "reportes": n_rep, "segundos": round(time.perf_counter() - t0, 3)}
+
+# =========================================================
+# ESCENARIOS (equivalentes a lo que hace cada render)
+# =========================================================
+def _tab2_render():
+    view = db.buscar_planificaciones(solo_pendientes=True, limite=50)
+    labels = {r["id_planificacion"]: db.plan_label(r) for r in view.to_dict("records")}
+    return labels
+
+def _tab2_busqueda():
+    return db.buscar_planificaciones("biobio plan", solo_pendientes=True, limite=50)
+
+def _tab3_merge_legacy():
+    dfp = db.fetch_planificaciones()
+    dfr = db.fetch_reportes()
+    return dfp.merge(dfr, on="id_planificacion", how="left", suffixes=("_plan", "_rep"))
+
+def _tab3_pagina():
+    df, _ = db.query_planificaciones(limite=50)
+    db.count_planificaciones()
+    return df
+
+def _export_consolidado():
+    archivo, _, _, n = exportacion.export_dataset("consolidado", "CSV")
+    archivo.close()
+    return n
+
+def _load_divisiones_frio():
+    divisiones.load_divisiones.clear()
+    return divisiones.load_divisiones(config.DIVISIONES_PATH).regiones
+
+SCENARIOS: Dict[str, Callable] = {
+    "fetch_planificaciones": db.fetch_planificaciones,
+    "fetch_reportes": db.fetch_reportes,
+    "tab2_pendientes": lambda: db.fetch_planificaciones_estado(solo_pendientes=True),
+    "tab2_render": _tab2_render,
+    "tab2_busqueda": _tab2_busqueda,
+    "tab3_merge_legacy": _tab3_merge_legacy,
+    "tab3_pagina": _tab3_pagina,
+    "tab3_consolidado_pagina": lambda: db.query_consolidado(limite=50)[0],
+    "tablero": db.fetch_cumplimiento,
+    "export_consolidado_csv": _export_consolidado,
+    "load_divisiones": _load_divisiones_frio,
+}
+
+def _rows(result) -> int:
+    if isinstance(result, int):
+        return result
+    return len(result) if hasattr(result, "__len__") else 0
+
+def _percentile(values: List[float], q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+def bench(fn: Callable, repeat: int) -> Dict:
+    """Una corrida con tracemalloc (peak de memoria) y `repeat` corridas cronometradas sin él."""
+    tracemalloc.start()
+    rows = _rows(fn())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        "rows": rows,
+        "p50_ms": round(_percentile(times, 50), 3),
+        "p95_ms": round(_percentile(times, 95), 3),
+        "p99_ms": round(_percentile(times, 99), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "peak_mb": round(peak / 1024 / 1024, 3),
+    }
+
+def run(scales: List[int], repeat: int, report_ratio: float, seed: int, only: List[str], db_dir: str) -> Dict:
+    results = []
+    for n in scales:
+        db_path = os.path.join(db_dir, f"rrd_supervision_bench_{n}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        use_db(db_path)
+        gen = generate_synthetic(n, report_ratio=report_ratio, seed=seed)
+        print(f"[{n}] datos generados en {gen['segundos']} s", file=sys.stderr)
+
+        scenarios = {}
+        for name, fn in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            scenarios[name] = bench(fn, repeat)
+            print(f"[{n}] {name}: p50={scenarios[name]['p50_ms']} ms", file=sys.stderr)
+        results.append({"scale": n, "generation": gen, "db_bytes": os.path.getsize(db_path), "scenarios": scenarios})
+
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "query_cache": config.QUERY_CACHE_ENABLED,
+            "repeat": repeat,
+            "report_ratio": report_ratio,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", default="1000,100000,1000000", help="planificaciones por escala, separadas por coma")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--report-ratio", type=float, default=0.6)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--only", default="", help=f"escenarios a medir (por defecto todos): {','.join(SCENARIOS)}")
+    ap.add_argument("--db-dir", default=None, help="carpeta para las bases de benchmark (por defecto un temporal)")
+    ap.add_argument("--out", default=None, help="archivo JSON de salida (por defecto stdout)")
+    ap.add_argument("--generate-only", action="store_true", help="solo genera datos en --db (primera escala)")
+    ap.add_argument("--db", default=config.DB_PATH, help="base a llenar con --generate-only")
+    ap.add_argument("--cache", action="store_true", help="medir con el caché de consultas activo (por defecto se mide la consulta)")
+    args = ap.parse_args(argv)
+    config.QUERY_CACHE_ENABLED = args.cache
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    if args.generate_only:
+        use_db(args.db)
+        print(json.dumps(generate_synthetic(scales[0], args.report_ratio, seed=args.seed)))
+        return
+
+    only = [s for s in args.only.split(",") if s.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(scales, args.repeat, args.report_ratio, args.seed, only, args.db_dir or tmp)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_import.py
+"""
+Presupuesto de tiempo de importación del paquete rrd (arranque en frío).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_import --repeat 5 --out import.json
+
+Cada medición corre en un intérprete nuevo (sin módulos en caché), toma la
+mediana de `--repeat` corridas y la compara con IMPORT_BUDGET_MS. Además
+verifica que ningún módulo de rrd cargue streamlit, y que pandas no se cargue
+al importar (solo al consultar). Sale con código 1 si algo se pasa del presupuesto.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+# ms de wall clock por intérprete nuevo, incluido el arranque de Python (~20-40 ms)
+IMPORT_BUDGET_MS = {
+    "rrd.config": 150,
+    "rrd.db": 250,
+    "rrd.exportacion": 250,
+    "rrd.carga": 250,
+    "rrd.snapshot": 250,
+    "rrd.cola": 250,
+    "cli --help": 400,
+}
+MODULOS_PROHIBIDOS = ["streamlit", "pandas", "pyarrow", "openpyxl"]
+
+_SONDA = """
+import sys, time
+t0 = time.perf_counter()
+import {mod}
+dt = (time.perf_counter() - t0) * 1000
+print(dt, ",".join(m for m in {prohibidos!r} if m in sys.modules))
+"""
+
+def _raiz() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def medir_modulo(mod: str, repeat: int) -> Dict:
+    """Tiempo del `import` (dentro del proceso) y de todo el proceso; módulos pesados que quedaron cargados."""
+    import_ms, total_ms, cargados = [], [], set()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", _SONDA.format(mod=mod, prohibidos=MODULOS_PROHIBIDOS)],
+            cwd=_raiz(), capture_output=True, text=True, check=True,
+        ).stdout.split()
+        total_ms.append((time.perf_counter() - t0) * 1000)
+        import_ms.append(float(out[0]))
+        if len(out) > 1:
+            cargados.update(out[1].split(","))
+    return {"import_ms": round(statistics.median(import_ms), 2),
+            "proceso_ms": round(statistics.median(total_ms), 2), "cargados": sorted(cargados)}
+
+def medir_cli(repeat: int) -> Dict:
+    total_ms = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "rrd", "--help"], cwd=_raiz(), capture_output=True, check=True)
+        total_ms.append((time.perf_counter() - t0) * 1000)
+    return {"proceso_ms": round(statistics.median(total_ms), 2), "cargados": []}
+
+def run(repeat: int) -> Dict:
+    resultados, fallas = {}, []
+    for nombre, presupuesto in IMPORT_BUDGET_MS.items():
+        r = medir_cli(repeat) if nombre == "cli --help" else medir_modulo(nombre, repeat)
+        r["presupuesto_ms"] = presupuesto
+        if r["proceso_ms"] > presupuesto:
+            fallas.append(f"{nombre}: {r['proceso_ms']} ms > {presupuesto} ms")
+        if r["cargados"]:
+            fallas.append(f"{nombre} carga {', '.join(r['cargados'])}")
+        resultados[nombre] = r
+        print(f"{nombre}: {r['proceso_ms']} ms (presupuesto {presupuesto} ms)", file=sys.stderr)
+    return {"python": sys.version.split()[0], "repeat": repeat, "resultados": resultados, "fallas": fallas}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", default=None, help="archivo JSON de salida (por defecto stdout)")
+    args = ap.parse_args(argv)
+
+    report = run(args.repeat)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for falla in report["fallas"]:
+        print(f"FALLA {falla}", file=sys.stderr)
+    return 1 if report["fallas"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""
+Capa de datos del piloto PAS, sin Streamlit: la UI (app.py), la API (api.py),
+los benchmarks y la CLI (`python -m rrd`) la importan por módulo.
+
+    config          constantes y variables de entorno
+    db              pool/backends, migraciones, inserciones y consultas
+    catalogo        catálogo de instrumentos cacheado por versión
+    divisiones      índice territorial (CSV de divisiones)
+    cola            journal de envíos y su worker
+    evidencias      archivos de evidencia deduplicados por hash
+    carga           importación masiva CSV/XLSX
+    exportacion     exportaciones por chunks
+    snapshot        snapshot columnar incremental (Arrow IPC)
+    instrumentacion perfiles de tiempos por fase y SQL
+
+No se importa nada aquí: pandas/pyarrow/openpyxl se cargan solo en las
+funciones que los usan, para que el arranque en frío sea corto.
+"""
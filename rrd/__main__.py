@@ -0,0 +1,6 @@
+# rrd/__main__.py
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,119 @@
+# rrd/cache.py
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from . import config
+
+# =========================================================
+# CACHÉ DE CONSULTAS (compartido por todas las sesiones del proceso)
+# =========================================================
+# Cada tabla tiene un contador de generación que suben las funciones que
+# escriben (invalidar). Un resultado sirve mientras no venza su TTL y las
+# generaciones de las tablas de las que depende no hayan cambiado. Las
+# escrituras de OTROS procesos (réplicas, CLI, journal de otro proceso) se
+# detectan por el último seq de `cambios`, leído a lo más cada QUERY_CACHE_SYNC_S.
+def _copia(v):
+    """Copia superficial de DataFrame/Series: quien llama puede agregar columnas sin tocar el caché."""
+    if isinstance(v, tuple):
+        return tuple(_copia(x) for x in v)
+    return v.copy(deep=False) if hasattr(v, "iloc") else v
+
+class CacheConsultas:
+    """LRU (config.QUERY_CACHE_MAX_ENTRIES) con TTL (config.QUERY_CACHE_TTL_S) y generaciones por tabla."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Tuple, Tuple[Any, Tuple[int, ...], float]]" = OrderedDict()
+        self._generaciones: Dict[str, int] = {}
+        self._seq_externo = None
+        self._sync_en = 0.0
+        self.aciertos = self.fallos = self.expulsiones = 0
+
+    def invalidar(self, *tablas: str):
+        with self._lock:
+            for t in tablas:
+                self._generaciones[t] = self._generaciones.get(t, 0) + 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def _sincronizar(self):
+        """Sube todas las generaciones si otro proceso escribió (cambió el último seq de `cambios`)."""
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._sync_en < config.QUERY_CACHE_SYNC_S:
+                return
+            self._sync_en = ahora
+        from .cambios import ultimo_cambio           # cambios importa db, que importa este módulo
+        from .db import CAMBIOS_TABLAS, get_pool
+        try:
+            seq = ultimo_cambio()
+        except get_pool().error_base:
+            return                                    # base sin migrar todavía
+        with self._lock:
+            if self._seq_externo is not None and seq != self._seq_externo:
+                for t in CAMBIOS_TABLAS:
+                    self._generaciones[t] = self._generaciones.get(t, 0) + 1
+            self._seq_externo = seq
+
+    def _generacion(self, tablas: Tuple[str, ...]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generaciones.get(t, 0) for t in tablas)
+
+    def obtener(self, fn, tablas: Tuple[str, ...], args: tuple, kwargs: dict):
+        clave = (fn.__module__, fn.__qualname__, json.dumps([args, kwargs], sort_keys=True, default=str))
+        self._sincronizar()
+        gen = self._generacion(tablas)                # ANTES de consultar: una escritura concurrente invalida
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[1] == gen and ahora - entrada[2] < config.QUERY_CACHE_TTL_S:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return _copia(entrada[0])
+            self.fallos += 1
+        valor = fn(*args, **kwargs)
+        with self._lock:
+            self._entradas[clave] = (valor, gen, ahora)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > config.QUERY_CACHE_MAX_ENTRIES:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+        return _copia(valor)
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entradas": len(self._entradas), "aciertos": self.aciertos, "fallos": self.fallos,
+                    "expulsiones": self.expulsiones}
+
+_CACHE = CacheConsultas()
+
+def consulta_cacheada(*tablas: str):
+    """
+    Memoriza el resultado por (función, argumentos) mientras `tablas` no reciban
+    escrituras. `.sin_cache` es la función original (benchmarks, exportaciones).
+    """
+    def decorar(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config.QUERY_CACHE_ENABLED:
+                return fn(*args, **kwargs)
+            return _CACHE.obtener(fn, tablas, args, kwargs)
+        wrapper.sin_cache = fn
+        return wrapper
+    return decorar
+
+def invalidar(*tablas: str):
+    """Llamar DESPUÉS del commit de cada escritura sobre `tablas`."""
+    _CACHE.invalidar(*tablas)
+
+def limpiar_cache():
+    _CACHE.limpiar()
+
+def estadisticas_cache() -> Dict[str, int]:
+    return _CACHE.estadisticas()
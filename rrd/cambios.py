@@ -0,0 +1,82 @@
+# rrd/cambios.py
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from .db import CAMBIOS_TABLAS, get_conn
+from .instrumentacion import profiled
+
+# =========================================================
+# REGISTRO DE CAMBIOS (sincronización incremental)
+# =========================================================
+# `cambios` lo llenan triggers de INSERT/UPDATE/DELETE (migración 8) con un seq
+# monótono. Un consumidor guarda el último `cursor` y pide solo lo posterior:
+# O(cambios) en vez de volver a bajar la tabla completa.
+CAMBIOS_LIMITE = 1000
+
+class PaginaCambios(NamedTuple):
+    items: List[Dict]         # {seq, tabla, operacion, clave, registrado_en, fila}
+    cursor: int               # seq del último item (o el `desde` recibido si no hubo cambios)
+    hay_mas: bool
+
+def ultimo_cambio() -> int:
+    """seq más reciente (0 si no hay cambios); sirve de versión de los datos."""
+    with get_conn() as conn:
+        row = conn.execute("SELECT MAX(seq) FROM cambios").fetchone()
+    return int(row[0] or 0)
+
+def _filas_actuales(conn, tabla: str, claves: Iterable[str], chunk: int = 500) -> Dict[str, Dict]:
+    col = CAMBIOS_TABLAS[tabla]
+    claves = sorted(set(claves))
+    filas = {}
+    for i in range(0, len(claves), chunk):
+        parte = claves[i:i + chunk]
+        cur = conn.execute(f"SELECT * FROM {tabla} WHERE {col} IN ({', '.join('?' * len(parte))})", parte)
+        nombres = [d[0] for d in cur.description]
+        for row in cur.fetchall():
+            fila = dict(zip(nombres, row))
+            filas[fila[col]] = fila
+    return filas
+
+@profiled
+def leer_cambios(desde: int = 0, tablas: Optional[List[str]] = None, limite: int = CAMBIOS_LIMITE) -> PaginaCambios:
+    """
+    Cambios con seq > `desde`, en orden. `fila` es el estado ACTUAL de la fila
+    (None si fue eliminada): si una fila cambió varias veces, todas sus entradas
+    traen la última versión y basta con aplicar la más reciente.
+    """
+    tablas = list(tablas or CAMBIOS_TABLAS)
+    desconocidas = [t for t in tablas if t not in CAMBIOS_TABLAS]
+    if desconocidas:
+        raise ValueError(f"tabla sin registro de cambios: {', '.join(desconocidas)}")
+    if desde < 0 or limite < 1:
+        raise ValueError("desde debe ser >= 0 y limite >= 1")
+
+    with get_conn() as conn:
+        cur = conn.execute(f"""
+        SELECT seq, tabla, operacion, clave, registrado_en FROM cambios
+        WHERE seq > ? AND tabla IN ({', '.join('?' * len(tablas))})
+        ORDER BY seq
+        LIMIT ?
+        """, [desde, *tablas, limite + 1])
+        log = cur.fetchall()
+        hay_mas = len(log) > limite
+        log = log[:limite]
+        actuales = {
+            t: _filas_actuales(conn, t, [r[3] for r in log if r[1] == t and r[2] != "D"])
+            for t in {r[1] for r in log}
+        }
+
+    items = [
+        {"seq": int(seq), "tabla": tabla, "operacion": op, "clave": clave, "registrado_en": registrado_en,
+         "fila": None if op == "D" else actuales[tabla].get(clave)}
+        for seq, tabla, op, clave, registrado_en in log
+    ]
+    return PaginaCambios(items, items[-1]["seq"] if items else desde, hay_mas)
+
+def iter_cambios(desde: int = 0, tablas: Optional[List[str]] = None, limite: int = CAMBIOS_LIMITE):
+    """Todas las páginas desde `desde` hasta el final; cada item lleva su seq para retomar."""
+    while True:
+        pagina = leer_cambios(desde, tablas, limite)
+        yield from pagina.items
+        if not pagina.hay_mas:
+            return
+        desde = pagina.cursor
@@ -0,0 +1,247 @@
+# rrd/carga.py
+import csv
+import io
+import time
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .cache import invalidar
+from .catalogo import CatalogoInstrumentos
+from .db import INSERT_PLANIFICACION_SQL, _planificacion_params, get_conn
+from .config import PERIODOS, TIPO_ACCION
+from .divisiones import DivisionesIndex, canonical_territorio, normalizar_nombre, validar_territorio
+from .instrumentacion import profiled
+from .utilidades import make_id
+
+# =========================================================
+# CARGA MASIVA DE PLANIFICACIONES (CSV / XLSX)
+# =========================================================
+BULK_BATCH_ROWS = 1000
+BULK_MAX_ERRORES = 5000                      # tope de filas de error que se reportan
+BULK_IN_CHUNK = 500                          # ids por consulta IN (...) al buscar los que ya existen
+BULK_ALIAS_COLUMNAS = {
+    "ano": "anio",
+    "periodo": "periodo_planificado",
+    "responsable": "responsable_planificacion",
+    "cargo": "cargo_responsable_planificacion",
+    "email": "email_responsable_planificacion",
+    "entidad": "entidad_objetivo",
+    "instrumento": "id_instrumento",
+}
+
+class ResultadoImportacion(NamedTuple):
+    leidas: int
+    insertadas: int
+    errores: List[Dict]           # {"fila", "id_instrumento", "error"}
+    segundos: float
+    confirmado: bool              # False si se hizo rollback (modo todo-o-nada con errores)
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.leidas / self.segundos if self.segundos > 0 else 0.0
+
+def _columna_bulk(nombre, alias: Dict[str, str] = BULK_ALIAS_COLUMNAS) -> str:
+    key = normalizar_nombre(nombre).replace(" ", "_")
+    return alias.get(key, key)
+
+def _celda(v) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    if isinstance(v, (datetime, date)):
+        return v.strftime("%Y-%m-%d")
+    v = str(v).strip()
+    return v or None
+
+def _iter_filas_csv(fileobj, alias: Dict[str, str]):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    muestra = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    cols = [_columna_bulk(h, alias) for h in header]
+    for values in reader:
+        if any(v.strip() for v in values):
+            yield {c: _celda(v) for c, v in zip(cols, values)}
+    text.detach()
+
+def _iter_filas_xlsx(fileobj, alias: Dict[str, str]):
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise RuntimeError("La carga de XLSX requiere openpyxl (pip install openpyxl).") from e
+    wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        cols = [_columna_bulk(h, alias) for h in header]
+        for values in rows:
+            fila = {c: _celda(v) for c, v in zip(cols, values)}
+            if any(v is not None for v in fila.values()):
+                yield fila
+    finally:
+        wb.close()
+
+def iter_filas_archivo(fileobj, nombre_archivo: str, alias: Dict[str, str] = BULK_ALIAS_COLUMNAS):
+    """Filas del archivo como dicts {columna_normalizada: texto | None}, sin cargarlo a un DataFrame."""
+    if nombre_archivo.lower().endswith((".xlsx", ".xlsm")):
+        return _iter_filas_xlsx(fileobj, alias)
+    return _iter_filas_csv(fileobj, alias)
+
+def validar_fila_planificacion(fila: Dict, catalogo: CatalogoInstrumentos,
+                               div_idx: DivisionesIndex) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Valida una fila contra el catálogo, los requisitos territoriales del
+    instrumento y la jerarquía de divisiones. Retorna (payload | None, errores).
+    """
+    errores = []
+    inst = catalogo.por_id.get(fila.get("id_instrumento") or "")
+    if inst is None:
+        return None, [f"Instrumento desconocido: {fila.get('id_instrumento')}"]
+
+    dependencia = fila.get("dependencia") or inst.dependencia_owner
+    if dependencia != inst.dependencia_owner:
+        errores.append(f"El instrumento {inst.id_instrumento} pertenece a {inst.dependencia_owner}, no a {dependencia}.")
+
+    territorio = canonical_territorio(div_idx, fila)
+    req = inst.requisitos
+    errores += validar_territorio(div_idx, territorio, req)
+    # Lo que el ámbito no usa no se guarda (igual que el formulario)
+    if not req["region"]:
+        territorio = {"region": None, "provincia": None, "comuna": None}
+    elif not req["provincia"]:
+        territorio.update(provincia=None, comuna=None)
+    elif not req["comuna"]:
+        territorio["comuna"] = None
+
+    anio = None
+    try:
+        anio = int(float(fila.get("anio") or ""))
+        if not 2020 <= anio <= 2100:
+            errores.append(f"Año fuera de rango: {anio}")
+    except (ValueError, OverflowError):          # OverflowError: anio=inf
+        errores.append(f"Año inválido: {fila.get('anio')}")
+
+    periodo = fila.get("periodo_planificado")
+    if periodo not in PERIODOS:
+        errores.append(f"Periodo inválido: {periodo}")
+    tipo_accion = fila.get("tipo_accion") or TIPO_ACCION[0]
+    if tipo_accion not in TIPO_ACCION:
+        errores.append(f"Tipo aplicación inválido: {tipo_accion}")
+    if not fila.get("responsable_planificacion"):
+        errores.append("Debes indicar el responsable de planificación.")
+    if inst.requiere_entidad == 1 and not fila.get("entidad_objetivo"):
+        errores.append("Este instrumento exige una entidad objetivo (p. ej., Ministerio).")
+
+    fecha_registro = fila.get("fecha_registro") or str(date.today())
+    try:
+        date.fromisoformat(fecha_registro[:10])
+    except ValueError:
+        errores.append(f"Fecha registro inválida (use AAAA-MM-DD): {fecha_registro}")
+
+    if errores:
+        return None, errores
+    return {
+        "id_planificacion": fila.get("id_planificacion"),
+        "dependencia": dependencia,
+        "id_instrumento": inst.id_instrumento,
+        "tipo_instrumento": inst.tipo_instrumento,
+        "nombre_instrumento": inst.nombre_instrumento,
+        "ambito": inst.ambito,
+        "region": territorio["region"],
+        "provincia": territorio["provincia"],
+        "comuna": territorio["comuna"],
+        "entidad_objetivo": fila.get("entidad_objetivo") if inst.requiere_entidad == 1 else None,
+        "anio": anio,
+        "periodo_planificado": periodo,
+        "tipo_accion": tipo_accion,
+        "responsable_planificacion": fila.get("responsable_planificacion"),
+        "cargo_responsable_planificacion": fila.get("cargo_responsable_planificacion"),
+        "email_responsable_planificacion": fila.get("email_responsable_planificacion"),
+        "fecha_registro": fecha_registro[:10],
+        "observaciones": fila.get("observaciones"),
+    }, []
+
+def _ids_existentes(cur, ids: List[str]) -> set:
+    """Los `ids` que ya están en planificaciones (consultas IN de a BULK_IN_CHUNK)."""
+    existentes = set()
+    for i in range(0, len(ids), BULK_IN_CHUNK):
+        chunk = ids[i:i + BULK_IN_CHUNK]
+        cur.execute(
+            f"SELECT id_planificacion FROM planificaciones WHERE id_planificacion IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        existentes.update(r[0] for r in cur.fetchall())
+    return existentes
+
+def _escribir_lote(cur, batch: List[Tuple[int, Dict, Tuple]], errores: List[Dict]) -> int:
+    """executemany de las filas cuyo id no existe aún en la base; las demás quedan como error de fila."""
+    existentes = _ids_existentes(cur, [fila["id_planificacion"] for _, fila, _ in batch])
+    rows = []
+    for n_fila, fila, params in batch:
+        if fila["id_planificacion"] in existentes:
+            if len(errores) < BULK_MAX_ERRORES:
+                errores.append({"fila": n_fila, "id_instrumento": fila["id_instrumento"],
+                                "error": f"ID ya existe en la base: {fila['id_planificacion']}"})
+        else:
+            rows.append(params)
+    if rows:
+        cur.executemany(INSERT_PLANIFICACION_SQL, rows)
+    return len(rows)
+
+@profiled
+def importar_planificaciones(filas, catalogo: CatalogoInstrumentos, div_idx: DivisionesIndex,
+                             todo_o_nada: bool = True, batch_rows: int = BULK_BATCH_ROWS) -> ResultadoImportacion:
+    """
+    Valida y escribe `filas` (iterable de dicts) en lotes executemany dentro de
+    UNA transacción. Con todo_o_nada=True cualquier error deshace la carga completa.
+    Las filas sin id_planificacion reciben uno generado por la app; las que traen
+    uno repetido en el archivo o ya existente en la base quedan como error de fila.
+    """
+    t0 = time.perf_counter()
+    errores: List[Dict] = []
+    leidas = insertadas = 0
+    ids_vistos = set()
+    batch: List[Tuple[int, Dict, Tuple]] = []            # (fila, payload, params)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for n_fila, fila in enumerate(filas, start=2):          # fila 1 = encabezado
+            leidas += 1
+            payload, errs = validar_fila_planificacion(fila, catalogo, div_idx)
+            if payload is not None:
+                payload["id_planificacion"] = payload["id_planificacion"] or make_id("PLA")
+                if payload["id_planificacion"] in ids_vistos:
+                    errs = [f"ID repetido en el archivo: {payload['id_planificacion']}"]
+            if errs:
+                if len(errores) < BULK_MAX_ERRORES:
+                    errores += [{"fila": n_fila, "id_instrumento": fila.get("id_instrumento"), "error": e} for e in errs]
+                continue
+
+            ids_vistos.add(payload["id_planificacion"])
+            batch.append((n_fila, payload, _planificacion_params(payload)))
+            if len(batch) >= batch_rows:
+                insertadas += _escribir_lote(cur, batch, errores)
+                batch = []
+
+        if batch:
+            insertadas += _escribir_lote(cur, batch, errores)
+        errores.sort(key=lambda e: e["fila"])           # los de "ya existe" se detectan al escribir cada lote
+
+        confirmado = not (todo_o_nada and errores)
+        if not confirmado:
+            conn.rollback()
+            insertadas = 0
+    if insertadas:
+        invalidar("planificaciones")
+
+    return ResultadoImportacion(leidas, insertadas, errores, time.perf_counter() - t0, confirmado)
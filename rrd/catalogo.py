@@ -0,0 +1,80 @@
+# rrd/catalogo.py
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .db import catalogo_hash, get_conn
+from .divisiones import territorial_requirements
+from .instrumentacion import profiled
+from .utilidades import recurso
+
+# =========================================================
+# CATÁLOGO EN MEMORIA (índices por dependencia / tipo / id)
+# =========================================================
+class Instrumento(NamedTuple):
+    id_instrumento: str
+    tipo_instrumento: str
+    nombre_instrumento: str
+    ambito: str
+    requiere_entidad: int
+    tipo_entidad: Optional[str]
+    marco_normativo: Optional[str]
+    dependencia_owner: str
+    requisitos: Mapping[str, bool]          # territorial_requirements(ambito), precalculado
+
+class CatalogoInstrumentos(NamedTuple):
+    version: str
+    instrumentos: Tuple[Instrumento, ...]
+    por_id: Mapping[str, Instrumento]
+    por_dependencia: Mapping[str, Tuple[Instrumento, ...]]
+    por_dependencia_tipo: Mapping[Tuple[str, str], Tuple[Instrumento, ...]]
+    tipos_por_dependencia: Mapping[str, Tuple[str, ...]]
+
+    def tipos(self, dependencia: str) -> List[str]:
+        return list(self.tipos_por_dependencia.get(dependencia, ()))
+
+    def de_tipo(self, dependencia: str, tipo: str) -> List[Instrumento]:
+        return list(self.por_dependencia_tipo.get((dependencia, tipo), ()))
+
+def build_catalogo(rows, version: str) -> CatalogoInstrumentos:
+    """rows: tuplas de 8 campos (mismo orden que INSTRUMENTOS), ya ordenadas para mostrar."""
+    insts = tuple(
+        Instrumento(*r[:4], int(r[4] or 0), *r[5:8], MappingProxyType(territorial_requirements(r[3])))
+        for r in rows
+    )
+    por_dep: Dict[str, List[Instrumento]] = {}
+    por_dep_tipo: Dict[Tuple[str, str], List[Instrumento]] = {}
+    for inst in insts:
+        por_dep.setdefault(inst.dependencia_owner, []).append(inst)
+        por_dep_tipo.setdefault((inst.dependencia_owner, inst.tipo_instrumento), []).append(inst)
+    return CatalogoInstrumentos(
+        version=version,
+        instrumentos=insts,
+        por_id=MappingProxyType({i.id_instrumento: i for i in insts}),
+        por_dependencia=MappingProxyType({k: tuple(v) for k, v in por_dep.items()}),
+        por_dependencia_tipo=MappingProxyType({k: tuple(v) for k, v in por_dep_tipo.items()}),
+        tipos_por_dependencia=MappingProxyType({
+            k: tuple(sorted({i.tipo_instrumento for i in v})) for k, v in por_dep.items()
+        }),
+    )
+
+@recurso(maxsize=2)
+@profiled
+def _load_catalogo(version: str) -> CatalogoInstrumentos:
+    with get_conn() as conn:
+        rows = conn.execute("""
+        SELECT id_instrumento, tipo_instrumento, nombre_instrumento, ambito, requiere_entidad,
+               tipo_entidad, marco_normativo, dependencia_owner
+        FROM instrumentos
+        ORDER BY dependencia_owner, tipo_instrumento, ambito, nombre_instrumento
+        """).fetchall()
+    return build_catalogo(rows, version)
+
+def get_catalogo() -> CatalogoInstrumentos:
+    """
+    Catálogo cacheado por versión (hash de INSTRUMENTOS, el mismo que usa
+    sync_catalogo): solo se vuelve a leer de SQLite cuando el catálogo cambia.
+    """
+    return _load_catalogo(catalogo_hash())
+
+def invalidate_catalogo():
+    _load_catalogo.clear()
@@ -0,0 +1,168 @@
+# rrd/cli.py
+"""
+CLI de mantenimiento de la capa de datos (sin Streamlit).
+
+    python -m rrd migrate
+    python -m rrd importar planificaciones.csv [--parcial]
+    python -m rrd exportar consolidado --formato "CSV (gzip)" --out consolidado.csv.gz --anio 2025
+    python -m rrd snapshot [--completo]
+    python -m rrd cambios --desde 1520 [--tabla reportes] > cambios.ndjson
+    python -m rrd ingestar evidencias.zip [--manifiesto m.csv] [--responsable "Nombre"] [--workers 8]
+
+La base se elige igual que en la app (RRD_DB_BACKEND / RRD_DATABASE_URL) o con --db.
+Cada comando importa solo los módulos que usa; `--help` no carga pandas.
+"""
+import argparse
+import json
+import shutil
+import sys
+
+from . import config
+
+FILTROS_CLI = ["dependencia", "anio", "periodo_planificado", "region", "provincia", "comuna", "ejecutado"]
+EXPORT_FORMATOS_CLI = ["CSV", "CSV (gzip)", "Parquet"]      # = EXPORT_FORMATS, sin importar exportacion
+
+# =========================================================
+# COMANDOS
+# =========================================================
+def cmd_migrate(args) -> int:
+    from .db import init_db
+
+    version = init_db()
+    print(f"esquema en versión {version}")
+    return 0
+
+def cmd_importar(args) -> int:
+    from .carga import importar_planificaciones, iter_filas_archivo
+    from .catalogo import get_catalogo
+    from .divisiones import load_divisiones
+
+    with open(args.archivo, "rb") as f:
+        res = importar_planificaciones(
+            iter_filas_archivo(f, args.archivo), get_catalogo(),
+            load_divisiones(config.DIVISIONES_PATH), todo_o_nada=not args.parcial,
+        )
+    for err in res.errores[:args.max_errores]:
+        print(json.dumps(err, ensure_ascii=False), file=sys.stderr)
+    print(f"leídas {res.leidas} · insertadas {res.insertadas} · errores {len(res.errores)} · "
+          f"{res.filas_por_segundo:.0f} filas/s" + ("" if res.confirmado else " · SIN CAMBIOS (rollback)"))
+    return 0 if res.confirmado and not res.errores else 1
+
+def cmd_exportar(args) -> int:
+    from .exportacion import export_dataset
+
+    filtros = {c: getattr(args, c) for c in FILTROS_CLI if getattr(args, c) is not None}
+    archivo, nombre, _, n_filas = export_dataset(args.dataset, args.formato, filtros or None)
+    destino = args.out or nombre
+    with archivo, open(destino, "wb") as out:
+        shutil.copyfileobj(archivo, out)
+    print(f"{n_filas} filas -> {destino}")
+    return 0
+
+def cmd_snapshot(args) -> int:
+    from .snapshot import refresh_snapshot
+
+    meta = refresh_snapshot(completo=args.completo)
+    print(f"snapshot v{meta.version}: {len(meta.particiones)} particiones (cambios hasta seq {meta.seq})")
+    return 0
+
+def cmd_cambios(args) -> int:
+    from .cambios import iter_cambios, leer_cambios
+
+    tablas = [args.tabla] if args.tabla else None
+    if args.limite is None:
+        items = iter_cambios(args.desde, tablas)
+    else:
+        items = leer_cambios(args.desde, tablas, args.limite).items
+    cursor = args.desde
+    for it in items:
+        sys.stdout.write(json.dumps(it, ensure_ascii=False, default=str) + "\n")
+        cursor = it["seq"]
+    print(f"cursor {cursor}", file=sys.stderr)
+    return 0
+
+def cmd_ingestar(args) -> int:
+    from .ingesta import ingestar_evidencias
+
+    res = ingestar_evidencias(
+        args.origen, manifiesto=args.manifiesto, responsable=args.responsable, workers=args.workers,
+        batch_rows=args.lote, miniaturas=not args.sin_miniaturas, progreso=not args.sin_progreso,
+    )
+    for err in res.errores[:args.max_errores]:
+        print(json.dumps(err, ensure_ascii=False), file=sys.stderr)
+    for om in res.omitidas[:args.max_errores]:
+        print(json.dumps(om, ensure_ascii=False), file=sys.stderr)
+    print(f"filas {res.filas} · ya procesadas {res.ya_procesadas} · insertadas {res.insertadas} · "
+          f"omitidas {len(res.omitidas)} · errores {len(res.errores)} · {res.archivos} archivos ({res.bytes / 1024 / 1024:.1f} MB, "
+          f"{res.archivos_por_segundo:.1f}/s)")
+    return 0 if not res.errores else 1
+
+# =========================================================
+# ENTRADA
+# =========================================================
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m rrd", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=None, help=f"ruta SQLite (por defecto {config.DB_PATH})")
+    ap.set_defaults(init_db=True)          # todos salvo migrate parten con el esquema al día
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("migrate", help="aplica migraciones pendientes y sincroniza el catálogo")
+    p.set_defaults(fn=cmd_migrate, init_db=False)
+
+    p = sub.add_parser("importar", help="carga masiva de planificaciones desde CSV/XLSX")
+    p.add_argument("archivo")
+    p.add_argument("--parcial", action="store_true", help="inserta las filas válidas aunque otras fallen")
+    p.add_argument("--max-errores", type=int, default=50, help="errores a mostrar por stderr")
+    p.set_defaults(fn=cmd_importar)
+
+    p = sub.add_parser("exportar", help="exporta un dataset por chunks")
+    p.add_argument("dataset", choices=["planificaciones", "reportes", "consolidado"])
+    p.add_argument("--formato", default="CSV", choices=EXPORT_FORMATOS_CLI)
+    p.add_argument("--out", default=None, help="archivo de salida (por defecto el nombre estándar)")
+    for c in FILTROS_CLI:
+        p.add_argument(f"--{c}", type=int if c == "anio" else str, default=None)
+    p.set_defaults(fn=cmd_exportar)
+
+    p = sub.add_parser("snapshot", help="actualiza el snapshot columnar del consolidado")
+    p.add_argument("--completo", action="store_true", help="reescribe todas las particiones")
+    p.set_defaults(fn=cmd_snapshot)
+
+    p = sub.add_parser("cambios", help="registro de cambios desde un cursor (NDJSON por stdout)")
+    p.add_argument("--desde", type=int, default=0, help="último seq ya aplicado (0 = todo)")
+    p.add_argument("--tabla", default=None, choices=["planificaciones", "reportes"])
+    p.add_argument("--limite", type=int, default=None, help="máximo de cambios (por defecto todos)")
+    p.set_defaults(fn=cmd_cambios)
+
+    p = sub.add_parser("ingestar", help="evidencias + reportes desde un directorio o zip con manifiesto")
+    p.add_argument("origen", help="directorio o .zip; el manifiesto por defecto es manifiesto.csv/.xlsx en su raíz")
+    p.add_argument("--manifiesto", default=None, help="CSV/XLSX: archivo, id_planificacion, ejecutado, fecha_ejecucion, ...")
+    p.add_argument("--responsable", default=None, help="responsable del reporte si la fila no trae uno")
+    p.add_argument("--workers", type=int, default=None, help=f"procesos (por defecto {config.INGESTA_WORKERS})")
+    p.add_argument("--lote", type=int, default=None, help=f"reportes por transacción (por defecto {config.INGESTA_BATCH_ROWS})")
+    p.add_argument("--sin-miniaturas", action="store_true", help="no generar miniaturas de imágenes")
+    p.add_argument("--sin-progreso", action="store_true")
+    p.add_argument("--max-errores", type=int, default=50, help="errores y omitidas a mostrar por stderr")
+    p.set_defaults(fn=cmd_ingestar)
+    return ap
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.db:
+        config.DB_PATH = args.db
+    try:
+        if args.init_db:
+            from .db import init_db
+
+            init_db()
+        return args.fn(args)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    except Exception as e:
+        from .db import get_pool
+
+        if not isinstance(e, get_pool().error_base):     # IntegrityError, base bloqueada, etc. del backend
+            raise
+        print(f"error de base de datos: {e}", file=sys.stderr)
+        return 2
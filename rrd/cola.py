@@ -0,0 +1,286 @@
+# rrd/cola.py
+import atexit
+import collections
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from . import config
+from .config import (
+    JOURNAL_BATCH_ROWS, JOURNAL_FLUSH_INTERVAL_S, JOURNAL_MAX_RETRIES, JOURNAL_RECHAZADOS_MOSTRAR,
+)
+from .db import (
+    INSERT_PLANIFICACION_SQL, INSERT_REPORTE_SQL, DBPool, _planificacion_params, _reporte_params,
+    get_pool, insert_planificacion, insert_reportes,
+)
+from .cache import invalidar
+from .utilidades import recurso
+
+# =========================================================
+# COLA DE ENVÍOS (journal append-only + worker en segundo plano)
+# =========================================================
+# Los formularios agregan una línea JSON al segmento activo (fsync) y vuelven
+# de inmediato; un hilo por proceso vacía los segmentos sellados a SQLite en
+# lotes. Nombres de segmento:
+#   seg-<pid>-<n>.jsonl          activo (solo lo escribe <pid>)
+#   seg-<pid>-<n>.ready          sellado, listo para aplicar
+#   seg-<pid>-<n>.claimed-<pid>  tomado por el worker de ese pid
+JOURNAL_TIPOS = {
+    # tipo: (sql idempotente por PK, armado de parámetros, clave, tabla)
+    "planificacion": (INSERT_PLANIFICACION_SQL.rstrip() + " ON CONFLICT(id_planificacion) DO NOTHING",
+                      _planificacion_params, "id_planificacion", "planificaciones"),
+    "reporte": (INSERT_REPORTE_SQL.rstrip() + " ON CONFLICT(id_reporte) DO NOTHING",
+                _reporte_params, "id_reporte", "reportes"),
+}
+_SEGMENT_RE = re.compile(r"^seg-(\d+)-(\d+)\.(jsonl|ready|claimed-(\d+))$")
+
+def _pid_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class SubmissionJournal:
+    def __init__(self, directory: str, pool: DBPool, flush_interval: float = JOURNAL_FLUSH_INTERVAL_S,
+                 batch_rows: int = JOURNAL_BATCH_ROWS):
+        self.dir = directory
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self.log = logging.getLogger("rrd.journal")
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._seq = 0
+        self._fd: Optional[int] = None
+        self._active: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(self.dir, exist_ok=True)
+
+    # ---- escritura (hilo de Streamlit) ----
+    def append(self, tipo: str, payloads: List[Dict]):
+        """Persiste los envíos en el journal (durable al retornar) y despierta al worker."""
+        clave = JOURNAL_TIPOS[tipo][2]
+        ts = datetime.now().isoformat(timespec="milliseconds")
+        data = "".join(
+            json.dumps({"tipo": tipo, "id": p[clave], "ts": ts, "payload": p}, ensure_ascii=False, default=str) + "\n"
+            for p in payloads
+        ).encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                self._seq += 1
+                self._active = os.path.join(self.dir, f"seg-{os.getpid()}-{self._seq:06d}.jsonl")
+                self._fd = os.open(self._active, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+        self._wake.set()
+
+    def _seal_active(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            os.close(self._fd)
+            os.replace(self._active, self._active[:-len(".jsonl")] + ".ready")
+            self._fd, self._active = None, None
+
+    # ---- worker ----
+    def start(self):
+        self._reclaim_orphans(incluir_propios=True)
+        self._thread = threading.Thread(target=self._run, name="rrd-journal", daemon=True)
+        self._thread.start()
+        self._wake.set()                    # replay inmediato de lo pendiente al arrancar
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        ciclos = 0
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            ciclos += 1
+            try:
+                if ciclos % config.JOURNAL_RECLAIM_EVERY == 0:
+                    self._reclaim_orphans(incluir_propios=False)   # réplicas que murieron con segmentos tomados
+                self.flush()
+            except Exception:
+                self.log.exception("Error vaciando el journal; se reintenta en el próximo ciclo")
+
+    def _reclaim_orphans(self, incluir_propios: bool):
+        """
+        Segmentos activos o tomados por procesos que ya no existen vuelven a quedar listos.
+        Con incluir_propios (al arrancar, sin segmento abierto aún) también los de este mismo
+        pid: son de una ejecución anterior que lo reutilizó (p. ej. PID 1 en un contenedor).
+        """
+        me = os.getpid()
+        for name in os.listdir(self.dir):
+            m = _SEGMENT_RE.match(name)
+            if not m:
+                continue
+            if incluir_propios and int(m.group(1)) == me:
+                self._seq = max(self._seq, int(m.group(2)))   # no reutilizar nombres de la ejecución anterior
+            if m.group(3) == "ready":
+                continue
+            owner = int(m.group(4) or m.group(1))
+            if (owner == me and incluir_propios) or (owner != me and not _pid_vivo(owner)):
+                base = f"seg-{m.group(1)}-{m.group(2)}"
+                try:
+                    os.replace(os.path.join(self.dir, name), os.path.join(self.dir, base + ".ready"))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self) -> int:
+        """Sella el segmento activo y aplica todos los listos (de cualquier proceso). Retorna filas aplicadas."""
+        with self._flush_lock:
+            self._seal_active()
+            n = 0
+            for name in sorted(f for f in os.listdir(self.dir) if f.endswith(".ready")):
+                ready = os.path.join(self.dir, name)
+                claimed = ready[:-len(".ready")] + f".claimed-{os.getpid()}"
+                try:
+                    os.rename(ready, claimed)        # otro proceso pudo tomarlo antes
+                except FileNotFoundError:
+                    continue
+                try:
+                    n += self._apply_segment(claimed)
+                except Exception:
+                    os.replace(claimed, ready)
+                    raise
+                os.remove(claimed)
+            return n
+
+    def _apply_segment(self, path: str) -> int:
+        n = 0
+        batch: List[Dict] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    self._reject({"linea": line.rstrip("\n")}, "línea corrupta")
+                    continue
+                if batch and (item["tipo"] != batch[0]["tipo"] or len(batch) >= self.batch_rows):
+                    n += self._write_batch(batch)
+                    batch = []
+                batch.append(item)
+        if batch:
+            n += self._write_batch(batch)
+        return n
+
+    def _write_batch(self, items: List[Dict]) -> int:
+        sql, params_fn, _, tabla = JOURNAL_TIPOS[items[0]["tipo"]]
+        rows = [params_fn(it["payload"]) for it in items]
+        for intento in range(JOURNAL_MAX_RETRIES):
+            try:
+                with self.pool.connection() as conn:
+                    conn.executemany(sql, rows)
+                invalidar(tabla)
+                return len(rows)
+            except self.pool.error_operacional as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                time.sleep(min(0.05 * 2 ** intento, 2.0))
+            except self.pool.error_base:
+                # Un registro inválido no bloquea al resto: se aplican uno a uno
+                n = self._write_one_by_one(sql, items, rows)
+                invalidar(tabla)
+                return n
+        raise self.pool.error_operacional(f"database is locked (tras {JOURNAL_MAX_RETRIES} intentos)")
+
+    def _write_one_by_one(self, sql: str, items: List[Dict], rows: List[Tuple]) -> int:
+        n = 0
+        for item, row in zip(items, rows):
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute(sql, row)
+                n += 1
+            except self.pool.error_operacional:
+                raise
+            except self.pool.error_base as e:
+                self._reject(item, str(e))
+        return n
+
+    def _reject(self, item: Dict, error: str):
+        self.log.error("Envío rechazado (%s): %s", error, item.get("id"))
+        with open(os.path.join(self.dir, "rechazados.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"error": error, "item": item}, ensure_ascii=False, default=str) + "\n")
+
+    def pendientes(self) -> int:
+        """Envíos aún no aplicados (todas las líneas de segmentos en el directorio)."""
+        n = 0
+        for name in os.listdir(self.dir):
+            if _SEGMENT_RE.match(name):
+                try:
+                    with open(os.path.join(self.dir, name), "rb") as f:
+                        n += sum(1 for _ in f)
+                except FileNotFoundError:
+                    pass
+        return n
+
+    def en_cola(self, tipo: str, campo: str) -> set:
+        """Valores de payload[campo] de los envíos `tipo` aún no aplicados (de cualquier proceso)."""
+        valores = set()
+        for name in os.listdir(self.dir):
+            if not _SEGMENT_RE.match(name):
+                continue
+            try:
+                with open(os.path.join(self.dir, name), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            item = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if item["tipo"] == tipo:
+                            valores.add(item["payload"].get(campo))
+            except FileNotFoundError:
+                pass
+        return valores
+
+    def rechazados(self, limite: int = JOURNAL_RECHAZADOS_MOSTRAR) -> List[Dict]:
+        """Los últimos `limite` envíos rechazados al aplicarlos (más reciente primero)."""
+        try:
+            with open(os.path.join(self.dir, "rechazados.jsonl"), "r", encoding="utf-8") as f:
+                ultimas = collections.deque(f, maxlen=limite)
+        except FileNotFoundError:
+            return []
+        out = []
+        for line in reversed(ultimas):
+            r = json.loads(line)
+            item = r["item"]
+            out.append({"ts": item.get("ts"), "tipo": item.get("tipo"), "id": item.get("id"), "error": r["error"]})
+        return out
+
+@recurso
+def get_journal() -> SubmissionJournal:
+    """Un journal + worker por proceso; al arrancar re-aplica lo que quedó pendiente."""
+    journal = SubmissionJournal(config.JOURNAL_DIR, get_pool())
+    journal.start()
+    atexit.register(journal.stop)
+    return journal
+
+def submit_planificacion(payload: Dict):
+    if config.JOURNAL_ENABLED:
+        get_journal().append("planificacion", [payload])
+    else:
+        insert_planificacion(payload)
+
+def submit_reportes(payloads: List[Dict]):
+    if config.JOURNAL_ENABLED:
+        get_journal().append("reporte", payloads)
+    else:
+        insert_reportes(payloads)
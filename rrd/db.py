@@ -0,0 +1,1210 @@
+# rrd/db.py
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from . import config
+from .config import DB_POOL_SIZE, INSTRUMENTOS
+from .cache import consulta_cacheada, invalidar
+from .instrumentacion import _trace_sql, profiled
+from .utilidades import periodo_rango, recurso
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# =========================================================
+# SQL (SQLite) - MIGRACIONES VERSIONADAS
+# =========================================================
+class SQLitePool:
+    """
+    Pool de conexiones SQLite de larga vida, seguro entre los hilos de Streamlit.
+    Cada conexión se abre una sola vez con los PRAGMA de config.SQLITE_PRAGMAS.
+    """
+    dialecto = "sqlite"
+    error_base = sqlite3.DatabaseError
+    error_operacional = sqlite3.OperationalError
+    error_integridad = sqlite3.IntegrityError
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=config.DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        for pragma, value in config.SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        conn.set_trace_callback(_trace_sql)
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Checkout de una conexión: commit al salir, rollback si hay excepción."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+# ---------------------------------------------------------
+# Adaptador PostgreSQL (opcional: psycopg + psycopg_pool)
+# Misma interfaz que SQLitePool; el SQL de la app se escribe con `?`
+# y el adaptador lo traduce al estilo `%s` de psycopg.
+# ---------------------------------------------------------
+@functools.lru_cache(maxsize=512)
+def _pg_sql(sql: str) -> str:
+    return sql.replace("%", "%%").replace("?", "%s")
+
+class _PgCursor:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql: str, params=()):
+        self._cur.execute(_pg_sql(sql), tuple(params or ()))
+        return self
+
+    def executemany(self, sql: str, seq_params):
+        self._cur.executemany(_pg_sql(sql), [tuple(p) for p in seq_params])
+        return self
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)      # fetchone/fetchmany/fetchall/description/close
+
+class _PgConnection:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, name: Optional[str] = None) -> _PgCursor:
+        """Con `name`: cursor del lado del servidor (las filas llegan de a fetchmany)."""
+        return _PgCursor(self.raw.cursor(name=name) if name else self.raw.cursor())
+
+    def execute(self, sql: str, params=()) -> _PgCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_params) -> _PgCursor:
+        return self.cursor().executemany(sql, seq_params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+class PostgresPool:
+    """Pool psycopg_pool con la interfaz de SQLitePool (connection(), close_all())."""
+    dialecto = "postgres"
+
+    def __init__(self, dsn: str, size: int = DB_POOL_SIZE):
+        try:
+            import psycopg
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError("El backend postgres requiere psycopg (pip install 'psycopg[binary,pool]').") from e
+        if not dsn:
+            raise RuntimeError("Define RRD_DATABASE_URL para usar el backend postgres.")
+        self.error_base = psycopg.DatabaseError
+        self.error_operacional = psycopg.OperationalError
+        self.error_integridad = psycopg.IntegrityError
+        self._pool = ConnectionPool(dsn, min_size=1, max_size=max(1, size), open=True)
+
+    @contextmanager
+    def connection(self):
+        """Checkout de una conexión: commit al salir, rollback si hay excepción."""
+        with self._pool.connection() as raw:
+            yield _PgConnection(raw)
+
+    def close_all(self):
+        self._pool.close()
+
+DBPool = Union[SQLitePool, PostgresPool]          # misma interfaz: connection(), close_all(), error_*
+
+@recurso
+def get_pool() -> DBPool:
+    """Pool del backend configurado en config.DB_BACKEND (SQLitePool o PostgresPool)."""
+    if config.DB_BACKEND == "postgres":
+        return PostgresPool(config.DATABASE_URL, config.DB_POOL_SIZE)
+    if config.DB_BACKEND != "sqlite":
+        raise ValueError(f"DB_BACKEND no soportado: {config.DB_BACKEND}")
+    return SQLitePool(config.DB_PATH, config.DB_POOL_SIZE)
+
+def get_conn():
+    """Uso: `with get_conn() as conn: ...`"""
+    return get_pool().connection()
+
+def dialecto() -> str:
+    return get_pool().dialecto
+
+def read_sql(sql: str, conn, params=None) -> pd.DataFrame:
+    """pd.read_sql_query para ambos backends (psycopg no es un conector soportado por pandas)."""
+    import pandas as pd
+
+    if isinstance(conn, sqlite3.Connection):
+        return pd.read_sql_query(sql, conn, params=params)
+    cur = conn.execute(sql, params or ())
+    return pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+def _table_cols(cur, table_name: str):
+    cur.execute(f"PRAGMA table_info({table_name})")
+    return {row[1] for row in cur.fetchall()}
+
+def _ensure_columns(cur, table: str, expected: dict):
+    existing = _table_cols(cur, table)
+    for col, coltype in expected.items():
+        if col not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}")
+
+# ---------------------------------------------------------
+# Migraciones versionadas: cada paso corre UNA vez por base de datos
+# (registro en schema_version). Agregar pasos nuevos siempre al final.
+# ---------------------------------------------------------
+def _mig_tablas_base(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS instrumentos (
+        id_instrumento TEXT PRIMARY KEY,
+        tipo_instrumento TEXT,
+        nombre_instrumento TEXT,
+        ambito TEXT,
+        requiere_entidad INTEGER,
+        tipo_entidad TEXT,
+        marco_normativo TEXT,
+        dependencia_owner TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS planificaciones (
+        id_planificacion TEXT PRIMARY KEY,
+        dependencia TEXT,
+        id_instrumento TEXT NOT NULL,
+        tipo_instrumento TEXT,
+        nombre_instrumento TEXT,
+        ambito TEXT,
+        region TEXT,
+        provincia TEXT,
+        comuna TEXT,
+        entidad_objetivo TEXT,
+        anio INTEGER,
+        periodo_planificado TEXT,
+        tipo_accion TEXT,
+        responsable_planificacion TEXT,
+        cargo_responsable_planificacion TEXT,
+        email_responsable_planificacion TEXT,
+        fecha_registro TEXT,
+        observaciones TEXT,
+        FOREIGN KEY(id_instrumento) REFERENCES instrumentos(id_instrumento)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS reportes (
+        id_reporte TEXT PRIMARY KEY,
+        id_planificacion TEXT NOT NULL,
+        ejecutado TEXT,
+        fecha_ejecucion TEXT,
+        tipo_evidencia TEXT,
+        evidencia_path TEXT,
+        responsable_reporte TEXT,
+        cargo_responsable_reporte TEXT,
+        email_responsable_reporte TEXT,
+        fecha_reporte TEXT,
+        observaciones TEXT,
+        motivo_no_ejecucion TEXT,
+        tipo_motivo TEXT,
+        reprograma TEXT,
+        FOREIGN KEY(id_planificacion) REFERENCES planificaciones(id_planificacion)
+    )
+    """)
+
+def _mig_columnas_legacy(cur):
+    # Migración defensiva (si vienes de versión vieja)
+    _ensure_columns(cur, "instrumentos", {
+        "id_instrumento": "TEXT",
+        "tipo_instrumento": "TEXT",
+        "nombre_instrumento": "TEXT",
+        "ambito": "TEXT",
+        "requiere_entidad": "INTEGER",
+        "tipo_entidad": "TEXT",
+        "marco_normativo": "TEXT",
+        "dependencia_owner": "TEXT",
+    })
+    _ensure_columns(cur, "planificaciones", {
+        "ambito": "TEXT",
+        "entidad_objetivo": "TEXT",
+    })
+
+def _mig_idx_reportes_planificacion(cur):
+    # Índice para estado de reporte por planificación (cubre COUNT y MAX(fecha_reporte))
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reportes_id_planificacion
+    ON reportes(id_planificacion, fecha_reporte)
+    """)
+
+def _mig_idx_registros(cur):
+    # Filtros de Registros (igualdad) + columna de orden al final para keyset
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_plan_dep_anio_periodo
+    ON planificaciones(dependencia, anio, periodo_planificado, fecha_registro, id_planificacion)
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_plan_territorio
+    ON planificaciones(region, provincia, comuna, fecha_registro, id_planificacion)
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_plan_fecha_registro
+    ON planificaciones(fecha_registro, id_planificacion)
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reportes_fecha_reporte
+    ON reportes(fecha_reporte, id_reporte)
+    """)
+
+def _mig_evidencias(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS evidencias (
+        sha256 TEXT PRIMARY KEY,
+        ruta TEXT NOT NULL,
+        bytes INTEGER,
+        mime TEXT,
+        nombre_original TEXT,
+        referencias INTEGER NOT NULL DEFAULT 0,
+        creado_en TEXT
+    )
+    """)
+
+AGG_KEY = "dependencia, anio, periodo_planificado, region, id_instrumento"
+
+def _agg_key_where(alias: str) -> str:
+    return (
+        f"dependencia = COALESCE({alias}.dependencia, '') AND anio = COALESCE({alias}.anio, 0) "
+        f"AND periodo_planificado = COALESCE({alias}.periodo_planificado, '') "
+        f"AND region = COALESCE({alias}.region, '') AND id_instrumento = {alias}.id_instrumento"
+    )
+
+def rebuild_agg_cumplimiento(cur):
+    """Recalcula agg_cumplimiento completo (backfill / reparación)."""
+    cur.execute("DELETE FROM agg_cumplimiento")
+    cur.execute(f"""
+    INSERT INTO agg_cumplimiento ({AGG_KEY}, planificadas, con_reporte, ejecutadas_si, ejecutadas_no, ejecutadas_parcial)
+    SELECT COALESCE(p.dependencia, ''), COALESCE(p.anio, 0), COALESCE(p.periodo_planificado, ''),
+           COALESCE(p.region, ''), p.id_instrumento,
+           COUNT(1),
+           SUM(EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion)),
+           SUM((SELECT COUNT(1) FROM reportes r WHERE r.id_planificacion = p.id_planificacion AND r.ejecutado = 'Sí')),
+           SUM((SELECT COUNT(1) FROM reportes r WHERE r.id_planificacion = p.id_planificacion AND r.ejecutado = 'No')),
+           SUM((SELECT COUNT(1) FROM reportes r WHERE r.id_planificacion = p.id_planificacion AND r.ejecutado = 'Parcial'))
+    FROM planificaciones p
+    GROUP BY 1, 2, 3, 4, 5
+    """)
+
+# Cada escritura suma o resta el aporte de la fila: un UPDATE es "restar lo viejo + sumar lo
+# nuevo", y eliminar una planificación resta también los conteos de sus reportes (quedan
+# fuera del agregado, igual que en rebuild_agg_cumplimiento).
+AGG_CONTEOS_REPORTE = ("con_reporte", "ejecutadas_si", "ejecutadas_no", "ejecutadas_parcial")
+AGG_COLS_PLANIFICACION = "id_planificacion, dependencia, anio, periodo_planificado, region, id_instrumento"
+
+def _agg_aporte_reportes(alias: str) -> List[str]:
+    """Lo que aportan los reportes de la planificación `alias` a cada columna de AGG_CONTEOS_REPORTE."""
+    r = f"FROM reportes r WHERE r.id_planificacion = {alias}.id_planificacion"
+    return [f"EXISTS (SELECT 1 {r})"] + [
+        f"(SELECT COUNT(1) {r} AND r.ejecutado = '{e}')" for e in ("Sí", "No", "Parcial")
+    ]
+
+def _agg_suma_planificacion(alias: str) -> str:
+    return f"""
+        INSERT INTO agg_cumplimiento ({AGG_KEY}, planificadas, {", ".join(AGG_CONTEOS_REPORTE)})
+        VALUES (COALESCE({alias}.dependencia, ''), COALESCE({alias}.anio, 0), COALESCE({alias}.periodo_planificado, ''),
+                COALESCE({alias}.region, ''), {alias}.id_instrumento, 1, {", ".join(_agg_aporte_reportes(alias))})
+        ON CONFLICT ({AGG_KEY}) DO UPDATE SET
+            planificadas = planificadas + 1,
+            {", ".join(f"{c} = {c} + excluded.{c}" for c in AGG_CONTEOS_REPORTE)};
+    """
+
+def _agg_resta_planificacion(alias: str) -> str:
+    restas = ", ".join(f"{c} = {c} - {v}" for c, v in zip(AGG_CONTEOS_REPORTE, _agg_aporte_reportes(alias)))
+    return f"""
+        UPDATE agg_cumplimiento SET planificadas = planificadas - 1, {restas}
+        WHERE {_agg_key_where(alias)};
+    """
+
+def _agg_suma_reporte(alias: str, con_reporte: str) -> str:
+    return f"""
+        INSERT INTO agg_cumplimiento ({AGG_KEY}, {", ".join(AGG_CONTEOS_REPORTE)})
+        SELECT COALESCE(p.dependencia, ''), COALESCE(p.anio, 0), COALESCE(p.periodo_planificado, ''),
+               COALESCE(p.region, ''), p.id_instrumento, {con_reporte},
+               {alias}.ejecutado IS 'Sí', {alias}.ejecutado IS 'No', {alias}.ejecutado IS 'Parcial'
+        FROM planificaciones p
+        WHERE p.id_planificacion = {alias}.id_planificacion
+        ON CONFLICT ({AGG_KEY}) DO UPDATE SET
+            {", ".join(f"{c} = {c} + excluded.{c}" for c in AGG_CONTEOS_REPORTE)};
+    """
+
+def _agg_resta_reporte(alias: str, con_reporte: str) -> str:
+    return f"""
+        UPDATE agg_cumplimiento SET
+            con_reporte = con_reporte - ({con_reporte}),
+            ejecutadas_si = ejecutadas_si - ({alias}.ejecutado IS 'Sí'),
+            ejecutadas_no = ejecutadas_no - ({alias}.ejecutado IS 'No'),
+            ejecutadas_parcial = ejecutadas_parcial - ({alias}.ejecutado IS 'Parcial')
+        WHERE rowid IN (
+            SELECT a.rowid FROM agg_cumplimiento a JOIN planificaciones p ON p.id_planificacion = {alias}.id_planificacion
+            WHERE a.dependencia = COALESCE(p.dependencia, '') AND a.anio = COALESCE(p.anio, 0)
+              AND a.periodo_planificado = COALESCE(p.periodo_planificado, '')
+              AND a.region = COALESCE(p.region, '') AND a.id_instrumento = p.id_instrumento
+        );
+    """
+
+def _mig_agg_cumplimiento(cur):
+    # Agregados de cumplimiento mantenidos por triggers (cubren formulario, carga masiva y lotes)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS agg_cumplimiento (
+        dependencia TEXT NOT NULL,
+        anio INTEGER NOT NULL,
+        periodo_planificado TEXT NOT NULL,
+        region TEXT NOT NULL,                  -- '' = sin región (nacional/sectorial)
+        id_instrumento TEXT NOT NULL,
+        planificadas INTEGER NOT NULL DEFAULT 0,
+        con_reporte INTEGER NOT NULL DEFAULT 0,
+        ejecutadas_si INTEGER NOT NULL DEFAULT 0,
+        ejecutadas_no INTEGER NOT NULL DEFAULT 0,
+        ejecutadas_parcial INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY ({AGG_KEY})
+    )
+    """)
+    # con_reporte cambia solo con el primer reporte de una planificación / al quedar sin
+    # reportes (un reporte movido dentro de la misma planificación no lo cambia).
+    primero_new = "(SELECT COUNT(1) FROM reportes r WHERE r.id_planificacion = NEW.id_planificacion) = 1"
+    sin_reportes_old = "NOT EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = OLD.id_planificacion)"
+    triggers = {
+        "trg_agg_planificacion_ins": ("AFTER INSERT ON planificaciones", _agg_suma_planificacion("NEW")),
+        "trg_agg_planificacion_del": ("AFTER DELETE ON planificaciones", _agg_resta_planificacion("OLD")),
+        "trg_agg_planificacion_upd": (
+            f"AFTER UPDATE OF {AGG_COLS_PLANIFICACION} ON planificaciones",
+            _agg_resta_planificacion("OLD") + _agg_suma_planificacion("NEW"),
+        ),
+        "trg_agg_reporte_ins": ("AFTER INSERT ON reportes", _agg_suma_reporte("NEW", primero_new)),
+        "trg_agg_reporte_del": ("AFTER DELETE ON reportes", _agg_resta_reporte("OLD", sin_reportes_old)),
+        "trg_agg_reporte_upd": (
+            "AFTER UPDATE OF id_planificacion, ejecutado ON reportes",
+            _agg_resta_reporte("OLD", sin_reportes_old)
+            + _agg_suma_reporte("NEW", f"NEW.id_planificacion IS NOT OLD.id_planificacion AND {primero_new}"),
+        ),
+    }
+    for nombre, (evento, cuerpo) in triggers.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {nombre} {evento} BEGIN {cuerpo} END")
+    rebuild_agg_cumplimiento(cur)
+
+FTS_COLS = "id_planificacion, nombre_instrumento, region, provincia, comuna, entidad_objetivo, responsable_planificacion"
+
+def _mig_fts_planificaciones(cur):
+    # Índice de texto para el buscador de tab 2 (contenido externo: planificaciones).
+    # Si SQLite no trae FTS5 se omite y buscar_planificaciones usa LIKE.
+    # Ojo: VACUUM puede renumerar rowid -> ejecutar rebuild_busqueda_planificaciones().
+    try:
+        cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS planificaciones_fts USING fts5(
+            {FTS_COLS},
+            content='planificaciones', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        return
+    new_vals = ", ".join(f"NEW.{c.strip()}" for c in FTS_COLS.split(","))
+    old_vals = ", ".join(f"OLD.{c.strip()}" for c in FTS_COLS.split(","))
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_fts_planificacion_ins AFTER INSERT ON planificaciones BEGIN
+        INSERT INTO planificaciones_fts (rowid, {FTS_COLS}) VALUES (NEW.rowid, {new_vals});
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_fts_planificacion_del AFTER DELETE ON planificaciones BEGIN
+        INSERT INTO planificaciones_fts (planificaciones_fts, rowid, {FTS_COLS}) VALUES ('delete', OLD.rowid, {old_vals});
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_fts_planificacion_upd AFTER UPDATE ON planificaciones BEGIN
+        INSERT INTO planificaciones_fts (planificaciones_fts, rowid, {FTS_COLS}) VALUES ('delete', OLD.rowid, {old_vals});
+        INSERT INTO planificaciones_fts (rowid, {FTS_COLS}) VALUES (NEW.rowid, {new_vals});
+    END
+    """)
+    cur.execute("INSERT INTO planificaciones_fts (planificaciones_fts) VALUES ('rebuild')")
+
+# Registro de cambios (altas, modificaciones y eliminaciones): tabla -> columna clave
+CAMBIOS_TABLAS = {"planificaciones": "id_planificacion", "reportes": "id_reporte"}
+
+def _backfill_cambios(cur):
+    # Las filas existentes entran como 'I': quien parte en seq 0 recibe todo
+    for tabla, clave in CAMBIOS_TABLAS.items():
+        cur.execute(f"""
+        INSERT INTO cambios (tabla, clave, operacion)
+        SELECT '{tabla}', {clave}, 'I' FROM {tabla} ORDER BY {clave}
+        """)
+
+def _mig_cambios(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cambios (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabla TEXT NOT NULL,
+        clave TEXT NOT NULL,
+        operacion TEXT NOT NULL,
+        registrado_en TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    )
+    """)
+    for tabla, clave in CAMBIOS_TABLAS.items():
+        for evento, op, fila in (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD")):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_cambios_{tabla}_{op.lower()} AFTER {evento} ON {tabla} BEGIN
+                INSERT INTO cambios (tabla, clave, operacion) VALUES ('{tabla}', {fila}.{clave}, '{op}');
+            END
+            """)
+    _backfill_cambios(cur)
+
+def _backfill_fechas_periodo(cur):
+    # Pocas combinaciones distintas (periodo x año): un UPDATE por combinación
+    cur.execute("SELECT DISTINCT periodo_planificado, anio FROM planificaciones WHERE fecha_fin_periodo IS NULL")
+    for periodo, anio in cur.fetchall():
+        inicio, fin = periodo_rango(periodo, anio)
+        if fin is not None:
+            cur.execute("""
+            UPDATE planificaciones SET fecha_inicio_periodo = ?, fecha_fin_periodo = ?
+            WHERE periodo_planificado = ? AND anio = ? AND fecha_fin_periodo IS NULL
+            """, (inicio, fin, periodo, anio))
+
+def _idx_fechas_periodo(cur):
+    # Vencidas / próximas: rango sobre fecha_fin_periodo, por dependencia o global
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_plan_dep_fin_periodo
+    ON planificaciones(dependencia, fecha_fin_periodo)
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_plan_fin_periodo
+    ON planificaciones(fecha_fin_periodo)
+    """)
+
+def _mig_fechas_periodo(cur):
+    _ensure_columns(cur, "planificaciones", {
+        "fecha_inicio_periodo": "TEXT",
+        "fecha_fin_periodo": "TEXT",
+    })
+    # El trigger FTS de UPDATE solo debe reaccionar a columnas indexadas (el backfill no las toca)
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_fts_planificacion_upd'")
+    if cur.fetchone() is not None:
+        new_vals = ", ".join(f"NEW.{c.strip()}" for c in FTS_COLS.split(","))
+        old_vals = ", ".join(f"OLD.{c.strip()}" for c in FTS_COLS.split(","))
+        cur.execute("DROP TRIGGER trg_fts_planificacion_upd")
+        cur.execute(f"""
+        CREATE TRIGGER trg_fts_planificacion_upd AFTER UPDATE OF {FTS_COLS} ON planificaciones BEGIN
+            INSERT INTO planificaciones_fts (planificaciones_fts, rowid, {FTS_COLS}) VALUES ('delete', OLD.rowid, {old_vals});
+            INSERT INTO planificaciones_fts (rowid, {FTS_COLS}) VALUES (NEW.rowid, {new_vals});
+        END
+        """)
+    _backfill_fechas_periodo(cur)
+    _idx_fechas_periodo(cur)
+
+def _tabla_ingesta_filas(cur):
+    # Checkpoint de la ingesta masiva: filas del manifiesto ya confirmadas (misma transacción que el reporte).
+    # clave = contenido de la fila + sha256 de su evidencia: identifica el reporte aunque el manifiesto cambie.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingesta_filas (
+        manifiesto TEXT NOT NULL,
+        fila INTEGER NOT NULL,
+        id_reporte TEXT NOT NULL,
+        procesado_en TEXT,
+        clave TEXT NOT NULL UNIQUE,
+        PRIMARY KEY (manifiesto, fila)
+    )
+    """)
+
+def _mig_ingesta_evidencias(cur):
+    _ensure_columns(cur, "evidencias", {
+        "paginas": "INTEGER",
+        "miniatura": "TEXT",
+    })
+    _tabla_ingesta_filas(cur)
+
+MIGRATIONS = [
+    (1, "Tablas base (instrumentos, planificaciones, reportes)", _mig_tablas_base),
+    (2, "Columnas agregadas en versiones anteriores", _mig_columnas_legacy),
+    (3, "Índice reportes(id_planificacion, fecha_reporte)", _mig_idx_reportes_planificacion),
+    (4, "Índices compuestos para filtros y paginación de Registros", _mig_idx_registros),
+    (5, "Tabla evidencias (almacén por contenido)", _mig_evidencias),
+    (6, "Agregados de cumplimiento (agg_cumplimiento + triggers)", _mig_agg_cumplimiento),
+    (7, "Índice FTS5 para el buscador de planificaciones", _mig_fts_planificaciones),
+    (8, "Registro de cambios (cambios + triggers)", _mig_cambios),
+    (9, "Fechas de inicio/fin del periodo planificado (+ backfill e índices)", _mig_fechas_periodo),
+    (10, "Metadatos de evidencias (páginas, miniatura) y checkpoint de ingesta por fila", _mig_ingesta_evidencias),
+]
+
+# ---------------------------------------------------------
+# Migraciones PostgreSQL: mismas versiones donde el DDL es portable.
+# Sin FTS5 (el buscador usa ILIKE) ni triggers de agregados: agg_cumplimiento
+# es una vista calculada sobre las tablas base.
+# ---------------------------------------------------------
+def _mig_pg_agg_cumplimiento(cur):
+    cur.execute("""
+    CREATE OR REPLACE VIEW agg_cumplimiento AS
+    SELECT COALESCE(p.dependencia, '') AS dependencia, COALESCE(p.anio, 0) AS anio,
+           COALESCE(p.periodo_planificado, '') AS periodo_planificado, COALESCE(p.region, '') AS region,
+           p.id_instrumento,
+           COUNT(1) AS planificadas,
+           COUNT(r.id_planificacion) AS con_reporte,
+           COALESCE(SUM(r.si), 0) AS ejecutadas_si,
+           COALESCE(SUM(r.no), 0) AS ejecutadas_no,
+           COALESCE(SUM(r.parcial), 0) AS ejecutadas_parcial
+    FROM planificaciones p
+    LEFT JOIN (
+        SELECT id_planificacion,
+               COUNT(1) FILTER (WHERE ejecutado = 'Sí') AS si,
+               COUNT(1) FILTER (WHERE ejecutado = 'No') AS no,
+               COUNT(1) FILTER (WHERE ejecutado = 'Parcial') AS parcial
+        FROM reportes
+        GROUP BY id_planificacion
+    ) r ON r.id_planificacion = p.id_planificacion
+    GROUP BY 1, 2, 3, 4, 5
+    """)
+
+def _mig_pg_cambios(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cambios (
+        seq BIGSERIAL PRIMARY KEY,
+        tabla TEXT NOT NULL,
+        clave TEXT NOT NULL,
+        operacion TEXT NOT NULL,
+        registrado_en TEXT NOT NULL DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"')
+    )
+    """)
+    # El lock de transacción serializa a los escritores de cambios: el orden de seq
+    # es el orden de commit y una marca de agua no salta filas aún sin confirmar.
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION registrar_cambio() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock(7411);
+        INSERT INTO cambios (tabla, clave, operacion)
+        VALUES (TG_TABLE_NAME, to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END) ->> TG_ARGV[0], left(TG_OP, 1));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+    for tabla, clave in CAMBIOS_TABLAS.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_cambios_{tabla} ON {tabla}")
+        cur.execute(f"""
+        CREATE TRIGGER trg_cambios_{tabla} AFTER INSERT OR UPDATE OR DELETE ON {tabla}
+        FOR EACH ROW EXECUTE FUNCTION registrar_cambio('{clave}')
+        """)
+    _backfill_cambios(cur)
+
+def _mig_pg_fechas_periodo(cur):
+    cur.execute("ALTER TABLE planificaciones ADD COLUMN IF NOT EXISTS fecha_inicio_periodo TEXT")
+    cur.execute("ALTER TABLE planificaciones ADD COLUMN IF NOT EXISTS fecha_fin_periodo TEXT")
+    _backfill_fechas_periodo(cur)
+    _idx_fechas_periodo(cur)
+
+def _mig_pg_ingesta_evidencias(cur):
+    cur.execute("ALTER TABLE evidencias ADD COLUMN IF NOT EXISTS paginas INTEGER")
+    cur.execute("ALTER TABLE evidencias ADD COLUMN IF NOT EXISTS miniatura TEXT")
+    _tabla_ingesta_filas(cur)
+
+PG_MIGRATIONS = [
+    (1, "Tablas base (instrumentos, planificaciones, reportes)", _mig_tablas_base),
+    (3, "Índice reportes(id_planificacion, fecha_reporte)", _mig_idx_reportes_planificacion),
+    (4, "Índices compuestos para filtros y paginación de Registros", _mig_idx_registros),
+    (5, "Tabla evidencias (almacén por contenido)", _mig_evidencias),
+    (6, "Agregados de cumplimiento (vista agg_cumplimiento)", _mig_pg_agg_cumplimiento),
+    (8, "Registro de cambios (cambios + triggers)", _mig_pg_cambios),
+    (9, "Fechas de inicio/fin del periodo planificado (+ backfill e índices)", _mig_pg_fechas_periodo),
+    (10, "Metadatos de evidencias (páginas, miniatura) y checkpoint de ingesta por fila", _mig_pg_ingesta_evidencias),
+]
+# Lock de escritura tomado antes de leer la versión (ver migrate)
+MIGRATION_LOCK_SQL = {
+    "sqlite": "BEGIN IMMEDIATE",
+    "postgres": "SELECT pg_advisory_xact_lock(7410)",   # se libera con el commit
+}
+
+def schema_version(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return int(cur.fetchone()[0])
+
+def migrate(conn) -> int:
+    """
+    Aplica en orden las migraciones pendientes y retorna la versión final.
+    BEGIN IMMEDIATE (o el advisory lock en postgres) toma el lock de escritura antes
+    de leer la versión, así dos procesos que arrancan a la vez no aplican el mismo
+    paso dos veces.
+    """
+    pasos = PG_MIGRATIONS if dialecto() == "postgres" else MIGRATIONS
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        descripcion TEXT,
+        aplicado_en TEXT
+    )
+    """)
+    conn.commit()
+    if schema_version(cur) >= pasos[-1][0]:
+        return schema_version(cur)
+
+    cur.execute(MIGRATION_LOCK_SQL[dialecto()])
+    try:
+        current = schema_version(cur)
+        for version, descripcion, step in pasos:
+            if version <= current:
+                continue
+            step(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, descripcion, aplicado_en) VALUES (?, ?, ?)",
+                (version, descripcion, datetime.now().isoformat(timespec="seconds"))
+            )
+            current = version
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return current
+
+def catalogo_hash(instrumentos=INSTRUMENTOS) -> str:
+    return hashlib.sha256(json.dumps(instrumentos, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def sync_catalogo(conn) -> bool:
+    """Upsert de INSTRUMENTOS solo si cambió su hash. Retorna True si escribió."""
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS app_meta (clave TEXT PRIMARY KEY, valor TEXT)")
+    conn.commit()
+    h = catalogo_hash()
+    cur.execute("SELECT valor FROM app_meta WHERE clave = 'catalogo_hash'")
+    row = cur.fetchone()
+    if row is not None and row[0] == h:
+        return False
+
+    # Upsert catálogo de instrumentos (8 columnas); ON CONFLICT sirve en SQLite y PostgreSQL
+    cur.executemany("""
+    INSERT INTO instrumentos
+    (id_instrumento, tipo_instrumento, nombre_instrumento, ambito, requiere_entidad, tipo_entidad, marco_normativo, dependencia_owner)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id_instrumento) DO UPDATE SET
+        tipo_instrumento = excluded.tipo_instrumento, nombre_instrumento = excluded.nombre_instrumento,
+        ambito = excluded.ambito, requiere_entidad = excluded.requiere_entidad, tipo_entidad = excluded.tipo_entidad,
+        marco_normativo = excluded.marco_normativo, dependencia_owner = excluded.dependencia_owner
+    """, INSTRUMENTOS)
+    cur.execute("""
+    INSERT INTO app_meta (clave, valor) VALUES ('catalogo_hash', ?)
+    ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor
+    """, (h,))
+    conn.commit()
+    return True
+
+@profiled
+def init_db() -> int:
+    with get_conn() as conn:
+        version = migrate(conn)
+        catalogo_cambio = sync_catalogo(conn)
+    invalidar("instrumentos", *CAMBIOS_TABLAS)        # migraciones/backfills pueden haber escrito
+    if catalogo_cambio:
+        from .catalogo import invalidate_catalogo      # catalogo importa db
+        invalidate_catalogo()
+    return version
+
+@recurso
+def init_db_once() -> int:
+    """init_db() una sola vez por proceso (no en cada rerun de Streamlit)."""
+    return init_db()
+
+@profiled
+@consulta_cacheada("instrumentos")
+def fetch_instrumentos() -> pd.DataFrame:
+    with get_conn() as conn:
+        df = read_sql(
+            "SELECT * FROM instrumentos ORDER BY dependencia_owner, tipo_instrumento, ambito, nombre_instrumento",
+            conn
+        )
+    return df
+
+INSERT_PLANIFICACION_SQL = """
+INSERT INTO planificaciones (
+    id_planificacion, dependencia, id_instrumento, tipo_instrumento, nombre_instrumento, ambito,
+    region, provincia, comuna, entidad_objetivo, anio, periodo_planificado, tipo_accion,
+    responsable_planificacion, cargo_responsable_planificacion, email_responsable_planificacion,
+    fecha_registro, observaciones, fecha_inicio_periodo, fecha_fin_periodo
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _planificacion_params(payload: Dict) -> Tuple:
+    return (
+        payload["id_planificacion"], payload["dependencia"], payload["id_instrumento"],
+        payload["tipo_instrumento"], payload["nombre_instrumento"], payload["ambito"],
+        payload["region"], payload["provincia"], payload["comuna"], payload["entidad_objetivo"],
+        payload["anio"], payload["periodo_planificado"], payload["tipo_accion"],
+        payload["responsable_planificacion"], payload["cargo_responsable_planificacion"],
+        payload["email_responsable_planificacion"], payload["fecha_registro"], payload["observaciones"],
+        # Fechas del periodo: siempre derivadas de (periodo, anio), nunca del payload
+        *periodo_rango(payload["periodo_planificado"], payload["anio"])
+    )
+
+@profiled
+def insert_planificacion(payload: Dict):
+    with get_conn() as conn:
+        conn.execute(INSERT_PLANIFICACION_SQL, _planificacion_params(payload))
+    invalidar("planificaciones")
+
+INSERT_REPORTE_SQL = """
+INSERT INTO reportes (
+    id_reporte, id_planificacion, ejecutado, fecha_ejecucion, tipo_evidencia, evidencia_path,
+    responsable_reporte, cargo_responsable_reporte, email_responsable_reporte, fecha_reporte, observaciones,
+    motivo_no_ejecucion, tipo_motivo, reprograma
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _reporte_params(payload: Dict) -> Tuple:
+    return (
+        payload["id_reporte"], payload["id_planificacion"], payload["ejecutado"], payload["fecha_ejecucion"],
+        payload["tipo_evidencia"], payload["evidencia_path"], payload["responsable_reporte"],
+        payload["cargo_responsable_reporte"], payload["email_responsable_reporte"], payload["fecha_reporte"],
+        payload["observaciones"], payload["motivo_no_ejecucion"], payload["tipo_motivo"], payload["reprograma"]
+    )
+
+@profiled
+def insert_reporte(payload: Dict):
+    with get_conn() as conn:
+        conn.execute(INSERT_REPORTE_SQL, _reporte_params(payload))
+    invalidar("reportes")
+
+@profiled
+def insert_reportes(payloads: List[Dict]) -> int:
+    """Varios reportes en UNA transacción (executemany)."""
+    with get_conn() as conn:
+        conn.executemany(INSERT_REPORTE_SQL, [_reporte_params(p) for p in payloads])
+    invalidar("reportes")
+    return len(payloads)
+
+@profiled
+@consulta_cacheada("planificaciones")
+def fetch_planificaciones() -> pd.DataFrame:
+    with get_conn() as conn:
+        df = read_sql("SELECT * FROM planificaciones ORDER BY fecha_registro DESC", conn)
+    return df
+
+@profiled
+@consulta_cacheada("reportes")
+def fetch_reportes() -> pd.DataFrame:
+    with get_conn() as conn:
+        df = read_sql("SELECT * FROM reportes ORDER BY fecha_reporte DESC", conn)
+    return df
+
+def plan_label(r) -> str:
+    return (
+        f'{r["id_planificacion"]} | {r["dependencia"]} | {r["tipo_instrumento"]}/{r["ambito"]} | '
+        f'{(r["region"] or "-")} / {(r["provincia"] or "-")} / {(r["comuna"] or "-")} | '
+        f'Entidad: {(r["entidad_objetivo"] or "-")} | {r["nombre_instrumento"]} | {r["anio"]} {r["periodo_planificado"]}'
+    )
+
+@profiled
+@consulta_cacheada("planificaciones")
+def fetch_planificacion_by_id(id_planificacion: str) -> Optional[pd.Series]:
+    with get_conn() as conn:
+        df = read_sql("SELECT * FROM planificaciones WHERE id_planificacion = ?", conn, params=[id_planificacion])
+    if df.empty:
+        return None
+    return df.iloc[0]
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def fetch_planificaciones_estado(solo_pendientes: bool = False) -> pd.DataFrame:
+    """
+    Planificaciones con su estado de reporte en UNA sola consulta
+    (n_reportes, fecha_ultimo_reporte, tiene_reporte).
+    Con solo_pendientes=True el filtro se resuelve en SQL.
+    """
+    sql = """
+    SELECT p.*,
+           COALESCE(r.n_reportes, 0) AS n_reportes,
+           r.fecha_ultimo_reporte,
+           CASE WHEN r.id_planificacion IS NULL THEN 0 ELSE 1 END AS tiene_reporte
+    FROM planificaciones p
+    LEFT JOIN (
+        SELECT id_planificacion, COUNT(1) AS n_reportes, MAX(fecha_reporte) AS fecha_ultimo_reporte
+        FROM reportes
+        GROUP BY id_planificacion
+    ) r ON r.id_planificacion = p.id_planificacion
+    """
+    if solo_pendientes:
+        sql += " WHERE r.id_planificacion IS NULL"
+    sql += " ORDER BY p.fecha_registro DESC"
+
+    with get_conn() as conn:
+        df = read_sql(sql, conn)
+    df["tiene_reporte"] = df["tiene_reporte"].astype(bool)
+    return df
+
+@profiled
+@consulta_cacheada("reportes")
+def has_reporte_for_planificacion(id_planificacion: str) -> bool:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(1) FROM reportes WHERE id_planificacion = ?", (id_planificacion,))
+        n = cur.fetchone()[0]
+    return n > 0
+
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def fetch_cumplimiento(dependencia: Optional[str] = None, anio: Optional[int] = None) -> pd.DataFrame:
+    """Filas pre-agregadas de agg_cumplimiento (cientos, no el join plan x reporte)."""
+    where, params = [], []
+    if dependencia is not None:
+        where.append("a.dependencia = ?")
+        params.append(dependencia)
+    if anio is not None:
+        where.append("a.anio = ?")
+        params.append(int(anio))
+    sql = """
+    SELECT a.dependencia, a.anio, a.periodo_planificado, a.region, a.id_instrumento,
+           i.nombre_instrumento, a.planificadas, a.con_reporte,
+           a.ejecutadas_si, a.ejecutadas_no, a.ejecutadas_parcial
+    FROM agg_cumplimiento a
+    LEFT JOIN instrumentos i ON i.id_instrumento = a.id_instrumento
+    WHERE a.planificadas > 0
+    """
+    if where:
+        sql += " AND " + " AND ".join(where)
+    sql += " ORDER BY a.dependencia, a.anio, a.region, a.id_instrumento"
+    with get_conn() as conn:
+        return read_sql(sql, conn, params=params)
+
+# ---------------------------------------------------------
+# Vencimientos: planificaciones sin reporte según el fin de su periodo
+# ---------------------------------------------------------
+VENCIMIENTO_COLS = [
+    "id_planificacion", "dependencia", "nombre_instrumento", "region", "provincia", "comuna",
+    "entidad_objetivo", "anio", "periodo_planificado", "fecha_inicio_periodo", "fecha_fin_periodo",
+    "responsable_planificacion", "email_responsable_planificacion",
+]
+SIN_REPORTE_SQL = "NOT EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion)"
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def query_vencimientos(estado: str = "vencidas", dependencia: Optional[str] = None, hoy: Optional[date] = None,
+                       dias: int = 30, limite: int = 500) -> pd.DataFrame:
+    """
+    Planificaciones sin reporte cuyo periodo ya terminó ("vencidas": fin < hoy) o
+    termina en los próximos `dias` ("proximas"). Rango sobre fecha_fin_periodo
+    (idx_plan_dep_fin_periodo con dependencia, idx_plan_fin_periodo sin ella).
+    `dias_para_vencer` < 0 = días de atraso.
+    """
+    hoy = hoy or date.today()
+    if estado == "vencidas":
+        where, params = ["p.fecha_fin_periodo < ?"], [hoy.isoformat()]
+    elif estado == "proximas":
+        where = ["p.fecha_fin_periodo >= ?", "p.fecha_fin_periodo <= ?"]
+        params = [hoy.isoformat(), (hoy + timedelta(days=int(dias))).isoformat()]
+    else:
+        raise ValueError(f"Estado no soportado: {estado}")
+    if dependencia is not None:
+        where.insert(0, "p.dependencia = ?")
+        params.insert(0, dependencia)
+    where.append(SIN_REPORTE_SQL)
+    sql = (
+        f"SELECT {', '.join(f'p.{c}' for c in VENCIMIENTO_COLS)} FROM planificaciones p"
+        f" WHERE {' AND '.join(where)} ORDER BY p.fecha_fin_periodo, p.id_planificacion LIMIT ?"
+    )
+    params.append(int(limite))
+    with get_conn() as conn:
+        df = read_sql(sql, conn, params=params)
+    df["dias_para_vencer"] = [(date.fromisoformat(f) - hoy).days for f in df["fecha_fin_periodo"]]
+    return df
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def resumen_vencimientos(hoy: Optional[date] = None, dias: int = 30) -> pd.DataFrame:
+    """Por dependencia: cuántas planificaciones sin reporte están vencidas y cuántas vencen en `dias`."""
+    hoy = hoy or date.today()
+    sql = f"""
+    SELECT p.dependencia,
+           SUM(CASE WHEN p.fecha_fin_periodo < ? THEN 1 ELSE 0 END) AS vencidas,
+           SUM(CASE WHEN p.fecha_fin_periodo >= ? THEN 1 ELSE 0 END) AS proximas
+    FROM planificaciones p
+    WHERE p.fecha_fin_periodo <= ? AND {SIN_REPORTE_SQL}
+    GROUP BY p.dependencia
+    ORDER BY vencidas DESC, p.dependencia
+    """
+    params = [hoy.isoformat(), hoy.isoformat(), (hoy + timedelta(days=int(dias))).isoformat()]
+    with get_conn() as conn:
+        return read_sql(sql, conn, params=params)
+
+# ---------------------------------------------------------
+# Consultas paginadas (keyset) con filtros y proyección en SQL
+# ---------------------------------------------------------
+PLANIFICACION_COLS = [
+    "id_planificacion", "dependencia", "id_instrumento", "tipo_instrumento", "nombre_instrumento", "ambito",
+    "region", "provincia", "comuna", "entidad_objetivo", "anio", "periodo_planificado", "tipo_accion",
+    "responsable_planificacion", "cargo_responsable_planificacion", "email_responsable_planificacion",
+    "fecha_registro", "observaciones", "fecha_inicio_periodo", "fecha_fin_periodo",
+]
+REPORTE_COLS = [
+    "id_reporte", "id_planificacion", "ejecutado", "fecha_ejecucion", "tipo_evidencia", "evidencia_path",
+    "responsable_reporte", "cargo_responsable_reporte", "email_responsable_reporte", "fecha_reporte", "observaciones",
+    "motivo_no_ejecucion", "tipo_motivo", "reprograma",
+]
+# Columnas de orden: siempre pobladas por la app (la comparación por tupla descarta NULL)
+ORDEN_PLANIFICACIONES = ["fecha_registro", "anio", "dependencia", "id_planificacion"]
+ORDEN_REPORTES = ["fecha_reporte", "fecha_ejecucion", "id_reporte"]
+SIN_REPORTE = "Sin reporte"
+
+def _py(v):
+    """numpy -> tipo Python (sqlite3 no enlaza np.int64)."""
+    return v.item() if hasattr(v, "item") else v
+
+def _filtros_planificacion(filtros: Optional[Dict]) -> Tuple[List[str], List]:
+    """
+    Filtros soportados (None = sin filtro): dependencia, anio, periodo_planificado,
+    region, provincia, comuna, ejecutado (ESTADO_EJECUCION o SIN_REPORTE).
+    """
+    where, params = [], []
+    filtros = filtros or {}
+    for col in ["dependencia", "anio", "periodo_planificado", "region", "provincia", "comuna"]:
+        v = filtros.get(col)
+        if v is not None:
+            where.append(f"p.{col} = ?")
+            params.append(_py(v))
+    ejecutado = filtros.get("ejecutado")
+    if ejecutado == SIN_REPORTE:
+        where.append("NOT EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion)")
+    elif ejecutado is not None:
+        where.append("EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion AND r.ejecutado = ?)")
+        params.append(ejecutado)
+    return where, params
+
+def _proyeccion(alias: str, columnas: Optional[List[str]], permitidas: List[str]) -> str:
+    cols = columnas or permitidas
+    invalidas = [c for c in cols if c not in permitidas]
+    if invalidas:
+        raise ValueError(f"Columnas no permitidas: {invalidas}")
+    return ", ".join(f"{alias}.{c}" for c in cols)
+
+def _keyset_page(select_from: str, where: List[str], params: List, sort_expr: str, id_expr: str,
+                 desc: bool, limite: int, cursor: Optional[Tuple]) -> Tuple[pd.DataFrame, Optional[Tuple]]:
+    """
+    Página de `limite` filas ordenadas por (sort_expr, id_expr).
+    cursor = (valor_orden, id) de la última fila de la página anterior.
+    Retorna (df, cursor_siguiente | None).
+    """
+    where, params = list(where), list(params)
+    direction, cmp = ("DESC", "<") if desc else ("ASC", ">")
+    if cursor is not None:
+        where.append(f"({sort_expr}, {id_expr}) {cmp} (?, ?)")
+        params.extend(_py(v) for v in cursor)
+    sql = select_from.replace("SELECT ", f"SELECT {sort_expr} AS _k_orden, {id_expr} AS _k_id, ", 1)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_expr} {direction}, {id_expr} {direction} LIMIT ?"
+    params.append(int(limite) + 1)
+
+    with get_conn() as conn:
+        df = read_sql(sql, conn, params=params)
+
+    next_cursor = None
+    if len(df) > limite:
+        df = df.iloc[:limite]
+        last = df.iloc[-1]
+        next_cursor = (_py(last["_k_orden"]), _py(last["_k_id"]))
+    return df.drop(columns=["_k_orden", "_k_id"]), next_cursor
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def query_planificaciones(filtros: Optional[Dict] = None, columnas: Optional[List[str]] = None,
+                          orden: str = "fecha_registro", desc: bool = True, limite: int = 50,
+                          cursor: Optional[Tuple] = None) -> Tuple[pd.DataFrame, Optional[Tuple]]:
+    if orden not in ORDEN_PLANIFICACIONES:
+        raise ValueError(f"Orden no soportado: {orden}")
+    where, params = _filtros_planificacion(filtros)
+    select_from = f"SELECT {_proyeccion('p', columnas, PLANIFICACION_COLS)} FROM planificaciones p"
+    return _keyset_page(select_from, where, params, f"p.{orden}", "p.id_planificacion", desc, limite, cursor)
+
+def _filtros_reporte(filtros: Optional[Dict]) -> Tuple[List[str], List]:
+    """Filtros de planificación (alias p) + ejecutado sobre el propio reporte (alias r)."""
+    filtros = dict(filtros or {})
+    ejecutado = filtros.pop("ejecutado", None)
+    where, params = _filtros_planificacion(filtros)
+    if ejecutado is not None:
+        where.append("r.ejecutado = ?")
+        params.append(ejecutado)
+    return where, params
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def query_reportes(filtros: Optional[Dict] = None, columnas: Optional[List[str]] = None,
+                   orden: str = "fecha_reporte", desc: bool = True, limite: int = 50,
+                   cursor: Optional[Tuple] = None) -> Tuple[pd.DataFrame, Optional[Tuple]]:
+    """Reportes filtrados por los atributos de su planificación (mismos filtros)."""
+    if orden not in ORDEN_REPORTES:
+        raise ValueError(f"Orden no soportado: {orden}")
+    where, params = _filtros_reporte(filtros)
+    select_from = (
+        f"SELECT {_proyeccion('r', columnas, REPORTE_COLS)} "
+        "FROM reportes r JOIN planificaciones p ON p.id_planificacion = r.id_planificacion"
+    )
+    return _keyset_page(select_from, where, params, f"r.{orden}", "r.id_reporte", desc, limite, cursor)
+
+def _consolidado_cols() -> List[Tuple[str, str]]:
+    """(expresión, nombre) con los mismos nombres que dfp.merge(dfr, suffixes=("_plan","_rep"))."""
+    cols = [(f"p.{c}", f"{c}_plan" if c == "observaciones" else c) for c in PLANIFICACION_COLS]
+    cols += [(f"r.{c}", f"{c}_rep" if c == "observaciones" else c) for c in REPORTE_COLS if c != "id_planificacion"]
+    return cols
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def query_consolidado(filtros: Optional[Dict] = None, orden: str = "fecha_registro", desc: bool = True,
+                      limite: int = 50, cursor: Optional[Tuple] = None) -> Tuple[pd.DataFrame, Optional[Tuple]]:
+    """
+    Consolidado plan + reportes paginado POR PLANIFICACIÓN (una planificación
+    con varios reportes nunca queda partida entre dos páginas).
+    """
+    ids, next_cursor = query_planificaciones(filtros, ["id_planificacion"], orden, desc, limite, cursor)
+    if ids.empty:
+        import pandas as pd
+        return pd.DataFrame(columns=[name for _, name in _consolidado_cols()]), None
+
+    id_list = ids["id_planificacion"].tolist()
+    marks = ",".join("?" * len(id_list))
+    direction = "DESC" if desc else "ASC"
+    select_cols = ", ".join(f"{expr} AS {name}" for expr, name in _consolidado_cols())
+    sql = f"""
+    SELECT {select_cols}
+    FROM planificaciones p
+    LEFT JOIN reportes r ON r.id_planificacion = p.id_planificacion
+    WHERE p.id_planificacion IN ({marks})
+    ORDER BY p.{orden} {direction}, p.id_planificacion {direction}, r.fecha_reporte
+    """
+    with get_conn() as conn:
+        df = read_sql(sql, conn, params=id_list)
+    return df, next_cursor
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def count_planificaciones(filtros: Optional[Dict] = None) -> int:
+    where, params = _filtros_planificacion(filtros)
+    sql = "SELECT COUNT(1) FROM planificaciones p"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with get_conn() as conn:
+        return int(conn.execute(sql, params).fetchone()[0])
+
+# ---------------------------------------------------------
+# Buscador de planificaciones (tab 2): FTS5 + filtros, top-N
+# ---------------------------------------------------------
+BUSQUEDA_COLS = [
+    "id_planificacion", "dependencia", "tipo_instrumento", "nombre_instrumento", "ambito",
+    "region", "provincia", "comuna", "entidad_objetivo", "anio", "periodo_planificado",
+]
+
+def fts_disponible() -> bool:
+    if dialecto() != "sqlite":
+        return False
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'planificaciones_fts'"
+        ).fetchone()
+    return row is not None
+
+def rebuild_busqueda_planificaciones():
+    """Reconstruye el índice FTS (p. ej. después de un VACUUM)."""
+    if fts_disponible():
+        with get_conn() as conn:
+            conn.execute("INSERT INTO planificaciones_fts (planificaciones_fts) VALUES ('rebuild')")
+
+def _fts_query(texto: str) -> str:
+    # Cada palabra como prefijo entre comillas (AND implícito); sin operadores del usuario
+    tokens = re.findall(r"\w+", texto)
+    return " ".join(f'"{t}"*' for t in tokens)
+
+@profiled
+@consulta_cacheada("planificaciones", "reportes")
+def buscar_planificaciones(texto: str = "", filtros: Optional[Dict] = None, solo_pendientes: bool = False,
+                           limite: int = 50) -> pd.DataFrame:
+    """
+    Top-`limite` planificaciones que calzan con `texto` (ID, instrumento, territorio,
+    entidad, responsable) y los filtros. Sin texto: las más recientes.
+    """
+    where, params = _filtros_planificacion(filtros)
+    if solo_pendientes:
+        where.append("NOT EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion)")
+    select = ", ".join(f"p.{c}" for c in BUSQUEDA_COLS)
+    select += ", EXISTS (SELECT 1 FROM reportes r WHERE r.id_planificacion = p.id_planificacion) AS tiene_reporte"
+
+    query = _fts_query(texto or "")
+    if query and fts_disponible():
+        sql = f"""
+        SELECT {select}
+        FROM planificaciones_fts f
+        JOIN planificaciones p ON p.rowid = f.rowid
+        WHERE planificaciones_fts MATCH ?
+        """
+        params = [query] + params
+        order = "f.rank"
+    else:
+        sql = f"SELECT {select} FROM planificaciones p WHERE 1 = 1"
+        like_op = "ILIKE" if dialecto() == "postgres" else "LIKE"     # LIKE de SQLite ya ignora mayúsculas
+        for token in re.findall(r"\w+", texto or ""):
+            like = f"%{token}%"
+            where.append("(" + " OR ".join(f"p.{c.strip()} {like_op} ?" for c in FTS_COLS.split(",")) + ")")
+            params += [like] * len(FTS_COLS.split(","))
+        order = "p.fecha_registro DESC, p.id_planificacion DESC"
+
+    if where:
+        sql += " AND " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(int(limite))
+    with get_conn() as conn:
+        df = read_sql(sql, conn, params=params)
+    df["tiene_reporte"] = df["tiene_reporte"].astype(bool)
+    return df
@@ -0,0 +1,129 @@
+# rrd/divisiones.py
+import csv
+import unicodedata
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .instrumentacion import profiled
+from .utilidades import recurso
+
+# =========================================================
+# DIVISIONES (REGION/PROVINCIA/COMUNA)
+# =========================================================
+class DivisionesIndex(NamedTuple):
+    """
+    Índice territorial inmutable y pre-ordenado (se construye una vez por proceso).
+    canonico[(nivel, nombre_normalizado)] -> nombre canónico del CSV,
+    con nivel en {"region", "provincia", "comuna"}.
+    """
+    regiones: Tuple[str, ...]
+    provincias: Mapping[str, Tuple[str, ...]]              # region -> provincias
+    comunas: Mapping[Tuple[str, str], Tuple[str, ...]]     # (region, provincia) -> comunas
+    region_de_provincia: Mapping[str, str]
+    provincia_de_comuna: Mapping[str, str]
+    canonico: Mapping[Tuple[str, str], str]
+
+def normalizar_nombre(nombre: Optional[str]) -> str:
+    """Clave de comparación: sin tildes, sin mayúsculas y con espacios simples."""
+    s = unicodedata.normalize("NFKD", str(nombre or "").replace("\u00a0", " "))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(s.casefold().split())
+
+def build_divisiones_index(rows) -> DivisionesIndex:
+    """rows: iterable de (region, provincia, comuna) ya limpios."""
+    provs: Dict[str, set] = {}
+    coms: Dict[Tuple[str, str], set] = {}
+    region_de_provincia: Dict[str, str] = {}
+    provincia_de_comuna: Dict[str, str] = {}
+    canonico: Dict[Tuple[str, str], str] = {}
+    for region, provincia, comuna in rows:
+        provs.setdefault(region, set()).add(provincia)
+        coms.setdefault((region, provincia), set()).add(comuna)
+        region_de_provincia[provincia] = region
+        provincia_de_comuna[comuna] = provincia
+        for nivel, nombre in (("region", region), ("provincia", provincia), ("comuna", comuna)):
+            canonico[(nivel, normalizar_nombre(nombre))] = nombre
+    return DivisionesIndex(
+        regiones=tuple(sorted(provs)),
+        provincias=MappingProxyType({r: tuple(sorted(p)) for r, p in provs.items()}),
+        comunas=MappingProxyType({k: tuple(sorted(c)) for k, c in coms.items()}),
+        region_de_provincia=MappingProxyType(region_de_provincia),
+        provincia_de_comuna=MappingProxyType(provincia_de_comuna),
+        canonico=MappingProxyType(canonico),
+    )
+
+@recurso
+@profiled
+def load_divisiones(path: str) -> DivisionesIndex:
+    # csv de la librería estándar: cargar divisiones no requiere pandas
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = [c.lower().strip() for c in reader.fieldnames or []]
+        rows = dict.fromkeys(
+            tuple(str(r.get(c) or "").replace("\u00a0", " ").strip() for c in ("region", "provincia", "comuna"))
+            for r in reader
+        )
+    return build_divisiones_index(r for r in rows if all(r))
+
+def regiones(idx: DivisionesIndex) -> List[str]:
+    return list(idx.regiones)
+
+def provincias(idx: DivisionesIndex, region: str) -> List[str]:
+    return list(idx.provincias.get(region, ()))
+
+def comunas(idx: DivisionesIndex, region: str, provincia: str) -> List[str]:
+    return list(idx.comunas.get((region, provincia), ()))
+
+def canonical_territorio(idx: DivisionesIndex, territorio: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Lleva region/provincia/comuna a su escritura canónica (tildes, mayúsculas).
+    Vacíos -> None; valores desconocidos se dejan tal cual para que validar_territorio los reporte.
+    """
+    out: Dict[str, Optional[str]] = {}
+    for nivel in ["region", "provincia", "comuna"]:
+        v = territorio.get(nivel)
+        v = None if v is None else str(v).strip() or None
+        out[nivel] = None if v is None else idx.canonico.get((nivel, normalizar_nombre(v)), v)
+    return out
+
+def validar_territorio(idx: DivisionesIndex, territorio: Dict[str, Optional[str]], req: Dict[str, bool]) -> List[str]:
+    """Errores de obligatoriedad (según ámbito) y de consistencia de la jerarquía."""
+    errores = []
+    region, provincia, comuna = territorio.get("region"), territorio.get("provincia"), territorio.get("comuna")
+
+    if req["region"] and region is None:
+        errores.append("Este instrumento exige Región.")
+    if req["provincia"] and provincia is None:
+        errores.append("Este instrumento exige Provincia.")
+    if req["comuna"] and comuna is None:
+        errores.append("Este instrumento exige Comuna.")
+
+    if region is not None and region not in idx.provincias:
+        errores.append(f"Región desconocida: {region}")
+    if provincia is not None:
+        region_ok = idx.region_de_provincia.get(provincia)
+        if region_ok is None:
+            errores.append(f"Provincia desconocida: {provincia}")
+        elif region is not None and region_ok != region:
+            errores.append(f"La provincia {provincia} no pertenece a la región {region}.")
+    if comuna is not None:
+        provincia_ok = idx.provincia_de_comuna.get(comuna)
+        if provincia_ok is None:
+            errores.append(f"Comuna desconocida: {comuna}")
+        elif provincia is not None and provincia_ok != provincia:
+            errores.append(f"La comuna {comuna} no pertenece a la provincia {provincia}.")
+    return errores
+
+def territorial_requirements(ambito: str) -> Dict[str, bool]:
+    a = (ambito or "").strip().lower()
+    if a == "nacional":
+        return {"region": False, "provincia": False, "comuna": False}
+    if a == "regional":
+        return {"region": True, "provincia": False, "comuna": False}
+    if a == "provincial":
+        return {"region": True, "provincia": True, "comuna": False}
+    if a == "comunal":
+        return {"region": True, "provincia": True, "comuna": True}
+    if a == "sectorial":
+        return {"region": False, "provincia": False, "comuna": False}
+    return {"region": False, "provincia": False, "comuna": False}
@@ -0,0 +1,86 @@
+# rrd/evidencias.py
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from . import config
+from .db import get_conn
+from .instrumentacion import profiled
+
+# =========================================================
+# EVIDENCIAS (almacén direccionado por contenido, SHA-256)
+# =========================================================
+def _evidencia_blob_path(sha256: str) -> str:
+    # Ruta fragmentada: uploads/blobs/ab/cd/abcd...
+    return os.path.join(config.EVIDENCE_DIR, sha256[:2], sha256[2:4], sha256)
+
+EVIDENCIA_UPSERT_SQL = """
+INSERT INTO evidencias (sha256, ruta, bytes, mime, nombre_original, referencias, creado_en, paginas, miniatura)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(sha256) DO UPDATE SET
+    referencias = evidencias.referencias + excluded.referencias,
+    paginas = COALESCE(evidencias.paginas, excluded.paginas),
+    miniatura = COALESCE(evidencias.miniatura, excluded.miniatura)
+"""
+
+def _copiar_a_almacen(fileobj, validar: Optional[Callable[[str], None]] = None) -> Tuple[str, str, int]:
+    """
+    Copia `fileobj` al almacén en bloques de config.EVIDENCE_CHUNK_BYTES calculando
+    el SHA-256 al vuelo. `validar(ruta_temporal)` puede rechazar el contenido
+    (ValueError) antes de publicarlo. Seguro entre procesos. Retorna (ruta, sha256, bytes).
+    """
+    os.makedirs(config.EVIDENCE_DIR, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    fd, tmp_path = tempfile.mkstemp(dir=config.EVIDENCE_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(config.EVIDENCE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        if validar is not None:
+            validar(tmp_path)
+        sha256 = h.hexdigest()
+        path = _evidencia_blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)      # atómico: nunca queda un blob a medio escribir
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path, sha256, size
+
+@profiled
+def store_evidencia(fileobj, nombre: str, referencias: int = 1) -> Tuple[str, str, int]:
+    """
+    Guarda `fileobj` en el almacén (si el contenido ya existe no se vuelve a escribir)
+    y registra (o suma `referencias`) en `evidencias`. Retorna (ruta, sha256, bytes).
+    """
+    path, sha256, size = _copiar_a_almacen(fileobj)
+    mime = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+    with get_conn() as conn:
+        conn.execute(EVIDENCIA_UPSERT_SQL, (
+            sha256, path, size, mime, nombre, referencias, datetime.now().isoformat(timespec="seconds"), None, None,
+        ))
+    return path, sha256, size
+
+def save_uploaded_file(file, referencias: int = 1) -> Optional[str]:
+    """`referencias` > 1 cuando un mismo archivo respalda varios reportes (lote)."""
+    if file is None:
+        return None
+    safe_name = re.sub(r"[\\/]+", "_", file.name.replace("..", ""))
+    path, _, _ = store_evidencia(file, safe_name, referencias)
+    return path
@@ -0,0 +1,138 @@
+# rrd/exportacion.py
+import csv
+import gzip
+import io
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from .db import (
+    PLANIFICACION_COLS, REPORTE_COLS, _consolidado_cols, _filtros_planificacion, _filtros_reporte,
+    dialecto, get_conn,
+)
+from .instrumentacion import profiled
+
+# =========================================================
+# EXPORTACIÓN (streaming por chunks, solo bajo demanda)
+# =========================================================
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_SPOOL_MAX_BYTES = 16 * 1024 * 1024     # sobre esto el temporal pasa a disco
+EXPORT_DATASETS = {
+    "planificaciones": "planificaciones",
+    "reportes": "reportes",
+    "consolidado": "consolidado_piloto",
+}
+EXPORT_FORMATS = {
+    # formato: (extensión, mime)
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_INT_COLS = {"anio", "requiere_entidad"}
+
+def _export_sql(dataset: str, filtros: Optional[Dict]) -> Tuple[str, List, List[str]]:
+    """(sql, params, nombres de columnas) del dataset a exportar."""
+    if dataset == "planificaciones":
+        where, params = _filtros_planificacion(filtros)
+        cols = [(f"p.{c}", c) for c in PLANIFICACION_COLS]
+        from_sql, order = "FROM planificaciones p", "p.fecha_registro DESC, p.id_planificacion"
+    elif dataset == "reportes":
+        where, params = _filtros_reporte(filtros)
+        cols = [(f"r.{c}", c) for c in REPORTE_COLS]
+        from_sql = "FROM reportes r JOIN planificaciones p ON p.id_planificacion = r.id_planificacion"
+        order = "r.fecha_reporte DESC, r.id_reporte"
+    elif dataset == "consolidado":
+        where, params = _filtros_planificacion(filtros)
+        cols = _consolidado_cols()
+        from_sql = "FROM planificaciones p LEFT JOIN reportes r ON r.id_planificacion = p.id_planificacion"
+        order = "p.fecha_registro DESC, p.id_planificacion, r.fecha_reporte"
+    else:
+        raise ValueError(f"Dataset no soportado: {dataset}")
+
+    sql = "SELECT " + ", ".join(f"{expr} AS {name}" for expr, name in cols) + " " + from_sql
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + order
+    return sql, params, [name for _, name in cols]
+
+def _iter_chunks(sql: str, params: List, chunksize: int):
+    with get_conn() as conn:
+        # En postgres, cursor con nombre = del lado del servidor (no materializa el resultado)
+        cur = conn.cursor(name="rrd_export") if dialecto() == "postgres" else conn.cursor()
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunksize)
+            if not rows:
+                break
+            yield rows
+
+def _write_csv(out, columns: List[str], chunks, compress: bool) -> int:
+    raw = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    n = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        n += len(rows)
+    text.flush()
+    text.detach()             # no cerrar `out` al liberar el wrapper
+    if compress:
+        raw.close()           # escribe el trailer gzip
+    return n
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Parquet / snapshot columnar requieren pyarrow (pip install pyarrow).") from e
+    return pa
+
+def _arrow_schema(pa, columns: List[str]):
+    return pa.schema([(c, pa.int64() if c in EXPORT_INT_COLS else pa.string()) for c in columns])
+
+def _arrow_table(pa, schema, columns: List[str], rows):
+    data = {}
+    for i, c in enumerate(columns):
+        if c in EXPORT_INT_COLS:
+            data[c] = [None if r[i] is None else int(r[i]) for r in rows]
+        else:
+            data[c] = [None if r[i] is None else str(r[i]) for r in rows]
+    return pa.Table.from_pydict(data, schema=schema)
+
+def _write_parquet(out, columns: List[str], chunks) -> int:
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, columns)
+    n = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for rows in chunks:
+            writer.write_table(_arrow_table(pa, schema, columns, rows))
+            n += len(rows)
+    return n
+
+@profiled
+def export_dataset(dataset: str, formato: str = "CSV", filtros: Optional[Dict] = None,
+                   chunksize: int = EXPORT_CHUNK_ROWS):
+    """
+    Exporta `dataset` recorriendo el cursor de a `chunksize` filas hacia un
+    SpooledTemporaryFile (memoria acotada por EXPORT_SPOOL_MAX_BYTES, luego disco).
+    Retorna (archivo posicionado al inicio, nombre_archivo, mime, n_filas).
+    """
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    ext, mime = EXPORT_FORMATS[formato]
+    sql, params, columns = _export_sql(dataset, filtros)
+    chunks = _iter_chunks(sql, params, chunksize)
+
+    out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+    try:
+        if formato == "Parquet":
+            n = _write_parquet(out, columns, chunks)
+        else:
+            n = _write_csv(out, columns, chunks, compress=(formato == "CSV (gzip)"))
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out, f"{EXPORT_DATASETS[dataset]}.{ext}", mime, n
@@ -0,0 +1,504 @@
+# rrd/ingesta.py
+import concurrent.futures as cf
+import functools
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import sys
+import time
+import zipfile
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from . import config
+from .cache import invalidar
+from .carga import iter_filas_archivo
+from .config import ESTADO_EJECUCION, TIPO_EVIDENCIA, TIPO_MOTIVO
+from .db import INSERT_REPORTE_SQL, _reporte_params, get_conn
+from .divisiones import normalizar_nombre
+from .evidencias import EVIDENCIA_UPSERT_SQL, _copiar_a_almacen
+from .instrumentacion import profiled
+from .utilidades import make_ids
+
+# =========================================================
+# INGESTA MASIVA DE EVIDENCIAS + REPORTES (python -m rrd ingestar)
+# =========================================================
+# Un directorio o .zip con los archivos y un manifiesto (CSV/XLSX) con una fila
+# por reporte: archivo -> id_planificacion (+ campos del reporte). Los archivos
+# se procesan en un pool de procesos (hash + almacén, firma vs extensión,
+# páginas de PDF, miniaturas); los reportes se confirman por lotes junto con su
+# checkpoint en `ingesta_filas`, así una corrida interrumpida se retoma sin duplicar.
+# El checkpoint se identifica por el contenido de la fila + el sha256 de su
+# evidencia: con el manifiesto corregido, o la misma fila en otro manifiesto, el
+# reporte ya ingerido no se vuelve a insertar y la fila se informa como omitida.
+MANIFIESTO_NOMBRES = ("manifiesto.csv", "manifiesto.xlsx")
+INGESTA_ALIAS_COLUMNAS = {
+    "ruta": "archivo",
+    "evidencia": "archivo",
+    "planificacion": "id_planificacion",
+    "fecha": "fecha_ejecucion",
+    "responsable": "responsable_reporte",
+    "cargo": "cargo_responsable_reporte",
+    "email": "email_responsable_reporte",
+    "motivo": "motivo_no_ejecucion",
+}
+INGESTA_EN_VUELO_POR_WORKER = 4          # archivos encolados por proceso (acota memoria y reintentos)
+
+# extensión -> (mime, firmas válidas al inicio del archivo)
+_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_ZIP = b"PK\x03\x04"
+EVIDENCE_FIRMAS = {
+    "pdf": ("application/pdf", (b"%PDF-",)),
+    "png": ("image/png", (b"\x89PNG\r\n\x1a\n",)),
+    "jpg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    "jpeg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    "doc": ("application/msword", (_OLE,)),
+    "xls": ("application/vnd.ms-excel", (_OLE,)),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", (_ZIP,)),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", (_ZIP,)),
+}
+_OOXML_PARTE = {"docx": "word/document.xml", "xlsx": "xl/workbook.xml"}
+_PDF_PAGINA = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+class Fuente(NamedTuple):
+    ruta: str                      # directorio o .zip
+    es_zip: bool
+
+class ArchivoProcesado(NamedTuple):
+    archivo: str
+    sha256: Optional[str]
+    ruta: Optional[str]            # blob en config.EVIDENCE_DIR
+    bytes: int
+    mime: Optional[str]
+    paginas: Optional[int]
+    miniatura: Optional[str]
+    error: Optional[str]
+
+class ResultadoIngesta(NamedTuple):
+    filas: int
+    ya_procesadas: int             # misma fila del mismo manifiesto, confirmada en una corrida anterior
+    insertadas: int
+    archivos: int
+    bytes: int
+    errores: List[Dict]            # {"fila", "archivo", "error"}
+    omitidas: List[Dict]           # {"fila", "archivo", "motivo"}: su reporte ya existe (otra fila u otro manifiesto)
+    segundos: float
+
+    @property
+    def archivos_por_segundo(self) -> float:
+        return self.archivos / self.segundos if self.segundos > 0 else 0.0
+
+# ---------------------------------------------------------
+# Trabajo por archivo (corre en los procesos del pool)
+# ---------------------------------------------------------
+_zip_worker: Optional[zipfile.ZipFile] = None
+
+def _init_worker(fuente: Fuente, evidence_dir: str, thumb_dir: str):
+    """Cada proceso abre el zip una sola vez y hereda las rutas del almacén del proceso padre."""
+    global _zip_worker
+    config.EVIDENCE_DIR, config.EVIDENCE_THUMB_DIR = evidence_dir, thumb_dir
+    _zip_worker = zipfile.ZipFile(fuente.ruta) if fuente.es_zip else None
+
+def _abrir(fuente: Fuente, archivo: str):
+    if fuente.es_zip:
+        return (_zip_worker or zipfile.ZipFile(fuente.ruta)).open(archivo)
+    return open(os.path.join(fuente.ruta, archivo), "rb")
+
+def _validador(ext: str):
+    _, firmas = EVIDENCE_FIRMAS[ext]
+
+    def validar(path: str):
+        with open(path, "rb") as f:
+            cabecera = f.read(16)
+        if not cabecera.startswith(firmas):
+            raise ValueError(f"el contenido no corresponde a un .{ext}")
+        if ext in _OOXML_PARTE:
+            try:
+                with zipfile.ZipFile(path) as z:
+                    z.getinfo(_OOXML_PARTE[ext])
+            except (zipfile.BadZipFile, KeyError) as e:
+                raise ValueError(f"no es un .{ext} válido") from e
+    return validar
+
+def _contar_paginas_pdf(path: str) -> Optional[int]:
+    """pypdf si está instalado; si no, cuenta los objetos /Type /Page (aproximado con object streams)."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is not None:
+        try:
+            return len(PdfReader(path).pages)
+        except Exception:
+            pass                     # PDF dañado o cifrado: se intenta el conteo por patrón
+    if os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        n = sum(1 for _ in _PDF_PAGINA.finditer(m))
+    return n or None
+
+def _miniatura(path: str, sha256: str) -> Optional[str]:
+    """JPEG de config.EVIDENCE_THUMB_PX px de lado mayor; None si Pillow no está instalado."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    destino = os.path.join(config.EVIDENCE_THUMB_DIR, sha256[:2], f"{sha256}.jpg")
+    if os.path.exists(destino):
+        return destino
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with Image.open(path) as img:
+        img.draft("RGB", (config.EVIDENCE_THUMB_PX, config.EVIDENCE_THUMB_PX))   # JPEG: decodifica ya reducido
+        img.thumbnail((config.EVIDENCE_THUMB_PX, config.EVIDENCE_THUMB_PX))
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        img.convert("RGB").save(tmp, "JPEG", quality=80)
+    os.replace(tmp, destino)
+    return destino
+
+def procesar_archivo(fuente: Fuente, archivo: str, miniaturas: bool = True) -> ArchivoProcesado:
+    """Hash + copia al almacén + validación + metadatos de un archivo. No toca la base de datos."""
+    ext = archivo.rsplit(".", 1)[-1].lower() if "." in archivo else ""
+    if ext not in config.EVIDENCE_EXTENSIONES or ext not in EVIDENCE_FIRMAS:
+        return ArchivoProcesado(archivo, None, None, 0, None, None, None, f"extensión no permitida: .{ext}")
+    try:
+        with _abrir(fuente, archivo) as f:
+            ruta, sha256, size = _copiar_a_almacen(f, validar=_validador(ext))
+        paginas = _contar_paginas_pdf(ruta) if ext == "pdf" else None
+        miniatura = _miniatura(ruta, sha256) if miniaturas and ext in ("png", "jpg", "jpeg") else None
+    except KeyError:
+        return ArchivoProcesado(archivo, None, None, 0, None, None, None, "no está en el zip")
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        return ArchivoProcesado(archivo, None, None, 0, None, None, None, str(e) or type(e).__name__)
+    except Exception as e:          # p. ej. imagen corrupta en Pillow: se informa y se sigue
+        return ArchivoProcesado(archivo, None, None, 0, None, None, None, f"{type(e).__name__}: {e}")
+    return ArchivoProcesado(archivo, sha256, ruta, size, EVIDENCE_FIRMAS[ext][0], paginas, miniatura, None)
+
+def hash_archivo(fuente: Fuente, archivo: str) -> Tuple[Optional[str], Optional[str]]:
+    """(sha256, error) del contenido, sin copiarlo al almacén: identifica la evidencia de cada fila."""
+    h = hashlib.sha256()
+    try:
+        with _abrir(fuente, archivo) as f:
+            for chunk in iter(functools.partial(f.read, config.EVIDENCE_CHUNK_BYTES), b""):
+                h.update(chunk)
+    except KeyError:
+        return None, "no está en el zip"
+    except (OSError, zipfile.BadZipFile) as e:
+        return None, str(e) or type(e).__name__
+    return h.hexdigest(), None
+
+# ---------------------------------------------------------
+# Manifiesto y validación (proceso principal)
+# ---------------------------------------------------------
+def abrir_fuente(origen: str) -> Fuente:
+    if os.path.isdir(origen):
+        return Fuente(origen, False)
+    if zipfile.is_zipfile(origen):
+        return Fuente(origen, True)
+    raise ValueError(f"{origen} no es un directorio ni un .zip")
+
+def _nombre_seguro(archivo: str) -> str:
+    """Ruta relativa dentro de la fuente; rechaza rutas absolutas o que salgan con '..'."""
+    limpio = archivo.replace("\\", "/").strip()
+    partes = [p for p in limpio.split("/") if p not in ("", ".")]
+    if limpio.startswith("/") or ".." in partes or not partes:
+        raise ValueError(f"ruta de archivo no permitida: {archivo}")
+    return "/".join(partes)
+
+def leer_manifiesto(fuente: Fuente, manifiesto: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """(sha256 del manifiesto, filas). Por defecto busca MANIFIESTO_NOMBRES en la raíz de la fuente."""
+    if manifiesto is not None:
+        nombre = manifiesto
+        with open(manifiesto, "rb") as f:
+            contenido = f.read()
+    elif fuente.es_zip:
+        with zipfile.ZipFile(fuente.ruta) as z:
+            presentes = set(z.namelist())
+            nombre = next((n for n in MANIFIESTO_NOMBRES if n in presentes), None)
+            if nombre is None:
+                raise ValueError(f"el zip no trae {' ni '.join(MANIFIESTO_NOMBRES)}")
+            contenido = z.read(nombre)
+    else:
+        nombre = next((n for n in MANIFIESTO_NOMBRES if os.path.exists(os.path.join(fuente.ruta, n))), None)
+        if nombre is None:
+            raise ValueError(f"el directorio no trae {' ni '.join(MANIFIESTO_NOMBRES)}")
+        with open(os.path.join(fuente.ruta, nombre), "rb") as f:
+            contenido = f.read()
+    filas = list(iter_filas_archivo(io.BytesIO(contenido), nombre, INGESTA_ALIAS_COLUMNAS))
+    return hashlib.sha256(contenido).hexdigest(), filas
+
+_EJECUCION = {normalizar_nombre(v): v for v in ESTADO_EJECUCION}
+_SI_NO = {normalizar_nombre(v): v for v in ("Sí", "No")}
+
+def _fecha(valor: Optional[str], campo: str, errores: List[str]) -> Optional[str]:
+    try:
+        return date.fromisoformat((valor or "")[:10]).isoformat()
+    except ValueError:
+        errores.append(f"{campo} inválida (use AAAA-MM-DD): {valor}")
+        return None
+
+def validar_fila_reporte(fila: Dict, responsable: Optional[str] = None) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Misma regla que el formulario de confirmación. Retorna (payload sin id_reporte
+    ni evidencia_path | None, errores). `responsable` se usa si la fila no trae uno.
+    """
+    errores = []
+    if not fila.get("id_planificacion"):
+        errores.append("Falta id_planificacion.")
+    ejecutado = _EJECUCION.get(normalizar_nombre(fila.get("ejecutado") or "Sí"))
+    if ejecutado is None:
+        errores.append(f"Ejecutado inválido: {fila.get('ejecutado')}")
+    fecha_ejecucion = _fecha(fila.get("fecha_ejecucion") or str(date.today()), "Fecha de ejecución", errores)
+    fecha_reporte = _fecha(fila.get("fecha_reporte") or str(date.today()), "Fecha de reporte", errores)
+    tipo_evidencia = fila.get("tipo_evidencia")
+    if tipo_evidencia is not None and tipo_evidencia not in TIPO_EVIDENCIA:
+        errores.append(f"Tipo de evidencia inválido: {tipo_evidencia}")
+    responsable_reporte = fila.get("responsable_reporte") or responsable
+    if not responsable_reporte:
+        errores.append("Debes indicar el responsable del reporte.")
+
+    no_ejecutado = ejecutado in ("No", "Parcial")
+    tipo_motivo = fila.get("tipo_motivo") if no_ejecutado else None
+    if tipo_motivo is not None and tipo_motivo not in TIPO_MOTIVO:
+        errores.append(f"Tipo de motivo inválido: {tipo_motivo}")
+    reprograma = None
+    if no_ejecutado and fila.get("reprograma"):
+        reprograma = _SI_NO.get(normalizar_nombre(fila["reprograma"]))
+        if reprograma is None:
+            errores.append(f"Reprograma inválido (Sí/No): {fila['reprograma']}")
+
+    if errores:
+        return None, errores
+    return {
+        "id_planificacion": fila["id_planificacion"],
+        "ejecutado": ejecutado,
+        "fecha_ejecucion": fecha_ejecucion,
+        "tipo_evidencia": tipo_evidencia,
+        "responsable_reporte": responsable_reporte,
+        "cargo_responsable_reporte": fila.get("cargo_responsable_reporte"),
+        "email_responsable_reporte": fila.get("email_responsable_reporte"),
+        "fecha_reporte": fecha_reporte,
+        "observaciones": fila.get("observaciones"),
+        "motivo_no_ejecucion": fila.get("motivo_no_ejecucion") if no_ejecutado else None,
+        "tipo_motivo": tipo_motivo,
+        "reprograma": reprograma,
+    }, []
+
+def _planificaciones_existentes(ids: Set[str], chunk: int = 500) -> Set[str]:
+    existentes = set()
+    ids = sorted(ids)
+    with get_conn() as conn:
+        for i in range(0, len(ids), chunk):
+            parte = ids[i:i + chunk]
+            cur = conn.execute(
+                f"SELECT id_planificacion FROM planificaciones WHERE id_planificacion IN ({', '.join('?' * len(parte))})",
+                parte,
+            )
+            existentes.update(r[0] for r in cur.fetchall())
+    return existentes
+
+def clave_fila(fila: Dict, sha_evidencia: Optional[str]) -> str:
+    """Identidad del reporte de una fila: sus celdas no vacías + el contenido de su evidencia (no su posición)."""
+    contenido = {c: v for c, v in fila.items() if v is not None}     # una columna vacía nueva no la cambia
+    raw = json.dumps([contenido, sha_evidencia], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def checkpoints(claves: Set[str], chunk: int = 500) -> Dict[str, Tuple[str, int, str]]:
+    """clave -> (manifiesto, fila, id_reporte) de las filas ya confirmadas en corridas anteriores."""
+    encontrados = {}
+    claves = sorted(claves)
+    with get_conn() as conn:
+        for i in range(0, len(claves), chunk):
+            parte = claves[i:i + chunk]
+            cur = conn.execute(
+                f"SELECT clave, manifiesto, fila, id_reporte FROM ingesta_filas WHERE clave IN ({', '.join('?' * len(parte))})",
+                parte,
+            )
+            encontrados.update((clave, (m, fila, id_rep)) for clave, m, fila, id_rep in cur.fetchall())
+    return encontrados
+
+# ---------------------------------------------------------
+# Escritura por lotes y progreso
+# ---------------------------------------------------------
+def _confirmar_lote(manifiesto_sha: str, claves: Dict[int, str],
+                    lote: List[Tuple[int, Dict, Optional[ArchivoProcesado]]]) -> int:
+    """Evidencias + reportes + checkpoint de un lote en UNA transacción."""
+    refs: Dict[str, List] = {}
+    for _, _, arch in lote:
+        if arch is not None:
+            refs.setdefault(arch.sha256, [arch, 0])[1] += 1
+    ahora = datetime.now().isoformat(timespec="seconds")
+    ids = make_ids("REP", len(lote))
+    payloads = [{**payload, "id_reporte": id_rep} for (_, payload, _), id_rep in zip(lote, ids)]
+    with get_conn() as conn:
+        conn.executemany(EVIDENCIA_UPSERT_SQL, [
+            (a.sha256, a.ruta, a.bytes, a.mime, os.path.basename(a.archivo), n, ahora, a.paginas, a.miniatura)
+            for a, n in refs.values()
+        ])
+        conn.executemany(INSERT_REPORTE_SQL, [_reporte_params(p) for p in payloads])
+        conn.executemany(
+            "INSERT INTO ingesta_filas (manifiesto, fila, id_reporte, procesado_en, clave) VALUES (?, ?, ?, ?, ?)",
+            [(manifiesto_sha, n_fila, id_rep, ahora, claves[n_fila]) for (n_fila, _, _), id_rep in zip(lote, ids)],
+        )
+    invalidar("reportes")
+    return len(lote)
+
+class Progreso:
+    """Barra de progreso en stderr (una línea que se reescribe; líneas sueltas si no es una terminal)."""
+
+    def __init__(self, total: int, stream=None, ancho: int = 30):
+        self.total, self.hechas, self.ancho = total, 0, ancho
+        self.stream = stream or sys.stderr
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.t0 = self._ultimo = time.perf_counter()
+
+    def avanzar(self, n: int = 1, detalle: str = ""):
+        self.hechas += n
+        ahora = time.perf_counter()
+        if not self.tty and ahora - self._ultimo < 5 and self.hechas < self.total:
+            return
+        self._ultimo = ahora
+        frac = self.hechas / self.total if self.total else 1.0
+        barra = "#" * int(frac * self.ancho)
+        tasa = self.hechas / max(ahora - self.t0, 1e-9)
+        linea = f"[{barra:<{self.ancho}}] {self.hechas}/{self.total} ({frac:.0%}) {tasa:.1f}/s {detalle}"
+        self.stream.write(("\r" + linea[:120].ljust(120)) if self.tty else linea + "\n")
+        self.stream.flush()
+
+    def cerrar(self):
+        if self.tty:
+            self.stream.write("\n")
+            self.stream.flush()
+
+# ---------------------------------------------------------
+# Orquestación
+# ---------------------------------------------------------
+@profiled
+def ingestar_evidencias(origen: str, manifiesto: Optional[str] = None, responsable: Optional[str] = None,
+                        workers: Optional[int] = None, batch_rows: Optional[int] = None,
+                        miniaturas: bool = True, progreso: bool = True) -> ResultadoIngesta:
+    """
+    Ingesta `origen` (directorio o .zip) según su manifiesto. Las filas ya
+    confirmadas en una corrida anterior del mismo manifiesto se saltan; las que
+    repiten un reporte ya ingerido (misma fila y evidencia en otro manifiesto, o
+    repetida en este) se omiten y se informan; las filas con error no se
+    escriben y se reportan (se reintentan en la próxima corrida).
+    """
+    t0 = time.perf_counter()
+    workers = workers or config.INGESTA_WORKERS
+    batch_rows = batch_rows or config.INGESTA_BATCH_ROWS
+    fuente = abrir_fuente(origen)
+    manifiesto_sha, filas = leer_manifiesto(fuente, manifiesto)
+    errores: List[Dict] = []
+    omitidas: List[Dict] = []
+
+    # 1) Validación de filas (sin tocar archivos)
+    validas: List[Tuple[int, Dict, Dict, Optional[str]]] = []
+    for n_fila, fila in enumerate(filas, start=2):          # fila 1 = encabezado
+        payload, errs = validar_fila_reporte(fila, responsable)
+        archivo = None
+        if payload is not None and fila.get("archivo"):
+            try:
+                archivo = _nombre_seguro(fila["archivo"])
+            except ValueError as e:
+                errs = [str(e)]
+        if errs:
+            errores += [{"fila": n_fila, "archivo": fila.get("archivo"), "error": e} for e in errs]
+            continue
+        validas.append((n_fila, fila, payload, archivo))
+
+    claves: Dict[int, str] = {}                            # fila -> clave del checkpoint
+    barra = None
+    lote: List[Tuple[int, Dict, Optional[ArchivoProcesado]]] = []
+    insertadas = n_archivos = n_bytes = ya_procesadas = 0
+
+    def recibir(filas_archivo: List[Tuple[int, Dict]], arch: Optional[ArchivoProcesado]):
+        nonlocal insertadas, n_archivos, n_bytes
+        if arch is not None and arch.error:
+            errores.extend({"fila": n_fila, "archivo": arch.archivo, "error": arch.error} for n_fila, _ in filas_archivo)
+        else:
+            if arch is not None:
+                n_archivos += 1
+                n_bytes += arch.bytes
+            lote.extend((n_fila, {**payload, "evidencia_path": arch.ruta if arch else None}, arch)
+                        for n_fila, payload in filas_archivo)
+            if len(lote) >= batch_rows:
+                insertadas += _confirmar_lote(manifiesto_sha, claves, lote)
+                lote.clear()
+        if barra is not None:
+            barra.avanzar(len(filas_archivo), arch.archivo if arch else "")
+
+    with cf.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(fuente, config.EVIDENCE_DIR, config.EVIDENCE_THUMB_DIR)) as pool:
+        # 2) Hash de las evidencias en paralelo: con él se arma la clave de cada fila y se
+        #    descartan las ya ingeridas antes de copiar nada al almacén
+        nombres = sorted({archivo for *_, archivo in validas if archivo is not None})
+        hashes = dict(zip(nombres, pool.map(functools.partial(hash_archivo, fuente), nombres, chunksize=16)))
+        for n_fila, fila, _, archivo in validas:
+            sha, error = hashes[archivo] if archivo is not None else (None, None)
+            if error:
+                errores.append({"fila": n_fila, "archivo": archivo, "error": error})
+            else:
+                claves[n_fila] = clave_fila(fila, sha)
+        previas = checkpoints(set(claves.values()))
+
+        primera: Dict[str, int] = {}
+        pendientes: List[Tuple[int, Dict, Optional[str]]] = []
+        for n_fila, _, payload, archivo in validas:
+            clave = claves.get(n_fila)
+            if clave is None:
+                continue
+            if clave in previas:
+                m, fila_previa, id_rep = previas[clave]
+                if m == manifiesto_sha and fila_previa == n_fila:
+                    ya_procesadas += 1
+                else:
+                    donde = "de este manifiesto" if m == manifiesto_sha else "de otro manifiesto"
+                    omitidas.append({"fila": n_fila, "archivo": archivo,
+                                     "motivo": f"Ya ingerida como {id_rep} (fila {fila_previa} {donde})"})
+            elif clave in primera:
+                omitidas.append({"fila": n_fila, "archivo": archivo,
+                                 "motivo": f"Idéntica a la fila {primera[clave]} (misma evidencia)"})
+            else:
+                primera[clave] = n_fila
+                pendientes.append((n_fila, payload, archivo))
+
+        existentes = _planificaciones_existentes({p["id_planificacion"] for _, p, _ in pendientes})
+        por_archivo: Dict[Optional[str], List[Tuple[int, Dict]]] = {}
+        for n_fila, payload, archivo in pendientes:
+            if payload["id_planificacion"] not in existentes:
+                errores.append({"fila": n_fila, "archivo": archivo,
+                                "error": f"Planificación inexistente: {payload['id_planificacion']}"})
+                continue
+            por_archivo.setdefault(archivo, []).append((n_fila, payload))
+
+        # 3) Archivos en paralelo; los reportes se confirman a medida que sus archivos terminan
+        barra = Progreso(sum(len(v) for v in por_archivo.values())) if progreso else None
+        if None in por_archivo:                              # reportes sin evidencia
+            recibir(por_archivo.pop(None), None)
+
+        cola = iter(por_archivo.items())
+        en_vuelo: Dict[cf.Future, List[Tuple[int, Dict]]] = {}
+
+        def encolar():
+            for archivo, filas_archivo in cola:
+                en_vuelo[pool.submit(procesar_archivo, fuente, archivo, miniaturas)] = filas_archivo
+                if len(en_vuelo) >= workers * INGESTA_EN_VUELO_POR_WORKER:
+                    return
+
+        encolar()
+        while en_vuelo:
+            listos, _ = cf.wait(en_vuelo, return_when=cf.FIRST_COMPLETED)
+            for fut in listos:
+                recibir(en_vuelo.pop(fut), fut.result())
+            encolar()
+
+    if lote:
+        insertadas += _confirmar_lote(manifiesto_sha, claves, lote)
+    if barra is not None:
+        barra.cerrar()
+    errores.sort(key=lambda e: e["fila"])
+    return ResultadoIngesta(len(filas), ya_procesadas, insertadas, n_archivos, n_bytes, errores, omitidas,
+                            time.perf_counter() - t0)
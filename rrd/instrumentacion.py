@@ -0,0 +1,136 @@
+# rrd/instrumentacion.py
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .config import PROFILE_LOG_BACKUPS, PROFILE_LOG_MAX_BYTES, PROFILE_LOG_PATH
+from .utilidades import recurso
+
+if TYPE_CHECKING:
+    import logging
+
+# =========================================================
+# INSTRUMENTACIÓN (opt-in: RRD_PROFILE=1; la UI agrega ?debug=1)
+# =========================================================
+class RerunProfile:
+    """Eventos de un rerun: llamadas a BD (con SQL ejecutado) y fases de render."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now().isoformat(timespec="seconds")
+        self.eventos: List[Dict] = []
+        self.sql_stack: List[List[str]] = []     # SQL capturado por llamada anidada
+
+_PROFILE: "contextvars.ContextVar[Optional[RerunProfile]]" = contextvars.ContextVar("rrd_profile", default=None)
+
+def _trace_sql(statement: str):
+    # set_trace_callback de cada conexión del pool; sin perfil activo no hace nada
+    prof = _PROFILE.get()
+    if prof is not None and prof.sql_stack:
+        prof.sql_stack[-1].append(statement)
+
+def _n_filas(result) -> Optional[int]:
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, list) or hasattr(result, "columns"):      # list o DataFrame (sin importar pandas)
+        return len(result)
+    return None
+
+def profiled(fn):
+    """Registra tiempo, filas y SQL de una función de datos (solo si hay perfil activo)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        prof = _PROFILE.get()
+        if prof is None:
+            return fn(*args, **kwargs)
+        prof.sql_stack.append([])
+        t0 = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            sqls = prof.sql_stack.pop()
+            if prof.sql_stack:
+                prof.sql_stack[-1].extend(sqls)
+            prof.eventos.append({
+                "tipo": "db",
+                "nombre": fn.__name__,
+                "ms": round((time.perf_counter() - t0) * 1000, 3),
+                "filas": _n_filas(result),
+                "sql": sqls,
+            })
+    return wrapper
+
+@contextmanager
+def profile_phase(nombre: str):
+    """Fase de render (tab, bloque costoso); no hace nada si no hay perfil activo."""
+    prof = _PROFILE.get()
+    if prof is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.eventos.append({"tipo": "fase", "nombre": nombre, "ms": round((time.perf_counter() - t0) * 1000, 3)})
+
+def _explain(sqls: List[str]) -> Dict[str, List[str]]:
+    from .db import dialecto, get_conn
+
+    planes = {}
+    if dialecto() != "sqlite":
+        return planes
+    with get_conn() as conn:
+        for sql in dict.fromkeys(sqls):
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            try:
+                planes[sql] = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            except sqlite3.Error as e:
+                planes[sql] = [f"(error: {e})"]
+    return planes
+
+@recurso
+def _profile_logger() -> logging.Logger:
+    import logging                      # solo si el perfilado está activo
+    from logging.handlers import RotatingFileHandler
+
+    logger = logging.getLogger("rrd.profile")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    os.makedirs(os.path.dirname(PROFILE_LOG_PATH) or ".", exist_ok=True)
+    handler = RotatingFileHandler(PROFILE_LOG_PATH, maxBytes=PROFILE_LOG_MAX_BYTES,
+                                  backupCount=PROFILE_LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+def start_profile() -> RerunProfile:
+    prof = RerunProfile()
+    _PROFILE.set(prof)
+    return prof
+
+def profiling_enabled() -> bool:
+    return os.environ.get("RRD_PROFILE", "") == "1"
+
+def close_profile(prof: RerunProfile) -> float:
+    """Cierra el perfil: EXPLAIN QUERY PLAN de cada evento y una línea JSONL. Retorna el total en ms."""
+    _PROFILE.set(None)
+    total_ms = round((time.perf_counter() - prof.inicio) * 1000, 3)
+    for ev in prof.eventos:
+        if ev["tipo"] == "db" and ev["sql"]:
+            ev["plan"] = _explain(ev["sql"])
+
+    _profile_logger().info(json.dumps(
+        {"fecha": prof.fecha, "total_ms": total_ms, "eventos": prof.eventos}, ensure_ascii=False, default=str
+    ))
+    return total_ms
@@ -0,0 +1,279 @@
+# rrd/snapshot.py
+import importlib.util
+import json
+import os
+import secrets
+import tempfile
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from . import config
+from .db import CAMBIOS_TABLAS, _consolidado_cols, get_conn
+from .exportacion import (
+    EXPORT_CHUNK_ROWS, EXPORT_DATASETS, EXPORT_FORMATS, EXPORT_SPOOL_MAX_BYTES,
+    _arrow_schema, _arrow_table, _iter_chunks, _require_pyarrow, _write_csv, _write_parquet,
+)
+from .instrumentacion import profiled
+
+# =========================================================
+# SNAPSHOT COLUMNAR DEL CONSOLIDADO (Arrow IPC particionado)
+# =========================================================
+# snapshots/consolidado/anio=<a>/dependencia=<d>/part-<version>-<rand>.arrow
+# _meta.json guarda la versión, las particiones vigentes y la marca de agua
+# (último seq de `cambios`). Al refrescar solo se reescriben las particiones
+# tocadas por altas, modificaciones o eliminaciones desde la marca: la actual
+# de cada fila y, si se movió o eliminó, la que la contenía en el snapshot.
+# Los archivos se leen con memory-map (sin copiar ni tocar la base); la lectura
+# solo refresca si el snapshot tiene más de SNAPSHOT_MAX_AGE_S.
+SNAPSHOT_META = "_meta.json"
+SNAPSHOT_NULO = "__null__"
+
+class SnapshotParticion(NamedTuple):
+    anio: Optional[int]
+    dependencia: Optional[str]
+    archivo: str                    # relativo a config.SNAPSHOT_DIR
+
+class SnapshotMeta(NamedTuple):
+    version: int
+    seq: int                        # último seq de `cambios` incluido
+    particiones: Mapping[str, SnapshotParticion]
+    actualizado_en: str
+    columnas: Tuple[str, ...]       # si cambian las columnas del consolidado se reconstruye todo
+
+_SNAPSHOT_LOCK = threading.Lock()
+
+def snapshot_disponible() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+def _snapshot_key(anio: Optional[int], dependencia: Optional[str]) -> str:
+    a = SNAPSHOT_NULO if anio is None else str(anio)
+    d = SNAPSHOT_NULO if dependencia is None else urllib.parse.quote(dependencia, safe="")
+    return f"anio={a}/dependencia={d}"
+
+def load_snapshot_meta() -> Optional[SnapshotMeta]:
+    try:
+        with open(os.path.join(config.SNAPSHOT_DIR, SNAPSHOT_META), "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return None
+    parts = [SnapshotParticion(*p) for p in raw["particiones"]]
+    return SnapshotMeta(
+        raw["version"], raw["seq"],
+        MappingProxyType({_snapshot_key(p.anio, p.dependencia): p for p in parts}), raw["actualizado_en"],
+        tuple(raw.get("columnas", ())),
+    )
+
+def _save_snapshot_meta(meta: SnapshotMeta):
+    path = os.path.join(config.SNAPSHOT_DIR, SNAPSHOT_META)
+    tmp = path + f".tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": meta.version, "seq": meta.seq,
+            "particiones": [list(p) for p in meta.particiones.values()], "actualizado_en": meta.actualizado_en,
+            "columnas": list(meta.columnas),
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)            # los lectores ven la versión anterior o la nueva, nunca una mezcla
+
+@contextmanager
+def _snapshot_lock():
+    """Un solo refresco a la vez: lock del proceso + flock entre procesos (si existe)."""
+    with _SNAPSHOT_LOCK:
+        os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+        with open(os.path.join(config.SNAPSHOT_DIR, ".lock"), "w") as f:
+            try:
+                import fcntl
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except ImportError:
+                pass                 # Windows: solo lock del proceso
+            yield
+
+def _snapshot_marca(conn) -> int:
+    return int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cambios").fetchone()[0])
+
+# Partición ACTUAL de cada planificación o reporte con cambios desde la marca
+SNAPSHOT_CAMBIADAS_SQL = """
+SELECT p.anio, p.dependencia
+FROM cambios c JOIN planificaciones p ON p.id_planificacion = c.clave
+WHERE c.seq > ? AND c.tabla = 'planificaciones'
+UNION
+SELECT p.anio, p.dependencia
+FROM cambios c JOIN reportes r ON r.id_reporte = c.clave JOIN planificaciones p ON p.id_planificacion = r.id_planificacion
+WHERE c.seq > ? AND c.tabla = 'reportes'
+"""
+# Claves modificadas o eliminadas: pueden estar en OTRA partición del snapshot
+SNAPSHOT_MOVIDAS_SQL = "SELECT DISTINCT tabla, clave FROM cambios WHERE seq > ? AND operacion IN ('U', 'D')"
+
+def _particiones_con_claves(meta: SnapshotMeta, claves: Dict[str, Set[str]]) -> Set[Tuple]:
+    """(anio, dependencia) de las particiones del snapshot que contienen alguna de las `claves` por tabla."""
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    buscadas = {CAMBIOS_TABLAS[t]: pa.array(sorted(ids), pa.string()) for t, ids in claves.items() if ids}
+    encontradas = set()
+    for p in meta.particiones.values():
+        with pa.memory_map(os.path.join(config.SNAPSHOT_DIR, p.archivo), "r") as source:
+            tabla = pa.ipc.open_file(source).read_all()
+            if any(pc.any(pc.is_in(tabla[col], value_set=ids)).as_py() for col, ids in buscadas.items()):
+                encontradas.add((p.anio, p.dependencia))
+    return encontradas
+
+def _snapshot_particiones_cambiadas(conn, meta: Optional[SnapshotMeta]) -> Set[Tuple]:
+    if meta is None:
+        return set(conn.execute("SELECT DISTINCT anio, dependencia FROM planificaciones").fetchall())
+    cambiadas = set(conn.execute(SNAPSHOT_CAMBIADAS_SQL, (meta.seq, meta.seq)).fetchall())
+    movidas: Dict[str, Set[str]] = {}
+    for tabla, clave in conn.execute(SNAPSHOT_MOVIDAS_SQL, (meta.seq,)).fetchall():
+        movidas.setdefault(tabla, set()).add(clave)
+    if movidas:
+        cambiadas |= _particiones_con_claves(meta, movidas)
+    return cambiadas
+
+def _snapshot_particion_sql(anio: Optional[int], dependencia: Optional[str]) -> Tuple[str, List]:
+    cols = _consolidado_cols()
+    where = ["p.anio IS NULL" if anio is None else "p.anio = ?",
+             "p.dependencia IS NULL" if dependencia is None else "p.dependencia = ?"]
+    sql = (
+        "SELECT " + ", ".join(f"{expr} AS {name}" for expr, name in cols)
+        + " FROM planificaciones p LEFT JOIN reportes r ON r.id_planificacion = p.id_planificacion"
+        + " WHERE " + " AND ".join(where)
+        + " ORDER BY p.fecha_registro DESC, p.id_planificacion, r.fecha_reporte"
+    )
+    return sql, [v for v in (anio, dependencia) if v is not None]
+
+def _write_snapshot_particion(anio: Optional[int], dependencia: Optional[str], version: int) -> Tuple[str, int]:
+    """Escribe la partición completa en un .arrow nuevo (sin compresión: apto para mmap). Retorna (archivo, filas)."""
+    pa = _require_pyarrow()
+    columns = [name for _, name in _consolidado_cols()]
+    schema = _arrow_schema(pa, columns)
+    rel_dir = _snapshot_key(anio, dependencia)
+    os.makedirs(os.path.join(config.SNAPSHOT_DIR, rel_dir), exist_ok=True)
+    rel = f"{rel_dir}/part-{version:06d}-{secrets.token_hex(4)}.arrow"
+    path = os.path.join(config.SNAPSHOT_DIR, rel)
+    sql, params = _snapshot_particion_sql(anio, dependencia)
+    n = 0
+    with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for rows in _iter_chunks(sql, params, EXPORT_CHUNK_ROWS):
+            writer.write_table(_arrow_table(pa, schema, columns, rows))
+            n += len(rows)
+    os.replace(path + ".tmp", path)
+    return rel, n
+
+def _cleanup_snapshot(meta: SnapshotMeta):
+    vigentes = {os.path.normpath(p.archivo) for p in meta.particiones.values()}
+    for root, _, files in os.walk(config.SNAPSHOT_DIR):
+        for name in files:
+            rel = os.path.normpath(os.path.relpath(os.path.join(root, name), config.SNAPSHOT_DIR))
+            if name.endswith((".arrow", ".arrow.tmp")) and rel not in vigentes:
+                os.remove(os.path.join(root, name))    # lectores con mmap abierto no se ven afectados (POSIX)
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def snapshot_vencido(meta: Optional[SnapshotMeta]) -> bool:
+    """Sin snapshot, o actualizado hace más de SNAPSHOT_MAX_AGE_S (0 = solo a pedido)."""
+    if meta is None:
+        return True
+    edad = (datetime.now() - datetime.fromisoformat(meta.actualizado_en)).total_seconds()
+    return 0 < config.SNAPSHOT_MAX_AGE_S < edad
+
+@profiled
+def refresh_snapshot(completo: bool = False) -> SnapshotMeta:
+    """
+    Lleva el snapshot a la marca de agua actual. Solo reescribe las particiones
+    (anio, dependencia) con cambios; `completo=True` reconstruye todo.
+    """
+    _require_pyarrow()
+    with _snapshot_lock():
+        columnas = tuple(name for _, name in _consolidado_cols())
+        meta = None if completo else load_snapshot_meta()
+        if meta is not None and meta.columnas != columnas:
+            meta = None
+        with get_conn() as conn:
+            marca = _snapshot_marca(conn)          # antes de leer: lo que llegue después entra en el próximo refresco
+            if meta is not None and marca == meta.seq:
+                vigente = meta._replace(actualizado_en=_ahora())
+                _save_snapshot_meta(vigente)       # al día: no se vuelve a consultar hasta SNAPSHOT_MAX_AGE_S
+                return vigente
+            cambiadas = _snapshot_particiones_cambiadas(conn, meta)
+
+        version = meta.version + 1 if meta is not None else 1
+        particiones = dict(meta.particiones) if meta is not None else {}
+        for anio, dependencia in cambiadas:
+            archivo, n = _write_snapshot_particion(anio, dependencia, version)
+            key = _snapshot_key(anio, dependencia)
+            if n:
+                particiones[key] = SnapshotParticion(anio, dependencia, archivo)
+            else:
+                particiones.pop(key, None)
+        nueva = SnapshotMeta(version, marca, MappingProxyType(particiones), _ahora(), columnas)
+        _save_snapshot_meta(nueva)
+        _cleanup_snapshot(nueva)
+        return nueva
+
+SNAPSHOT_FILTROS = ["periodo_planificado", "region", "provincia", "comuna"]
+
+def snapshot_filtrable(filtros: Optional[Dict]) -> bool:
+    """`ejecutado` filtra por planificación (EXISTS) y no se replica sobre filas del consolidado."""
+    return (filtros or {}).get("ejecutado") is None
+
+@profiled
+def read_snapshot(filtros: Optional[Dict] = None, refrescar: Optional[bool] = None):
+    """
+    Consolidado como pyarrow.Table leído con memory-map: poda por partición
+    (anio, dependencia) y el resto de los filtros con pyarrow.compute.
+    refrescar: None = solo si está vencido (snapshot_vencido), True = siempre, False = nunca.
+    """
+    pa = _require_pyarrow()
+    import pyarrow.compute as pc
+
+    if not snapshot_filtrable(filtros):
+        raise ValueError("El snapshot no soporta el filtro 'ejecutado'; usar query_consolidado/export_dataset.")
+    filtros = filtros or {}
+    meta = load_snapshot_meta()
+    if refrescar or (refrescar is None and snapshot_vencido(meta)):
+        meta = refresh_snapshot()
+    columns = [name for _, name in _consolidado_cols()]
+    tablas = []
+    for p in (meta.particiones.values() if meta is not None else []):
+        if filtros.get("anio") is not None and p.anio != int(filtros["anio"]):
+            continue
+        if filtros.get("dependencia") is not None and p.dependencia != filtros["dependencia"]:
+            continue
+        with pa.memory_map(os.path.join(config.SNAPSHOT_DIR, p.archivo), "r") as source:
+            tablas.append(pa.ipc.open_file(source).read_all())
+    tabla = pa.concat_tables(tablas) if tablas else _arrow_schema(pa, columns).empty_table()
+    for col in SNAPSHOT_FILTROS:
+        if filtros.get(col) is not None:
+            tabla = tabla.filter(pc.equal(tabla[col], filtros[col]))
+    return tabla
+
+def _iter_tabla(tabla, chunksize: int):
+    """Filas (tuplas) de una pyarrow.Table de a `chunksize`, para reutilizar los writers de exportación."""
+    for batch in tabla.to_batches(max_chunksize=chunksize):
+        yield list(zip(*(col.to_pylist() for col in batch.columns)))
+
+@profiled
+def export_snapshot(formato: str = "CSV", filtros: Optional[Dict] = None, chunksize: int = EXPORT_CHUNK_ROWS,
+                    refrescar: Optional[bool] = None):
+    """Como export_dataset("consolidado", ...) pero servido desde el snapshot columnar."""
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    ext, mime = EXPORT_FORMATS[formato]
+    tabla = read_snapshot(filtros, refrescar)
+    chunks = _iter_tabla(tabla, chunksize)
+
+    out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+    try:
+        if formato == "Parquet":
+            n = _write_parquet(out, tabla.column_names, chunks)
+        else:
+            n = _write_csv(out, tabla.column_names, chunks, compress=(formato == "CSV (gzip)"))
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out, f"{EXPORT_DATASETS['consolidado']}.{ext}", mime, n
@@ -0,0 +1,83 @@
+# rrd/utilidades.py
+import functools
+import os
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from . import config
+from .config import PERIODO_MESES
+
+# =========================================================
+# UTILIDADES
+# =========================================================
+def recurso(fn=None, *, maxsize: Optional[int] = None):
+    """
+    Equivalente a st.cache_resource sin Streamlit: un valor por proceso y
+    argumentos, creado una sola vez aunque lo pidan varios hilos a la vez.
+    `.clear()` descarta lo cacheado (p. ej. para cambiar de base en benchmarks).
+    """
+    def decorar(f):
+        cached = functools.lru_cache(maxsize=maxsize)(f)
+        lock = threading.RLock()
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return cached(*args, **kwargs)
+        wrapper.clear = cached.cache_clear
+        return wrapper
+    return decorar(fn) if fn is not None else decorar
+
+def ensure_dirs():
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+
+def periodo_rango(periodo: Optional[str], anio) -> Tuple[Optional[str], Optional[str]]:
+    """(inicio, fin) ISO del periodo en `anio`, ambos inclusive; (None, None) si no se puede derivar."""
+    meses = PERIODO_MESES.get(periodo)
+    if meses is None or anio is None:
+        return None, None
+    anio = int(anio)
+    fin = date(anio, 12, 31) if meses[1] == 12 else date(anio, meses[1] + 1, 1) - timedelta(days=1)
+    return date(anio, meses[0], 1).isoformat(), fin.isoformat()
+
+# IDs ordenables por tiempo (estilo ULID): PREFIJO-AAAAMMDD-HHMMSS-mmm-<13 base32>
+# - milisegundos UTC al frente: los nuevos IDs se agregan al final del índice PK
+# - 64 bits aleatorios por milisegundo (únicos entre procesos); dentro del mismo
+#   milisegundo el proceso incrementa en 1, así el orden de ID = orden de creación
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ID_LOCK = threading.Lock()
+_id_last_ms = 0
+_id_last_rand = 0
+
+def _reset_id_state():
+    global _id_last_ms, _id_last_rand
+    _id_last_ms, _id_last_rand = 0, 0
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_id_state)
+
+def _b32(n: int, width: int) -> str:
+    out = []
+    for _ in range(width):
+        n, r = divmod(n, 32)
+        out.append(_CROCKFORD[r])
+    return "".join(reversed(out))
+
+def make_ids(prefix: str, n: int) -> List[str]:
+    """n IDs estrictamente crecientes con una sola toma del lock."""
+    global _id_last_ms, _id_last_rand
+    with _ID_LOCK:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _id_last_ms:
+            _id_last_ms, _id_last_rand = now_ms, secrets.randbits(63)
+        ms, start = _id_last_ms, _id_last_rand + 1
+        _id_last_rand += n
+    stamp = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    head = f"{prefix}-{stamp:%Y%m%d-%H%M%S}-{ms % 1000:03d}"
+    return [f"{head}-{_b32(start + i, 13)}" for i in range(n)]
+
+def make_id(prefix: str) -> str:
+    return make_ids(prefix, 1)[0]
@@ -0,0 +1,79 @@
+# tests/conftest.py
+import itertools
+import os
+
+import pytest
+
+from rrd import config, db
+from rrd.divisiones import comunas, load_divisiones, provincias, regiones, territorial_requirements
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTRUMENTOS_TEST = ["SGE-SAT", "SRRD-EME-REG", "DR-COGRID-PRO", "DR-PLAN-EME-COM"]   # un ámbito por nivel territorial
+PERIODOS_TEST = ["Marzo", "2° Trimestre", "1° Semestre", "Anual"]
+
+@pytest.fixture(autouse=True)
+def divisiones(monkeypatch):
+    """El CSV de divisiones del repo, independiente del directorio desde el que se corre pytest."""
+    monkeypatch.setattr(config, "DIVISIONES_PATH", os.path.join(RAIZ, "divisiones_chile_utf8sig.csv"))
+
+@pytest.fixture(autouse=True)
+def sin_cache_de_consultas(monkeypatch):
+    """Los tests escriben también con SQL directo (sin invalidar): el caché se prueba aparte en test_cache.py."""
+    monkeypatch.setattr(config, "QUERY_CACHE_ENABLED", False)
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    """Base SQLite temporal y migrada; config.DB_PATH apunta a ella durante el test."""
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "rrd.db"))
+    db.get_pool.clear()
+    db.init_db()
+    yield tmp_path
+    db.get_pool().close_all()
+    db.get_pool.clear()
+
+@pytest.fixture
+def nuevo_plan():
+    """Fábrica de payloads de planificación válidos (ids PLA-T-0000, PLA-T-0001, ...)."""
+    instrumentos = {row[0]: row for row in config.INSTRUMENTOS}
+    idx = load_divisiones(config.DIVISIONES_PATH)
+    region = regiones(idx)[0]
+    provincia = provincias(idx, region)[0]
+    comuna = comunas(idx, region, provincia)[0]
+    contador = itertools.count()
+
+    def crear(**campos):
+        i = next(contador)
+        id_inst, tipo, nombre, ambito, _, _, _, owner = instrumentos[INSTRUMENTOS_TEST[i % len(INSTRUMENTOS_TEST)]]
+        req = territorial_requirements(ambito)
+        plan = {
+            "id_planificacion": f"PLA-T-{i:04d}", "dependencia": owner, "id_instrumento": id_inst,
+            "tipo_instrumento": tipo, "nombre_instrumento": nombre, "ambito": ambito,
+            "region": region if req["region"] else None,
+            "provincia": provincia if req["provincia"] else None,
+            "comuna": comuna if req["comuna"] else None,
+            "entidad_objetivo": None, "anio": 2025, "periodo_planificado": PERIODOS_TEST[i % len(PERIODOS_TEST)],
+            "tipo_accion": "Supervisión", "responsable_planificacion": "Ana",
+            "cargo_responsable_planificacion": None, "email_responsable_planificacion": None,
+            "fecha_registro": f"2025-01-{1 + i % 28:02d}", "observaciones": None,
+        }
+        plan.update(campos)
+        return plan
+    return crear
+
+@pytest.fixture
+def nuevo_reporte():
+    """Fábrica de payloads de reporte para una planificación dada (ids REP-T-0000, ...)."""
+    contador = itertools.count()
+
+    def crear(plan, **campos):
+        i = next(contador)
+        rep = {
+            "id_reporte": f"REP-T-{i:04d}", "id_planificacion": plan["id_planificacion"], "ejecutado": "Sí",
+            "fecha_ejecucion": "2025-03-01", "tipo_evidencia": None, "evidencia_path": None,
+            "responsable_reporte": "Ana", "cargo_responsable_reporte": None, "email_responsable_reporte": None,
+            "fecha_reporte": f"2025-03-{1 + i % 28:02d}", "observaciones": None,
+            "motivo_no_ejecucion": None, "tipo_motivo": None, "reprograma": None,
+        }
+        rep.update(campos)
+        return rep
+    return crear
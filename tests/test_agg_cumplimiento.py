@@ -0,0 +1,45 @@
+# tests/test_agg_cumplimiento.py
+from rrd import db
+
+def _agg(conn):
+    return conn.execute(
+        f"SELECT {db.AGG_KEY}, planificadas, con_reporte, ejecutadas_si, ejecutadas_no, ejecutadas_parcial "
+        "FROM agg_cumplimiento WHERE planificadas OR con_reporte OR ejecutadas_si OR ejecutadas_no "
+        "OR ejecutadas_parcial ORDER BY 1, 2, 3, 4, 5"
+    ).fetchall()
+
+def _assert_igual_a_rebuild():
+    with db.get_conn() as conn:
+        incremental = _agg(conn)
+        db.rebuild_agg_cumplimiento(conn)
+        assert incremental == _agg(conn)
+
+def test_triggers_igualan_al_rebuild(base, nuevo_plan, nuevo_reporte):
+    planes = [nuevo_plan() for _ in range(4)]
+    for p in planes:
+        db.insert_planificacion(p)
+    a, b, c, d = planes
+    for plan, ejecutado in [(a, "Sí"), (a, "No"), (b, "Parcial"), (c, "Sí")]:
+        db.insert_reporte(nuevo_reporte(plan, ejecutado=ejecutado))
+    _assert_igual_a_rebuild()
+
+    pasos = [
+        # planificaciones: cambio de clave de agregación y de id (sus reportes quedan huérfanos)
+        ("UPDATE planificaciones SET dependencia = 'Otra', anio = 2031 WHERE id_planificacion = ?", [a["id_planificacion"]]),
+        ("UPDATE planificaciones SET region = NULL, periodo_planificado = 'Anual' WHERE id_planificacion = ?",
+         [b["id_planificacion"]]),
+        ("UPDATE planificaciones SET id_planificacion = 'PLA-T-NUEVO' WHERE id_planificacion = ?", [c["id_planificacion"]]),
+        # reportes: cambio de estado y de planificación
+        ("UPDATE reportes SET ejecutado = 'Parcial' WHERE id_planificacion = ? AND ejecutado = 'Sí'", [a["id_planificacion"]]),
+        ("UPDATE reportes SET id_planificacion = ? WHERE id_planificacion = ?", [d["id_planificacion"], b["id_planificacion"]]),
+        ("UPDATE reportes SET id_planificacion = ? WHERE id_planificacion = ? AND ejecutado = 'No'",
+         [d["id_planificacion"], a["id_planificacion"]]),
+        # eliminaciones: reporte y planificación con reportes
+        ("DELETE FROM reportes WHERE id_planificacion = ? AND ejecutado = 'No'", [d["id_planificacion"]]),
+        ("DELETE FROM planificaciones WHERE id_planificacion = ?", [d["id_planificacion"]]),
+        ("DELETE FROM planificaciones WHERE id_planificacion = ?", [a["id_planificacion"]]),
+    ]
+    for sql, params in pasos:
+        with db.get_conn() as conn:
+            conn.execute(sql, params)
+        _assert_igual_a_rebuild()
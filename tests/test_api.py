@@ -0,0 +1,111 @@
+# tests/test_api.py
+import asyncio
+import gzip
+import json
+from urllib.parse import quote
+
+import pytest
+
+pytest.importorskip("tornado")
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+import api
+from rrd import db
+
+@pytest.fixture
+def get(base):
+    """`get(ruta, **headers) -> (status, headers, body)` contra la API en un puerto libre."""
+
+    def _get(ruta: str, **headers):
+        async def pedir():
+            sock, port = bind_unused_port()
+            servidor = HTTPServer(api.make_app())
+            servidor.add_sockets([sock])
+            try:
+                resp = await AsyncHTTPClient().fetch(
+                    f"http://127.0.0.1:{port}{ruta}", headers=headers, raise_error=False, decompress_response=False,
+                )
+                return resp.code, resp.headers, resp.body
+            finally:
+                servidor.stop()
+        return asyncio.run(pedir())
+    return _get
+
+@pytest.fixture
+def planes(base, nuevo_plan):
+    planes = [nuevo_plan() for _ in range(5)]
+    for p in planes:
+        db.insert_planificacion(p)
+    return planes
+
+def test_etag_y_304(get, planes, nuevo_plan):
+    ruta = "/api/v1/planificaciones?limite=2"
+    status, headers, _ = get(ruta)
+    etag = headers["Etag"]
+    assert status == 200 and etag.startswith('W/"')
+
+    assert get(ruta, **{"If-None-Match": etag})[0] == 304
+    assert get(ruta + "&desc=0", **{"If-None-Match": etag})[0] == 200    # otra URL, otro ETag
+
+    db.insert_planificacion(nuevo_plan())                                 # cambian los datos
+    status, headers, _ = get(ruta, **{"If-None-Match": etag})
+    assert status == 200 and headers["Etag"] != etag
+
+def test_cursor_recorre_todo_sin_repetir(get, planes):
+    vistos, cursor = [], None
+    while True:
+        ruta = "/api/v1/planificaciones?orden=fecha_registro&desc=0&limite=2"
+        status, _, body = get(ruta + (f"&cursor={cursor}" if cursor else ""))
+        assert status == 200
+        pagina = json.loads(body)
+        vistos += [it["id_planificacion"] for it in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    esperado = [p["id_planificacion"] for p in sorted(planes, key=lambda p: (p["fecha_registro"], p["id_planificacion"]))]
+    assert vistos == esperado
+
+@pytest.mark.parametrize("cursor", [
+    api.encode_cursor(("2025-01-01", 7)),              # id_ no es texto
+    api.encode_cursor(([1, 2], "PLA-T-0001")),         # valor no escalar
+    api.encode_cursor((True, "PLA-T-0001")),
+    "no-es-base64-json",
+])
+def test_cursor_invalido(get, cursor):
+    with pytest.raises(api.ErrorPeticion):
+        api.decode_cursor(cursor)
+    status, _, body = get(f"/api/v1/planificaciones?cursor={cursor}")
+    assert status == 400 and json.loads(body) == {"error": "cursor inválido"}
+
+def test_cursor_ida_y_vuelta():
+    for cursor in [("2025-01-01", "PLA-1"), (2025, "PLA-2"), (1.5, "PLA-3"), (None, "PLA-4")]:
+        assert api.decode_cursor(api.encode_cursor(cursor)) == cursor
+
+def test_ndjson_completo_y_comprimido(get, planes):
+    status, headers, body = get("/api/v1/planificaciones.ndjson", **{"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert headers["Content-Type"].startswith("application/x-ndjson")
+    assert headers["Content-Encoding"] == "gzip"
+    filas = [json.loads(linea) for linea in gzip.decompress(body).decode("utf-8").splitlines()]
+    assert sorted(f["id_planificacion"] for f in filas) == sorted(p["id_planificacion"] for p in planes)
+
+def test_ndjson_con_filtros(get, planes):
+    dependencia = planes[0]["dependencia"]
+    _, _, body = get(f"/api/v1/planificaciones.ndjson?dependencia={quote(dependencia)}")
+    filas = [json.loads(linea) for linea in body.decode("utf-8").splitlines()]
+    assert filas and {f["dependencia"] for f in filas} == {dependencia}
+
+def test_cambios_y_etag_tras_update(get, planes):
+    status, headers, body = get("/api/v1/cambios?desde=0&tabla=planificaciones&limite=3")
+    pagina = json.loads(body)
+    assert status == 200 and pagina["hay_mas"] and len(pagina["items"]) == 3
+
+    id_ = planes[0]["id_planificacion"]
+    with db.get_conn() as conn:                                           # el ETag sigue también a los UPDATE
+        conn.execute("UPDATE planificaciones SET anio = 2031 WHERE id_planificacion = ?", [id_])
+    assert get("/api/v1/cambios?desde=0&tabla=planificaciones&limite=3", **{"If-None-Match": headers["Etag"]})[0] == 200
+    ultimo = json.loads(get(f"/api/v1/cambios?desde={pagina['next_cursor']}")[2])["items"][-1]
+    assert (ultimo["operacion"], ultimo["clave"], ultimo["fila"]["anio"]) == ("U", id_, 2031)
+    assert get("/api/v1/cambios?tabla=instrumentos")[0] == 400
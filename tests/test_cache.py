@@ -0,0 +1,87 @@
+# tests/test_cache.py
+import pytest
+
+from rrd import cache, config, db
+
+class Reloj:
+    """Reemplaza a `time` dentro de rrd.cache: TTL y sincronización sin sleeps."""
+
+    def __init__(self):
+        self.t = 1000.0
+
+    def monotonic(self) -> float:
+        return self.t
+
+@pytest.fixture
+def reloj(base, monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(config, "QUERY_CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "time", reloj)
+    monkeypatch.setattr(cache, "_CACHE", cache.CacheConsultas())      # sin entradas ni generaciones de otros tests
+    return reloj
+
+@pytest.fixture
+def planes(base, nuevo_plan):
+    planes = [nuevo_plan() for _ in range(3)]
+    for p in planes:
+        db.insert_planificacion(p)
+    return planes
+
+def _aciertos_fallos():
+    e = cache.estadisticas_cache()
+    return e["aciertos"], e["fallos"]
+
+def _insert_externo(plan):
+    """Como si escribiera otro proceso: SQL directo, sin invalidar el caché de este."""
+    with db.get_conn() as conn:
+        conn.execute(db.INSERT_PLANIFICACION_SQL, db._planificacion_params(plan))
+
+def test_escritura_invalida_solo_sus_tablas(reloj, planes, nuevo_reporte):
+    db.fetch_planificaciones()
+    db.fetch_reportes()
+    db.insert_reportes([nuevo_reporte(planes[0])])
+
+    assert len(db.fetch_planificaciones()) == 3                           # acierto: reportes no la toca
+    assert len(db.fetch_reportes()) == 1                                  # fallo: generación nueva
+    assert _aciertos_fallos() == (1, 3)
+
+def test_resultado_es_copia(reloj, planes):
+    df = db.fetch_planificaciones()
+    df["extra"] = 1
+    assert "extra" not in db.fetch_planificaciones().columns
+
+def test_ttl(reloj, planes):
+    db.fetch_planificaciones()
+    reloj.t += config.QUERY_CACHE_TTL_S - 1
+    db.fetch_planificaciones()
+    reloj.t += 2
+    db.fetch_planificaciones()
+    assert _aciertos_fallos() == (1, 2)
+
+def test_lru(reloj, planes, monkeypatch):
+    monkeypatch.setattr(config, "QUERY_CACHE_MAX_ENTRIES", 2)
+    a, b, c = (p["id_planificacion"] for p in planes)
+    for id_ in (a, b, a, c):                                              # c expulsa a b, el menos usado
+        db.fetch_planificacion_by_id(id_)
+    assert cache.estadisticas_cache()["expulsiones"] == 1
+
+    db.fetch_planificacion_by_id(a)
+    db.fetch_planificacion_by_id(b)
+    assert _aciertos_fallos() == (2, 4)
+
+def test_escrituras_de_otro_proceso_por_cambios(reloj, planes, nuevo_plan):
+    db.fetch_planificaciones()
+    _insert_externo(nuevo_plan())
+
+    assert len(db.fetch_planificaciones()) == 3                           # aún no toca mirar `cambios`
+    reloj.t += config.QUERY_CACHE_SYNC_S + 0.1
+    assert len(db.fetch_planificaciones()) == 4
+    assert _aciertos_fallos() == (1, 2)
+
+def test_sin_cache_va_a_la_base(reloj, planes, nuevo_plan):
+    db.fetch_planificaciones()
+    _insert_externo(nuevo_plan())
+
+    assert len(db.fetch_planificaciones.sin_cache()) == 4
+    assert len(db.fetch_planificaciones()) == 3
+    assert _aciertos_fallos() == (1, 1)
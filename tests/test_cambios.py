@@ -0,0 +1,49 @@
+# tests/test_cambios.py
+import pytest
+
+from rrd import db
+from rrd.cambios import iter_cambios, leer_cambios, ultimo_cambio
+
+@pytest.fixture
+def planes(base, nuevo_plan, nuevo_reporte):
+    """Tres planificaciones y dos reportes: 5 cambios 'I'."""
+    planes = [nuevo_plan() for _ in range(3)]
+    for p in planes:
+        db.insert_planificacion(p)
+    db.insert_reportes([nuevo_reporte(planes[0], ejecutado="Sí"), nuevo_reporte(planes[1], ejecutado="No")])
+    return planes
+
+def test_paginas_con_cursor(planes):
+    vistos, desde = [], 0
+    while True:
+        pagina = leer_cambios(desde, limite=2)
+        vistos += [it["seq"] for it in pagina.items]
+        desde = pagina.cursor
+        if not pagina.hay_mas:
+            break
+    assert vistos == sorted(set(vistos)) and len(vistos) == 5
+    assert desde == ultimo_cambio()
+    assert leer_cambios(desde) == ([], desde, False)
+    assert [it["seq"] for it in iter_cambios(0, limite=2)] == vistos
+
+def test_filtro_por_tabla(planes):
+    reportes = leer_cambios(0, ["reportes"]).items
+    assert [it["tabla"] for it in reportes] == ["reportes", "reportes"]
+    assert {it["fila"]["id_planificacion"] for it in reportes} == {planes[0]["id_planificacion"], planes[1]["id_planificacion"]}
+    assert len(leer_cambios(0, ["planificaciones"]).items) == 3
+    with pytest.raises(ValueError):
+        leer_cambios(0, ["instrumentos"])
+
+def test_update_y_delete_traen_el_estado_actual(planes):
+    desde = ultimo_cambio()
+    id_ = planes[2]["id_planificacion"]
+    with db.get_conn() as conn:
+        conn.execute("UPDATE planificaciones SET anio = 2031 WHERE id_planificacion = ?", [id_])
+        conn.execute("DELETE FROM reportes WHERE ejecutado = 'No'")
+
+    upd, dele = leer_cambios(desde).items
+    assert (upd["operacion"], upd["clave"], upd["fila"]["anio"]) == ("U", id_, 2031)
+    assert (dele["tabla"], dele["operacion"], dele["fila"]) == ("reportes", "D", None)
+    # la entrada 'I' original ya trae la última versión de la fila
+    inicial = next(it for it in leer_cambios(0).items if it["clave"] == id_)
+    assert (inicial["operacion"], inicial["fila"]["anio"]) == ("I", 2031)
@@ -0,0 +1,47 @@
+# tests/test_carga.py
+import io
+
+import pytest
+
+from rrd import carga, config, db, divisiones
+from rrd.catalogo import build_catalogo
+
+@pytest.fixture
+def importar(base):
+    catalogo = build_catalogo(config.INSTRUMENTOS, "test")
+    div_idx = divisiones.load_divisiones(config.DIVISIONES_PATH)
+
+    def correr(filas, **kw):
+        return carga.importar_planificaciones(filas, catalogo, div_idx, **kw)
+    return correr
+
+def test_id_existente_en_la_base_es_error_de_fila(importar, nuevo_plan):
+    existente = nuevo_plan()
+    db.insert_planificacion(existente)
+    nueva = nuevo_plan()
+
+    res = importar([dict(existente), dict(nueva)], todo_o_nada=False)
+
+    assert res.confirmado and res.insertadas == 1
+    assert [(e["fila"], e["error"]) for e in res.errores] == [(2, f"ID ya existe en la base: {existente['id_planificacion']}")]
+    assert db.fetch_planificacion_by_id(nueva["id_planificacion"]) is not None
+
+def test_id_existente_todo_o_nada_deshace(importar, nuevo_plan):
+    existente = nuevo_plan()
+    db.insert_planificacion(existente)
+    nueva = nuevo_plan()
+
+    res = importar([dict(nueva), dict(existente)])
+
+    assert not res.confirmado and res.insertadas == 0 and len(res.errores) == 1
+    assert db.fetch_planificacion_by_id(nueva["id_planificacion"]) is None
+
+def test_anio_infinito_es_error_de_fila(importar, nuevo_plan):
+    res = importar([nuevo_plan(anio="inf")], todo_o_nada=False)
+    assert res.insertadas == 0
+    assert res.errores[0]["error"] == "Año inválido: inf"
+
+def test_csv_no_utf8_es_value_error(importar):
+    archivo = io.BytesIO("id_instrumento;anio\nSGE-SAT;año\n".encode("latin-1"))
+    with pytest.raises(ValueError):
+        importar(carga.iter_filas_archivo(archivo, "plan.csv"))
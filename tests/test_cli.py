@@ -0,0 +1,33 @@
+# tests/test_cli.py
+import pytest
+
+from rrd import cli, config, db
+
+def test_error_de_base_sale_con_mensaje(base, monkeypatch, capsys):
+    def falla(args):
+        with db.get_conn() as conn:
+            conn.execute("INSERT INTO planificaciones (id_planificacion) VALUES (NULL)")
+    monkeypatch.setattr(cli, "cmd_migrate", falla)
+
+    assert cli.main(["migrate"]) == 2
+    assert capsys.readouterr().err.startswith("error de base de datos:")
+
+def test_otras_excepciones_no_se_ocultan(base, monkeypatch):
+    def falla(args):
+        raise KeyError("x")
+    monkeypatch.setattr(cli, "cmd_migrate", falla)
+
+    with pytest.raises(KeyError):
+        cli.main(["migrate"])
+
+def test_comandos_de_datos_migran_una_base_nueva(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "nueva.db"))
+    db.get_pool.clear()
+    try:
+        destino = tmp_path / "planificaciones.csv"
+        assert cli.main(["exportar", "planificaciones", "--out", str(destino)]) == 0
+        assert capsys.readouterr().out.startswith("0 filas")
+        assert destino.read_text(encoding="utf-8-sig").startswith("id_planificacion")
+    finally:
+        db.get_pool().close_all()
+        db.get_pool.clear()
@@ -0,0 +1,76 @@
+# tests/test_cola.py
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from rrd import cola, config, db
+
+def _segmento(directorio, nombre, planes):
+    with open(os.path.join(directorio, nombre), "w", encoding="utf-8") as f:
+        for p in planes:
+            f.write(json.dumps({"tipo": "planificacion", "id": p["id_planificacion"], "ts": "", "payload": p}) + "\n")
+
+@pytest.fixture
+def directorio(base):
+    d = str(base / "journal")
+    os.makedirs(d)
+    return d
+
+def _pid_terminado() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+def test_reinicio_con_mismo_pid_reaplica_segmentos(directorio, nuevo_plan):
+    # Ejecución anterior con el mismo pid (PID 1 en un contenedor): un segmento tomado y uno activo
+    pid = os.getpid()
+    a, b, c = nuevo_plan(), nuevo_plan(), nuevo_plan()
+    _segmento(directorio, f"seg-{pid}-000001.claimed-{pid}", [a])
+    _segmento(directorio, f"seg-{pid}-000002.jsonl", [b])
+
+    journal = cola.SubmissionJournal(directorio, db.get_pool(), flush_interval=60)
+    journal.start()
+    journal.append("planificacion", [c])      # no debe reutilizar el nombre de un segmento anterior
+    journal.stop()
+
+    assert journal.pendientes() == 0
+    for p in (a, b, c):
+        assert db.fetch_planificacion_by_id(p["id_planificacion"]) is not None
+
+def test_worker_recupera_segmentos_de_una_replica_caida(directorio, nuevo_plan, monkeypatch):
+    monkeypatch.setattr(config, "JOURNAL_RECLAIM_EVERY", 1)
+    journal = cola.SubmissionJournal(directorio, db.get_pool(), flush_interval=0.01)
+    journal.start()
+    try:
+        muerto = _pid_terminado()
+        plan = nuevo_plan()
+        _segmento(directorio, f"seg-{muerto}-000001.claimed-{muerto}", [plan])   # tomado y nunca aplicado
+        limite = time.monotonic() + 5
+        while journal.pendientes() and time.monotonic() < limite:
+            time.sleep(0.01)
+    finally:
+        journal.stop()
+
+    assert db.fetch_planificacion_by_id(plan["id_planificacion"]) is not None
+
+def test_en_cola_y_rechazados(directorio, nuevo_plan, nuevo_reporte):
+    plan = nuevo_plan()
+    db.insert_planificacion(plan)
+    journal = cola.SubmissionJournal(directorio, db.get_pool(), flush_interval=60)
+    journal.append("reporte", [nuevo_reporte(plan)])
+    invalido = nuevo_plan(id_instrumento=None)                               # la base lo rechaza (NOT NULL)
+    journal.append("planificacion", [invalido])
+
+    assert journal.en_cola("reporte", "id_planificacion") == {plan["id_planificacion"]}
+    assert journal.rechazados() == []
+
+    journal.flush()
+
+    assert journal.en_cola("reporte", "id_planificacion") == set()
+    assert db.has_reporte_for_planificacion(plan["id_planificacion"])
+    [rechazo] = journal.rechazados()
+    assert (rechazo["tipo"], rechazo["id"]) == ("planificacion", invalido["id_planificacion"])
@@ -0,0 +1,39 @@
+# tests/test_ids.py
+import os
+
+import pytest
+
+from rrd import utilidades
+
+def test_mismo_milisegundo_es_estrictamente_creciente(monkeypatch):
+    monkeypatch.setattr(utilidades.time, "time_ns", lambda: 1_700_000_000_123_000_000)
+    utilidades._reset_id_state()
+
+    ids = [utilidades.make_id("PLA") for _ in range(50)] + utilidades.make_ids("PLA", 50)
+
+    assert ids == sorted(ids) and len(set(ids)) == 100
+    assert all(i.startswith("PLA-20231114-221320-123-") for i in ids)
+
+def test_lote_sin_repetidos():
+    ids = utilidades.make_ids("REP", 10_000)
+    assert len(set(ids)) == len(ids) and ids == sorted(ids)
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere os.fork")
+def test_fork_reinicia_el_estado():
+    utilidades.make_id("PLA")
+    leer, escribir = os.pipe()
+    pid = os.fork()
+    if pid == 0:                                       # hijo: reporta su estado y sale sin pasar por pytest
+        try:
+            os.write(escribir, f"{utilidades._id_last_ms},{utilidades._id_last_rand}".encode())
+        finally:
+            os._exit(0)
+    os.close(escribir)
+    try:
+        estado_hijo = os.read(leer, 100).decode()
+    finally:
+        os.close(leer)
+        os.waitpid(pid, 0)
+
+    assert utilidades._id_last_ms != 0
+    assert estado_hijo == "0,0"
@@ -0,0 +1,90 @@
+# tests/test_ingesta.py
+import pytest
+
+from rrd import config, db
+from rrd.ingesta import ingestar_evidencias
+
+ENCABEZADO = "archivo,id_planificacion,ejecutado,fecha_ejecucion,responsable_reporte\n"
+
+@pytest.fixture
+def fuente(base):
+    fuente = base / "campaña"
+    fuente.mkdir()
+    return fuente
+
+@pytest.fixture
+def ingestar(base, fuente, monkeypatch):
+    monkeypatch.setattr(config, "EVIDENCE_DIR", str(base / "blobs"))
+    monkeypatch.setattr(config, "EVIDENCE_THUMB_DIR", str(base / "thumbs"))
+
+    def correr(filas):
+        (fuente / "manifiesto.csv").write_text(ENCABEZADO + "".join(f"{f}\n" for f in filas), encoding="utf-8")
+        return ingestar_evidencias(str(fuente), workers=1, miniaturas=False, progreso=False)
+    return correr
+
+@pytest.fixture
+def planes(base, nuevo_plan):
+    planes = [nuevo_plan(), nuevo_plan()]
+    for p in planes:
+        db.insert_planificacion(p)
+    return [p["id_planificacion"] for p in planes]
+
+def _pdf(fuente, nombre: str, texto: str):
+    (fuente / nombre).write_bytes(b"%PDF-1.4\n" + texto.encode("utf-8") + b"\n%%EOF\n")
+
+def _n_reportes():
+    with db.get_conn() as conn:
+        return conn.execute("SELECT COUNT(1) FROM reportes").fetchone()[0]
+
+def test_misma_corrida_dos_veces_no_duplica(ingestar, fuente, planes):
+    _pdf(fuente, "a.pdf", "acta a")
+    filas = [f"a.pdf,{planes[0]},Sí,2025-03-01,Ana", f",{planes[1]},No,2025-03-02,Ana"]
+
+    res = ingestar(filas)
+    assert (res.insertadas, res.ya_procesadas, res.errores, res.omitidas) == (2, 0, [], [])
+    res = ingestar(filas)
+    assert (res.insertadas, res.ya_procesadas, res.errores, res.omitidas) == (0, 2, [], [])
+    assert _n_reportes() == 2
+
+def test_manifiesto_corregido_omite_lo_ya_ingerido_con_motivo(ingestar, fuente, planes):
+    _pdf(fuente, "a.pdf", "acta a")
+    filas = [f"a.pdf,{planes[0]},Sí,2025-03-01,Ana", "a.pdf,PLA-NO-EXISTE,Sí,2025-03-03,Ana"]
+    res = ingestar(filas)
+    assert (res.insertadas, [e["fila"] for e in res.errores]) == (1, [3])
+
+    filas[1] = f"a.pdf,{planes[1]},Sí,2025-03-03,Ana"                    # otro manifiesto (otro sha256)
+    res = ingestar(filas)
+    assert (res.insertadas, res.ya_procesadas, res.errores) == (1, 0, [])
+    assert [(o["fila"], o["archivo"]) for o in res.omitidas] == [(2, "a.pdf")]
+    assert "de otro manifiesto" in res.omitidas[0]["motivo"]
+    assert _n_reportes() == 2
+
+def test_la_clave_incluye_el_contenido_de_la_evidencia(ingestar, fuente, planes):
+    fila = f"a.pdf,{planes[0]},Sí,2025-03-01,Ana"
+    _pdf(fuente, "a.pdf", "version 1")
+    assert ingestar([fila]).insertadas == 1
+
+    _pdf(fuente, "a.pdf", "version 2")                                   # mismo nombre, otro archivo
+    res = ingestar([fila, f",{planes[1]},Sí,2025-03-01,Ana"])
+    assert (res.insertadas, res.ya_procesadas, res.omitidas) == (2, 0, [])
+    assert _n_reportes() == 3
+
+def test_fila_repetida_en_el_manifiesto(ingestar, fuente, planes):
+    _pdf(fuente, "a.pdf", "acta a")
+    fila = f"a.pdf,{planes[0]},Sí,2025-03-01,Ana"
+
+    res = ingestar([fila, fila])
+    assert (res.insertadas, res.errores) == (1, [])
+    assert [o["fila"] for o in res.omitidas] == [3]
+    assert "Idéntica a la fila 2" in res.omitidas[0]["motivo"]
+
+    res = ingestar([fila, fila])                                          # la repetida no cuenta como procesada
+    assert (res.insertadas, res.ya_procesadas) == (0, 1)
+    assert [o["fila"] for o in res.omitidas] == [3]
+    assert "fila 2 de este manifiesto" in res.omitidas[0]["motivo"]
+    assert _n_reportes() == 1
+
+def test_evidencia_faltante_es_error_de_fila(ingestar, planes):
+    res = ingestar([f"no-esta.pdf,{planes[0]},Sí,2025-03-01,Ana"])
+    assert res.insertadas == 0
+    assert [(e["fila"], e["archivo"]) for e in res.errores] == [(2, "no-esta.pdf")]
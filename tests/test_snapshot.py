@@ -0,0 +1,59 @@
+# tests/test_snapshot.py
+import pytest
+
+from rrd import config, db, snapshot
+
+pytest.importorskip("pyarrow")
+
+@pytest.fixture
+def snap(base, monkeypatch):
+    monkeypatch.setattr(config, "SNAPSHOT_DIR", str(base / "snapshot"))
+
+def _en_base():
+    with db.get_conn() as conn:
+        return sorted(conn.execute("""
+        SELECT p.id_planificacion, r.id_reporte, p.anio, p.dependencia, r.ejecutado
+        FROM planificaciones p LEFT JOIN reportes r ON r.id_planificacion = p.id_planificacion
+        """).fetchall(), key=repr)
+
+def _en_snapshot(**kw):
+    t = snapshot.read_snapshot(**kw)
+    cols = [t[c].to_pylist() for c in ("id_planificacion", "id_reporte", "anio", "dependencia", "ejecutado")]
+    return sorted(zip(*cols), key=repr)
+
+def test_refresco_incremental_sigue_updates_y_deletes(snap, nuevo_plan, nuevo_reporte):
+    a, b, c = nuevo_plan(), nuevo_plan(), nuevo_plan()
+    for p in (a, b, c):
+        db.insert_planificacion(p)
+    db.insert_reportes([nuevo_reporte(a, ejecutado="Sí"), nuevo_reporte(b, ejecutado="No")])
+    assert _en_snapshot(refrescar=True) == _en_base()
+
+    with db.get_conn() as conn:
+        conn.execute("UPDATE planificaciones SET anio = 2031 WHERE id_planificacion = ?", [a["id_planificacion"]])
+        conn.execute("UPDATE reportes SET ejecutado = 'Parcial' WHERE id_planificacion = ?", [b["id_planificacion"]])
+        conn.execute("DELETE FROM planificaciones WHERE id_planificacion = ?", [c["id_planificacion"]])
+    version = snapshot.load_snapshot_meta().version
+    assert _en_snapshot(refrescar=True) == _en_base()
+    assert snapshot.load_snapshot_meta().version == version + 1
+
+    with db.get_conn() as conn:
+        conn.execute("DELETE FROM reportes WHERE id_planificacion = ?", [b["id_planificacion"]])
+    assert _en_snapshot(refrescar=True) == _en_base()
+    meta = snapshot.load_snapshot_meta()
+    snapshot.refresh_snapshot(completo=True)
+    assert _en_snapshot(refrescar=False) == _en_base()
+    assert meta.seq == snapshot.load_snapshot_meta().seq
+
+def test_lectura_no_consulta_la_base_si_no_esta_vencido(snap, nuevo_plan, monkeypatch):
+    db.insert_planificacion(nuevo_plan())
+    snapshot.refresh_snapshot()
+
+    def sin_base():
+        raise AssertionError("read_snapshot no debe consultar la base")
+    monkeypatch.setattr(snapshot, "get_conn", sin_base)
+    assert len(_en_snapshot()) == 1
+
+    meta = snapshot.load_snapshot_meta()
+    snapshot._save_snapshot_meta(meta._replace(actualizado_en="2000-01-01T00:00:00"))   # vencido -> refresca
+    with pytest.raises(AssertionError):
+        _en_snapshot()
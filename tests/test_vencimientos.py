@@ -0,0 +1,73 @@
+# tests/test_vencimientos.py
+from datetime import date
+
+import pytest
+
+from rrd import db, utilidades
+
+@pytest.mark.parametrize("periodo, anio, rango", [
+    ("Febrero", 2024, ("2024-02-01", "2024-02-29")),              # bisiesto
+    ("Febrero", 2025, ("2025-02-01", "2025-02-28")),
+    ("Abril", 2025, ("2025-04-01", "2025-04-30")),
+    ("Diciembre", 2025, ("2025-12-01", "2025-12-31")),
+    ("1° Trimestre", 2025, ("2025-01-01", "2025-03-31")),
+    ("4° Trimestre", 2025, ("2025-10-01", "2025-12-31")),
+    ("1° Semestre", 2025, ("2025-01-01", "2025-06-30")),
+    ("2° Semestre", 2025, ("2025-07-01", "2025-12-31")),
+    ("Anual", "2025", ("2025-01-01", "2025-12-31")),
+    ("Otro", 2025, (None, None)),
+    ("Anual", None, (None, None)),
+])
+def test_periodo_rango(periodo, anio, rango):
+    assert utilidades.periodo_rango(periodo, anio) == rango
+
+HOY = date(2025, 3, 31)
+
+@pytest.fixture
+def planes(base, nuevo_plan, nuevo_reporte):
+    planes = {
+        "febrero": nuevo_plan(periodo_planificado="Febrero"),              # fin 02-28: vencida
+        "marzo": nuevo_plan(periodo_planificado="Marzo"),                  # fin == hoy: próxima, no vencida
+        "trimestre": nuevo_plan(periodo_planificado="1° Trimestre"),       # fin == hoy
+        "abril": nuevo_plan(periodo_planificado="Abril"),                  # fin == hoy + 30: último día de la ventana
+        "mayo": nuevo_plan(periodo_planificado="Mayo"),                    # fuera de la ventana
+        "reportada": nuevo_plan(periodo_planificado="Enero"),              # vencida pero con reporte
+    }
+    for p in planes.values():
+        db.insert_planificacion(p)
+    db.insert_reporte(nuevo_reporte(planes["reportada"]))
+    return planes
+
+def _ids(df):
+    return set(df["id_planificacion"])
+
+def test_vencidas_y_proximas_en_los_bordes(planes):
+    vencidas = db.query_vencimientos("vencidas", hoy=HOY)
+    proximas = db.query_vencimientos("proximas", hoy=HOY, dias=30)
+
+    assert _ids(vencidas) == {planes["febrero"]["id_planificacion"]}
+    assert vencidas["dias_para_vencer"].tolist() == [-31]
+    assert _ids(proximas) == {planes[k]["id_planificacion"] for k in ("marzo", "trimestre", "abril")}
+    assert sorted(proximas["dias_para_vencer"]) == [0, 0, 30]
+    assert _ids(db.query_vencimientos("proximas", hoy=HOY, dias=29)) == {
+        planes[k]["id_planificacion"] for k in ("marzo", "trimestre")
+    }
+
+def test_vencimientos_por_dependencia(planes):
+    dependencia = planes["marzo"]["dependencia"]
+    df = db.query_vencimientos("proximas", dependencia=dependencia, hoy=HOY)
+    assert set(df["dependencia"]) == {dependencia}
+    assert planes["marzo"]["id_planificacion"] in _ids(df)
+
+def test_resumen_coincide_con_el_detalle(planes):
+    resumen = db.resumen_vencimientos(hoy=HOY, dias=30).set_index("dependencia")
+    for estado, col in (("vencidas", "vencidas"), ("proximas", "proximas")):
+        detalle = db.query_vencimientos(estado, hoy=HOY, dias=30)
+        assert detalle.groupby("dependencia").size().to_dict() == {
+            dep: n for dep, n in resumen[col].items() if n
+        }
+    assert int(resumen["vencidas"].sum()) == 1 and int(resumen["proximas"].sum()) == 3
+
+def test_estado_desconocido():
+    with pytest.raises(ValueError):
+        db.query_vencimientos("atrasadas")